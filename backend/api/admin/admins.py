@@ -22,6 +22,7 @@ except Exception as e:
     logging.warning(f"Could not initialize Firebase: {e}")
     db = None
 
+from services.admin_role_cache import admin_role_cache
 from services.audit_log_service import audit_log_service
 from config.admin_config import SUPER_ADMIN_EMAILS
 
@@ -218,6 +219,9 @@ def grant_admin(uid: str):
             'updated_at': datetime.now(timezone.utc)
         })
 
+        # 立即讓所有 worker 的角色緩存失效
+        admin_role_cache.invalidate(db, uid)
+
         # 5. 記錄審計日誌
         audit_log_service.log_action(
             action='grant_admin',
@@ -315,6 +319,9 @@ def revoke_admin(uid: str):
             'updated_at': datetime.now(timezone.utc)
         })
 
+        # 立即讓所有 worker 的角色緩存失效（被撤銷的管理員不能再訪問）
+        admin_role_cache.invalidate(db, uid)
+
         # 5. 記錄審計日誌
         audit_log_service.log_action(
             action='revoke_admin',
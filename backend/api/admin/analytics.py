@@ -4,17 +4,26 @@
 提供管理員查看統計數據和分析報告的 API 端點。
 
 API 端點:
+- GET /api/v1/admin/analytics/dashboard - 獲取 Dashboard 合併數據（一次掃描）
 - GET /api/v1/admin/analytics/overview - 獲取總覽統計
 - GET /api/v1/admin/analytics/revenue - 獲取收入統計
 - GET /api/v1/admin/analytics/retention - 獲取留存分析
+- GET /api/v1/admin/analytics/retention/cohorts - 獲取群組留存矩陣
+- GET /api/v1/admin/analytics/funnel - 獲取試用 → 付費轉換漏斗
 - GET /api/v1/admin/analytics/trends - 獲取趨勢數據
+- POST /api/v1/admin/analytics/rollups/refresh - 重建每日匯總（排程任務使用）
+- POST /api/v1/admin/analytics/cache/warm - 預熱常用分析緩存（排程任務使用）
+
+所有 GET 端點的響應都帶有 computed_at（結果計算時間）與 stale（是否為過期結果）。
 """
 from flask import Blueprint, request, jsonify, g
 import logging
 import sys
 import os
+import threading
+import time
 from datetime import datetime, timezone, timedelta
-from collections import defaultdict
+from itertools import chain
 
 try:
     from firebase_admin import firestore
@@ -40,6 +49,26 @@ except ImportError as e:
 
 from middleware.admin_auth import require_admin, get_admin_info
 from services.audit_log_service import audit_log_service
+from services.analytics_rollup_service import analytics_rollup_service
+from services.cohort_retention import GRANULARITIES, compute_cohort_retention
+from services.conversion_funnel import compute_conversion_funnel
+from services.dashboard_analytics import compute_dashboard
+from services.revenue_engine import compute_mrr_series
+from services.subscription_aggregates import (
+    AggregationUnavailable,
+    aggregate_extension_stats,
+    aggregate_mrr,
+)
+from services.subscription_counters import SubscriptionCounterListener, subscription_counter_listener
+from services.subscription_timeline import (
+    SubscriptionTimeline,
+    compute_daily_activity,
+    period_starts,
+    stream_subscription_rows,
+)
+from utils.cache import TTLCache, cache_key
+from utils.shared_cache import FileSharedBackend, FirestoreSharedBackend, SharedCache
+from utils.concurrency import count_query, fan_out
 
 logger = logging.getLogger(__name__)
 
@@ -47,47 +76,297 @@ logger = logging.getLogger(__name__)
 admin_analytics_bp = Blueprint('admin_analytics', __name__)
 
 # ========== 緩存機制 ==========
-# 簡單的內存緩存，用於減少頻繁的 Firestore 查詢
-# 緩存 TTL: 5 分鐘（管理後台數據不需要實時性）
-_analytics_cache = {
-    'overview': {'data': None, 'timestamp': None},
-    'revenue': {'data': None, 'timestamp': None},
-    'retention': {'data': None, 'timestamp': None},
-    'trends': {'data': None, 'timestamp': None, 'days': None},
-    'ttl': 300  # 5 minutes
+# TTL + LRU 緩存，用於減少頻繁的 Firestore 查詢
+# - ANALYTICS_CACHE_BACKEND 選擇緩存位置:
+#   memory（默認，進程內）/ shm（/dev/shm 文件，同容器 worker 共享）/
+#   firestore（analytics_cache 集合，跨實例共享）
+#   共享後端以租約保證同一 key 只有一個 worker 重算
+# - key 包含查詢參數（例如 trends:days=30），不同參數互不覆蓋
+# - 每個指標使用各自的 TTL（管理後台數據不需要實時性）
+# - stale-while-revalidate：過期後立即返回上一次的結果，並在背景執行緒重新計算；
+#   同一 key 只有一個執行緒在計算
+ANALYTICS_CACHE_TTL = {
+    'dashboard': 300,   # 5 minutes
+    'overview': 300,    # 5 minutes
+    'revenue': 600,     # 10 minutes
+    'revenue_summary': 600,  # 10 minutes
+    'retention': 1800,  # 30 minutes
+    'retention_cohorts': 1800,  # 30 minutes
+    'funnel': 1800,     # 30 minutes
+    'trends': 600,      # 10 minutes
 }
 
-def get_cached_data(cache_key, days=None):
-    """獲取緩存數據"""
-    now = datetime.now(timezone.utc)
-    cache_entry = _analytics_cache.get(cache_key, {})
+# 增量計數器 checkpoint 的最大可用年齡（監聽器每分鐘寫入一次）
+COUNTERS_CHECKPOINT_MAX_AGE = 180  # 3 minutes
+
+# 過期結果最多沿用多久（超過則同步重算）
+ANALYTICS_MAX_STALE = 6 * 3600  # 6 hours
+
+
+
+def _create_analytics_cache():
+    backend = os.getenv('ANALYTICS_CACHE_BACKEND', 'memory')
+    try:
+        if backend == 'shm':
+            return SharedCache('analytics', FileSharedBackend(), max_entries=64, default_ttl=300)
+        if backend == 'firestore' and db is not None:
+            return SharedCache('analytics', FirestoreSharedBackend(db), max_entries=64, default_ttl=300)
+    except Exception as e:
+        logger.warning(f"Could not initialize {backend} analytics cache, using in-process cache: {e}")
+    return TTLCache('analytics', max_entries=64, default_ttl=300)
+
+
+_analytics_cache = _create_analytics_cache()
+
+
+class _PartialResult(Exception):
+    """計算結果含部分失敗的查詢（不寫入緩存，背景刷新時保留舊的完整結果）"""
+
+    def __init__(self, result):
+        super().__init__('partial analytics result')
+        self.result = result
+
+
+def _complete_result(compute_fn):
+    result = compute_fn()
+    if isinstance(result, dict) and result.get('partial_failures'):
+        raise _PartialResult(result)
+    return result
+
 
-    # 檢查緩存是否有效
-    if (cache_entry.get('data') is not None and
-        cache_entry.get('timestamp') is not None and
-        (now - cache_entry['timestamp']).total_seconds() < _analytics_cache['ttl']):
+def get_cached_analytics(metric, compute_fn, **params):
+    """
+    獲取分析結果（stale-while-revalidate）
+
+    返回值附帶 computed_at（結果的計算時間）與 stale（是否為過期結果，
+    此時背景刷新已開始）。部分失敗的結果照常返回，但不寫入緩存。
+    """
+    key = cache_key(metric, **params)
+    try:
+        result, computed_at, stale = _analytics_cache.get_or_refresh(
+            key,
+            lambda: _complete_result(compute_fn),
+            ttl=ANALYTICS_CACHE_TTL.get(metric),
+            max_stale=ANALYTICS_MAX_STALE
+        )
+    except _PartialResult as e:
+        result, computed_at, stale = e.result, datetime.now(timezone.utc), False
+
+    return {**result, 'computed_at': computed_at.isoformat(), 'stale': stale}
+
+
+def _warm_targets():
+    """Dashboard 默認參數下的分析（預熱對象）"""
+    return [
+        ('dashboard', {'days': 30, 'months': 12}, lambda: _compute_dashboard(30, 12)),
+        ('overview', {}, _compute_overview),
+        ('revenue', {'months': 12}, lambda: _compute_revenue(12)),
+        ('retention', {}, _compute_retention),
+        ('trends', {'days': 30}, lambda: _compute_trends(30)),
+    ]
+
+
+def warm_analytics_cache(margin=0):
+    """
+    重算已過期、不存在或將在 margin 秒內過期的常用分析結果
+
+    Returns:
+        list: 已刷新的指標名稱
+    """
+    refreshed = []
+    for metric, params, compute_fn in _warm_targets():
+        key = cache_key(metric, **params)
+        remaining = _analytics_cache.expires_in(key)
+        if remaining is not None and remaining > margin:
+            continue
+        try:
+            _analytics_cache.refresh(
+                key,
+                lambda: _complete_result(compute_fn),
+                ttl=ANALYTICS_CACHE_TTL.get(metric)
+            )
+            refreshed.append(metric)
+        except Exception as e:
+            logger.warning(f"Failed to warm analytics {key}: {e}")
+    return refreshed
 
-        # 對於 trends，還需要檢查 days 參數是否匹配
-        if cache_key == 'trends' and days and cache_entry.get('days') != days:
-            return None
 
-        logger.info(f"Using cached {cache_key} (age: {(now - cache_entry['timestamp']).total_seconds():.1f}s)")
-        return cache_entry['data']
+_warmer_started = False
+_warmer_lock = threading.Lock()
 
-    return None
 
-def set_cached_data(cache_key, data, days=None):
-    """設置緩存數據"""
+def start_analytics_warmer(interval):
+    """
+    啟動背景預熱執行緒（每 interval 秒刷新即將過期的常用分析）
+
+    每個進程只啟動一次；Firestore 不可用時不啟動。
+    """
+    global _warmer_started
+    if db is None or interval <= 0:
+        return
+    with _warmer_lock:
+        if _warmer_started:
+            return
+        _warmer_started = True
+
+    def loop():
+        while True:
+            try:
+                refreshed = warm_analytics_cache(margin=interval)
+                if refreshed:
+                    logger.info(f"Warmed analytics cache: {refreshed}")
+            except Exception as e:
+                logger.error(f"Analytics warmer error: {e}", exc_info=True)
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name='analytics-warmer', daemon=True).start()
+    logger.info(f"✅ Analytics cache warmer started (every {interval}s)")
+
+
+_rollup_refresher_started = False
+
+
+def start_rollup_refresher(interval):
+    """
+    啟動背景執行緒，每 interval 秒重建昨天與今天的每日匯總（等同定期調用 /rollups/refresh）
+
+    請求路徑只讀取匯總；沒有 Cloud Scheduler 時以此保持今天的匯總在 max_age 內。
+    每個進程只啟動一次；Firestore 不可用時不啟動。
+    """
+    global _rollup_refresher_started
+    if db is None or interval <= 0:
+        return
+    with _warmer_lock:
+        if _rollup_refresher_started:
+            return
+        _rollup_refresher_started = True
+
+    def loop():
+        while True:
+            try:
+                analytics_rollup_service.refresh_recent()
+            except Exception as e:
+                logger.error(f"Analytics rollup refresher error: {e}", exc_info=True)
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name='analytics-rollup-refresher', daemon=True).start()
+    logger.info(f"✅ Analytics rollup refresher started (every {interval}s)")
+
+
+def start_subscription_counters(checkpoint_interval=60, reconcile_interval=6 * 3600):
+    """
+    啟動 subscriptions 變更監聽器，維護總覽統計的增量計數器
+
+    啟動後 get_overview 直接讀取本進程的計數器；計數器每 checkpoint_interval 秒
+    寫入 analytics_counters/subscriptions 供其他 worker / 實例讀取，
+    每 reconcile_interval 秒全量重掃一次修正漂移。Firestore 不可用時不啟動。
+    """
+    if db is None:
+        return
+    subscription_counter_listener.start(
+        db,
+        checkpoint_interval=checkpoint_interval,
+        reconcile_interval=reconcile_interval
+    )
+
+
+@admin_analytics_bp.route('/dashboard', methods=['GET'])
+@require_admin
+def get_dashboard():
+    """
+    獲取 Dashboard 合併數據（總覽 + 收入 + 留存 + 趨勢）
+
+    取代分別調用 /overview、/revenue、/retention、/trends：總覽、留存、趨勢讀取增量計數器
+    checkpoint 與每日匯總，收入只掃描與窗口重疊的付費訂閱；每日匯總缺失時才掃描一次
+    subscriptions（字段投影），四組指標共享同一批解碼後的行。
+
+    Query Parameters:
+        - days: 趨勢天數（默認 30，範圍 1–90）
+        - months: MRR 序列的月數（默認 12，最大 36）
+
+    Returns:
+        {
+            "overview": {...},   # 同 /overview
+            "revenue": {...},    # 同 /revenue
+            "retention": {...},  # 同 /retention
+            "trends": {...},     # 同 /trends
+            "computed_at": "...",
+            "stale": false
+        }
+    """
+    if subscription_service is None or db is None:
+        return jsonify({'error': 'Service not available'}), 503
+
+    try:
+        days = max(1, min(int(request.args.get('days', 30)), 90))
+        months = max(2, min(int(request.args.get('months', 12)), 36))
+
+        result = get_cached_analytics(
+            'dashboard',
+            lambda: _compute_dashboard(days, months),
+            days=days,
+            months=months
+        )
+
+        # ✅ 本進程的增量計數器已就緒時，總覽使用最新計數
+        counts = subscription_counter_listener.counts(datetime.now(timezone.utc))
+        if counts is not None:
+            result['overview'] = _overview_result(counts)
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        logger.error(f"Error getting dashboard analytics: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+def _compute_dashboard(days, months):
+    """
+    計算 Dashboard 合併數據（不經過緩存）
+
+    總覽優先讀取增量計數器的 checkpoint；總覽 / 收入 / 留存 / 趨勢從一次讀取的每日匯總
+    （analytics_daily）計算，不掃描 subscriptions（收入只有當前與上月底的摘要，不含 MRR 序列）。
+    每日匯總缺失時才退回一次全量投影掃描，四個歸約共享同一條時間線。
+    """
     now = datetime.now(timezone.utc)
-    if cache_key not in _analytics_cache:
-        _analytics_cache[cache_key] = {}
+    _, week_start, month_start = _overview_windows(now)
+    trend_start = now - timedelta(days=days)
+
+    counts = SubscriptionCounterListener.load_checkpoint(db, max_age=COUNTERS_CHECKPOINT_MAX_AGE, now=now)
+
+    # ✅ 一次讀取覆蓋總覽、收入與趨勢所需的每日匯總（只讀，由排程寫入；
+    # 多讀本月之前的一天作為上月底的 MRR）
+    rollups = analytics_rollup_service.get_range(
+        min(week_start, month_start, trend_start).date() - timedelta(days=1), now.date(),
+        max_age=ANALYTICS_CACHE_TTL['dashboard'], now=now
+    )
+    if rollups is not None:
+        trend_key = trend_start.strftime('%Y-%m-%d')
+        return {
+            'overview': (
+                _overview_result(counts) if counts is not None
+                else _overview_from_rollups(rollups, week_start, month_start)
+            ),
+            'revenue': _revenue_from_rollups(rollups, month_start),
+            'retention': _retention_from_rollups(rollups[-1]),
+            'trends': _trends_from_rollups([r for r in rollups if r['date'] >= trend_key]),
+        }
 
-    _analytics_cache[cache_key]['data'] = data
-    _analytics_cache[cache_key]['timestamp'] = now
-    if days is not None:
-        _analytics_cache[cache_key]['days'] = days
+    # 每日匯總缺失：一次投影掃描所有訂閱，四個歸約共享同一條時間線
+    timeline = SubscriptionTimeline.from_subscriptions(
+        stream_subscription_rows(db.collection('subscriptions'))
+    )
+    reduced = compute_dashboard(timeline, days=days, months=months, now=now)
 
-    logger.info(f"Cached {cache_key} data")
+    return {
+        'overview': _overview_result(counts if counts is not None else reduced['overview']),
+        'revenue': {
+            **_revenue_result(reduced['mrr_series']),
+            'extensions': aggregate_extension_stats(db.collection('subscriptions')),
+        },
+        'retention': _retention_result(reduced['retention']),
+        'trends': _trends_result(reduced['activity']),
+    }
 
 
 @admin_analytics_bp.route('/overview', methods=['GET'])
@@ -113,84 +392,13 @@ def get_overview():
         return jsonify({'error': 'Service not available'}), 503
 
     try:
-        # 檢查緩存
-        cached_result = get_cached_data('overview')
-        if cached_result is not None:
-            return jsonify(cached_result), 200
-
+        # ✅ 本進程的增量計數器已就緒時直接讀取（O(1)，不經過緩存）
         now = datetime.now(timezone.utc)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = today_start - timedelta(days=now.weekday())
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        subscriptions_ref = db.collection('subscriptions')
-
-        # ✅ 優化1: 使用聚合查詢獲取總用戶數（不讀取文檔內容）
-        total_users = subscriptions_ref.count().get()[0][0].value
-
-        # ✅ 優化2: 使用聚合查詢統計付費用戶數
-        premium_users_count = subscriptions_ref.where('is_premium', '==', True).count().get()[0][0].value
-
-        # ✅ 優化3: 使用 where 過濾活躍試用用戶（試用未過期且非付費）
-        # 注意: Firestore 不支援同時使用多個不等式，所以我們分批查詢
-        trial_users = 0
-        try:
-            # 查詢試用結束時間大於現在的用戶
-            trial_docs = subscriptions_ref.where('trial_end_at', '>', now).where('is_premium', '==', False).limit(1000).stream()
-            trial_users = sum(1 for _ in trial_docs)
-        except Exception as e:
-            logger.warning(f"Failed to count trial users: {e}")
-
-        # ✅ 優化4: 使用 where 過濾活躍付費用戶
-        active_premium_users = 0
-        total_churned = 0
-        try:
-            # 查詢付費結束時間大於現在的用戶（活躍）
-            active_premium_docs = subscriptions_ref.where('is_premium', '==', True).where('premium_end_at', '>', now).limit(2000).stream()
-            active_premium_users = sum(1 for _ in active_premium_docs)
-
-            # 計算流失用戶數 = 總付費 - 活躍付費
-            total_churned = max(premium_users_count - active_premium_users, 0)
-        except Exception as e:
-            logger.warning(f"Failed to count active premium users: {e}")
-
-        # ✅ 優化5: 使用 where 過濾新增用戶（按時間範圍）
-        today_new = 0
-        week_new = 0
-        month_new = 0
-        try:
-            # 今日新增
-            today_new = subscriptions_ref.where('created_at', '>=', today_start).count().get()[0][0].value
-
-            # 本週新增
-            week_new = subscriptions_ref.where('created_at', '>=', week_start).count().get()[0][0].value
-
-            # 本月新增
-            month_new = subscriptions_ref.where('created_at', '>=', month_start).count().get()[0][0].value
-        except Exception as e:
-            logger.warning(f"Failed to count new users: {e}")
-
-        # 計算轉換率（付費用戶 / 總用戶）
-        trial_conversion_rate = (premium_users_count / max(total_users, 1))
-
-        # 計算流失率（已過期付費用戶 / 總付費用戶）
-        churn_rate = (total_churned / max(premium_users_count, 1))
-
-        result = {
-            'total_users': total_users,
-            'trial_users': trial_users,
-            'premium_users': premium_users_count,
-            'active_premium_users': active_premium_users,
-            'today_new_users': today_new,
-            'this_week_new_users': week_new,
-            'this_month_new_users': month_new,
-            'trial_conversion_rate': round(trial_conversion_rate, 3),
-            'churn_rate': round(churn_rate, 3)
-        }
-
-        # 設置緩存
-        set_cached_data('overview', result)
+        counts = subscription_counter_listener.counts(now)
+        if counts is not None:
+            return jsonify({**_overview_result(counts), 'computed_at': now.isoformat(), 'stale': False}), 200
 
+        result = get_cached_analytics('overview', _compute_overview)
         return jsonify(result), 200
 
     except Exception as e:
@@ -198,11 +406,99 @@ def get_overview():
         return jsonify({'error': str(e)}), 500
 
 
+def _overview_windows(now):
+    """總覽的新增用戶統計窗口：(今天, 本週, 本月) 的開始時間"""
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=now.weekday())
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return today_start, week_start, month_start
+
+
+def _compute_overview():
+    """計算總覽統計（不經過緩存）"""
+    now = datetime.now(timezone.utc)
+    today_start, week_start, month_start = _overview_windows(now)
+
+    # ✅ 優先讀取增量計數器的 checkpoint（一次文檔讀取）
+    counts = SubscriptionCounterListener.load_checkpoint(db, max_age=COUNTERS_CHECKPOINT_MAX_AGE, now=now)
+    if counts is not None:
+        return _overview_result(counts)
+
+    # ✅ 其次讀取每日匯總（analytics_daily，由排程寫入），缺失或過期時才即時掃描
+    rollups = analytics_rollup_service.get_range(
+        min(week_start, month_start).date(), now.date(),
+        max_age=ANALYTICS_CACHE_TTL['overview'], now=now
+    )
+    if rollups is not None:
+        return _overview_from_rollups(rollups, week_start, month_start)
+
+    subscriptions_ref = db.collection('subscriptions')
+
+    # ✅ 所有統計都是互相獨立的聚合查詢（不讀取文檔內容），並發執行
+    # 注意: Firestore 不支援同時使用多個不等式，所以試用/付費分開查詢
+    counts, errors = fan_out({
+        'total_users': lambda: count_query(subscriptions_ref),
+        'premium_users': lambda: count_query(subscriptions_ref.where('is_premium', '==', True)),
+        # 活躍試用用戶（試用未過期且非付費）
+        'trial_users': lambda: count_query(
+            subscriptions_ref.where('trial_end_at', '>', now).where('is_premium', '==', False)
+        ),
+        # 活躍付費用戶（付費未過期）
+        'active_premium_users': lambda: count_query(
+            subscriptions_ref.where('is_premium', '==', True).where('premium_end_at', '>', now)
+        ),
+        # 新增用戶（按時間範圍）
+        'today_new_users': lambda: count_query(subscriptions_ref.where('created_at', '>=', today_start)),
+        'this_week_new_users': lambda: count_query(subscriptions_ref.where('created_at', '>=', week_start)),
+        'this_month_new_users': lambda: count_query(subscriptions_ref.where('created_at', '>=', month_start)),
+    }, default=0)
+
+    result = _overview_result(counts)
+
+    if errors:
+        # 部分查詢失敗：返回部分結果，並標記失敗的指標（不緩存，下次請求重試）
+        result['partial_failures'] = sorted(errors)
+
+    return result
+
+
+def _overview_result(counts):
+    """由各項計數組裝總覽統計（計算轉換率與流失率）"""
+    total_users = counts['total_users']
+    premium_users_count = counts['premium_users']
+
+    # 計算流失用戶數 = 總付費 - 活躍付費
+    total_churned = max(premium_users_count - counts['active_premium_users'], 0)
+
+    # 計算轉換率（付費用戶 / 總用戶）
+    trial_conversion_rate = (premium_users_count / max(total_users, 1))
+
+    # 計算流失率（已過期付費用戶 / 總付費用戶）
+    churn_rate = (total_churned / max(premium_users_count, 1))
+
+    return {
+        'total_users': total_users,
+        'trial_users': counts['trial_users'],
+        'premium_users': premium_users_count,
+        'active_premium_users': counts['active_premium_users'],
+        'today_new_users': counts['today_new_users'],
+        'this_week_new_users': counts['this_week_new_users'],
+        'this_month_new_users': counts['this_month_new_users'],
+        'trial_conversion_rate': round(trial_conversion_rate, 3),
+        'churn_rate': round(churn_rate, 3)
+    }
+
+
 @admin_analytics_bp.route('/revenue', methods=['GET'])
 @require_admin
 def get_revenue():
     """
-    獲取收入統計
+    獲取收入統計（按各訂閱的方案、價格與平台計算 MRR）
+
+    Query Parameters:
+        - months: MRR 序列的月數（默認 12，最大 36）
+        - series: false 時不返回 mrr_series，收入與 ARPU 改用服務端聚合查詢
+          （固定數量的聚合讀取，不掃描文檔；配置了 PLAN_PRICING 時仍串流計算）
 
     Returns:
         {
@@ -210,114 +506,120 @@ def get_revenue():
             "last_month_revenue": 14000,
             "annual_recurring_revenue": 180000,
             "average_revenue_per_user": 150,
+            "active_subscriptions": 100,
             "by_platform": {
                 "stripe": 10000,
                 "apple_iap": 3000,
                 "google_play": 2000
+            },
+            "extensions": {
+                "extended_subscriptions": 40,
+                "total_extension_days": 1200,
+                "average_extension_days": 30.0
+            },
+            "mrr_series": {
+                "months": ["2025-01", ...],
+                "mrr": [...],
+                "recognized_revenue": [...],
+                "new_mrr": [...],
+                "expansion_mrr": [...],
+                "contraction_mrr": [...],
+                "churned_mrr": [...],
+                "reactivated_mrr": [...]
             }
         }
+
+        current_month_revenue 為當前 MRR，last_month_revenue 為上月底的 MRR；
+        recognized_revenue 為按天數分攤到各月的收入。
     """
     if subscription_service is None or db is None:
         return jsonify({'error': 'Service not available'}), 503
 
     try:
-        # 檢查緩存
-        cached_result = get_cached_data('revenue')
-        if cached_result is not None:
-            return jsonify(cached_result), 200
+        months = max(2, min(int(request.args.get('months', 12)), 36))
 
-        now = datetime.now(timezone.utc)
-        current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # 計算上個月的開始和結束
-        last_month_end = current_month_start - timedelta(days=1)
-        last_month_start = last_month_end.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if request.args.get('series', 'true').lower() == 'false':
+            result = get_cached_analytics('revenue_summary', _compute_revenue_summary)
+        else:
+            result = get_cached_analytics('revenue', lambda: _compute_revenue(months), months=months)
+        return jsonify(result), 200
 
-        # 假設月費價格（實際應該從訂閱數據中獲取）
-        MONTHLY_PRICE = 150  # TWD 150/月（示例價格）
+    except Exception as e:
+        logger.error(f"Error getting revenue statistics: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
-        # ✅ 優化: 只查詢活躍付費訂閱（付費未過期）而非所有付費訂閱
-        subscriptions_ref = db.collection('subscriptions')
 
-        # 查詢當前月活躍的付費訂閱（限制最大1000筆）
-        current_active = list(
-            subscriptions_ref
-            .where('is_premium', '==', True)
-            .where('premium_end_at', '>=', current_month_start)
-            .limit(1000)
-            .stream()
+def _compute_revenue(months):
+    """計算收入統計（不經過緩存）"""
+    now = datetime.now(timezone.utc)
+    window_start = period_starts('month', now, months)[0]
+
+    # ✅ 一次投影掃描：只讀付費區間與窗口重疊的訂閱，
+    # 整個 MRR 序列與變動分類在同一批區間上向量化計算
+    timeline = SubscriptionTimeline.from_subscriptions(
+        stream_subscription_rows(
+            db.collection('subscriptions').where('premium_end_at', '>=', window_start),
+            order_by='premium_end_at'
         )
+    )
+    return {
+        **_revenue_result(compute_mrr_series(timeline, months, now=now)),
+        'extensions': aggregate_extension_stats(db.collection('subscriptions')),
+    }
 
-        current_month_revenue = 0
-        by_platform = defaultdict(int)
-        active_subscriptions = 0
-
-        for doc in current_active:
-            try:
-                data = doc.to_dict()
-                premium_start = data.get('premium_start_at')
-                payment_platform = data.get('payment_platform')
-
-                # 確認在當前月內確實活躍
-                if isinstance(premium_start, datetime) and premium_start <= now:
-                    current_month_revenue += MONTHLY_PRICE
-                    active_subscriptions += 1
-
-                    # 按平台統計
-                    if payment_platform:
-                        by_platform[payment_platform] += MONTHLY_PRICE
-
-            except Exception as e:
-                logger.warning(f"Failed to process subscription {doc.id}: {e}")
-                continue
-
-        # 查詢上個月活躍的付費訂閱
-        last_month_active = subscriptions_ref.where('is_premium', '==', True).where('premium_end_at', '>=', last_month_start).limit(1000).stream()
 
-        last_month_revenue = 0
-        for doc in last_month_active:
-            try:
-                data = doc.to_dict()
-                premium_start = data.get('premium_start_at')
-                premium_end = data.get('premium_end_at')
-
-                # 確認在上個月內確實活躍
-                if isinstance(premium_start, datetime) and isinstance(premium_end, datetime):
-                    if premium_start <= last_month_end and premium_end >= last_month_start:
-                        # 避免重複計算（當前月也活躍的訂閱）
-                        if not (premium_end >= current_month_start):
-                            last_month_revenue += MONTHLY_PRICE
-
-            except Exception as e:
-                logger.warning(f"Failed to process subscription {doc.id}: {e}")
-                continue
-
-        # 補上當前月也活躍的訂閱
-        last_month_revenue += current_month_revenue
-
-        # 計算年度經常性收入（ARR）= 活躍訂閱數 * 月費 * 12
-        arr = active_subscriptions * MONTHLY_PRICE * 12
-
-        # 計算每用戶平均收入（ARPU）
-        arpu = (current_month_revenue / max(active_subscriptions, 1))
-
-        result = {
-            'current_month_revenue': current_month_revenue,
-            'last_month_revenue': last_month_revenue,
-            'annual_recurring_revenue': arr,
-            'average_revenue_per_user': round(arpu, 2),
-            'active_subscriptions': active_subscriptions,
-            'by_platform': dict(by_platform)
-        }
-
-        # 設置緩存
-        set_cached_data('revenue', result)
-
-        return jsonify(result), 200
+def _compute_revenue_summary():
+    """用服務端聚合查詢計算當前與上月底的 MRR（不經過緩存，不含 MRR 序列）"""
+    now = datetime.now(timezone.utc)
+    month_start = period_starts('month', now, 1)[0]
+    subscriptions_ref = db.collection('subscriptions')
 
-    except Exception as e:
-        logger.error(f"Error getting revenue statistics: {e}", exc_info=True)
-        return jsonify({'error': str(e)}), 500
+    try:
+        # ✅ sum / avg / count 聚合：讀取成本與訂閱數量無關
+        platforms = [platform.value for platform in PaymentPlatform]
+        current = aggregate_mrr(subscriptions_ref, now, platforms)
+        last_month = aggregate_mrr(subscriptions_ref, month_start, platforms)
+    except AggregationUnavailable as e:
+        # 月費是計算字段（方案價目表）或聚合失敗：改用串流掃描
+        logger.info(f"Revenue aggregation unavailable, streaming instead: {e}")
+        result = _compute_revenue(2)
+        result.pop('mrr_series')
+        return result
+
+    return {
+        **_revenue_summary(
+            current['mrr'], last_month['mrr'], current['active_subscriptions'], current['by_platform']
+        ),
+        'extensions': aggregate_extension_stats(subscriptions_ref),
+    }
+
+
+def _revenue_summary(current_mrr, last_month_mrr, active_subscriptions, by_platform):
+    """由當前 MRR 組裝收入摘要（ARR、ARPU）"""
+    return {
+        'current_month_revenue': current_mrr,
+        'last_month_revenue': last_month_mrr,
+        'annual_recurring_revenue': round(current_mrr * 12, 2),
+        'average_revenue_per_user': round(current_mrr / max(active_subscriptions, 1), 2),
+        'active_subscriptions': active_subscriptions,
+        'by_platform': by_platform,
+    }
+
+
+def _revenue_result(series):
+    """由 MRR 序列組裝收入統計"""
+    return {
+        **_revenue_summary(
+            series['mrr'][-1], series['mrr'][-2], series['active_subscriptions'], series['by_platform']
+        ),
+        'mrr_series': {
+            key: series[key]
+            for key in (
+                'months', 'mrr', 'recognized_revenue', 'new_mrr', 'expansion_mrr',
+                'contraction_mrr', 'churned_mrr', 'reactivated_mrr',
+            )
+        },
+    }
 
 
 @admin_analytics_bp.route('/retention', methods=['GET'])
@@ -338,98 +640,246 @@ def get_retention():
         return jsonify({'error': 'Service not available'}), 503
 
     try:
-        # 檢查緩存
-        cached_result = get_cached_data('retention')
-        if cached_result is not None:
-            return jsonify(cached_result), 200
+        result = get_cached_analytics('retention', _compute_retention)
+        return jsonify(result), 200
 
-        now = datetime.now(timezone.utc)
-        day_7_ago = now - timedelta(days=7)
-        day_30_ago = now - timedelta(days=30)
-        month_3_ago = now - timedelta(days=90)
+    except Exception as e:
+        logger.error(f"Error getting retention analysis: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
-        subscriptions_ref = db.collection('subscriptions')
 
-        # ✅ 優化: 使用 where 過濾特定時間範圍的用戶
-        # 7天前創建的用戶總數
-        users_7_days_ago = subscriptions_ref.where('created_at', '<=', day_7_ago).count().get()[0][0].value
+def _compute_retention():
+    """計算留存分析（不經過緩存）"""
+    now = datetime.now(timezone.utc)
+    day_7_ago = now - timedelta(days=7)
+    day_30_ago = now - timedelta(days=30)
+    month_3_ago = now - timedelta(days=90)
+
+    # ✅ 優先讀取今天的每日匯總，缺失或過期時才即時掃描
+    rollups = analytics_rollup_service.get_range(
+        now.date(), now.date(), max_age=ANALYTICS_CACHE_TTL['retention'], now=now
+    )
+    if rollups is not None:
+        return _retention_from_rollups(rollups[-1])
+
+    subscriptions_ref = db.collection('subscriptions')
+
+    # ✅ 優化: 使用 where 過濾特定時間範圍的用戶
+    # 7天前創建的用戶總數
+    users_7_days_ago = subscriptions_ref.where('created_at', '<=', day_7_ago).count().get()[0][0].value
+
+    # 30天前創建的用戶總數
+    users_30_days_ago = subscriptions_ref.where('created_at', '<=', day_30_ago).count().get()[0][0].value
+
+    # 90天前創建的用戶總數
+    users_90_days_ago = subscriptions_ref.where('created_at', '<=', month_3_ago).count().get()[0][0].value
+
+    # 統計活躍用戶（7天、30天、90天群組）
+    # 注意: 由於 Firestore 限制,我們需要分別查詢付費和試用活躍用戶
+    retained_7_days = 0
+    retained_30_days = 0
+    retained_90_days = 0
+
+    # 查詢活躍付費用戶（游標分頁，無數量上限）
+    active_premium = stream_subscription_rows(
+        subscriptions_ref.where('is_premium', '==', True).where('premium_end_at', '>', now),
+        order_by='premium_end_at'
+    )
+
+    # 查詢活躍試用用戶（游標分頁，無數量上限）
+    active_trial = stream_subscription_rows(
+        subscriptions_ref.where('is_premium', '==', False).where('trial_end_at', '>', now),
+        order_by='trial_end_at'
+    )
+
+    # 統計各時間段的留存
+    for row in chain(active_premium, active_trial):
+        try:
+            created_at = row.created_at
 
-        # 30天前創建的用戶總數
-        users_30_days_ago = subscriptions_ref.where('created_at', '<=', day_30_ago).count().get()[0][0].value
+            if not created_at or not isinstance(created_at, datetime):
+                continue
 
-        # 90天前創建的用戶總數
-        users_90_days_ago = subscriptions_ref.where('created_at', '<=', month_3_ago).count().get()[0][0].value
+            # 7天留存
+            if created_at <= day_7_ago:
+                retained_7_days += 1
 
-        # 統計活躍用戶（7天、30天、90天群組）
-        # 注意: 由於 Firestore 限制,我們需要分別查詢付費和試用活躍用戶
-        retained_7_days = 0
-        retained_30_days = 0
-        retained_90_days = 0
+            # 30天留存
+            if created_at <= day_30_ago:
+                retained_30_days += 1
 
-        # 查詢活躍付費用戶（限制1000筆）
-        active_premium = list(subscriptions_ref.where('is_premium', '==', True).where('premium_end_at', '>', now).limit(1000).stream())
+            # 90天留存
+            if created_at <= month_3_ago:
+                retained_90_days += 1
 
-        # 查詢活躍試用用戶（限制1000筆）
-        active_trial = list(subscriptions_ref.where('is_premium', '==', False).where('trial_end_at', '>', now).limit(1000).stream())
+        except Exception as e:
+            logger.warning(f"Failed to process subscription {row.uid}: {e}")
+            continue
+
+    return _retention_result({
+        7: {'total_users': users_7_days_ago, 'retained_users': retained_7_days},
+        30: {'total_users': users_30_days_ago, 'retained_users': retained_30_days},
+        90: {'total_users': users_90_days_ago, 'retained_users': retained_90_days},
+    })
+
+
+def _retention_result(cohorts):
+    """由 7 / 30 / 90 天群組的人數組裝留存分析"""
+    result = {}
+    for window, rate_key in ((7, 'day_7_retention'), (30, 'day_30_retention'), (90, 'month_3_retention')):
+        cohort = cohorts[window]
+        result[rate_key] = round(cohort['retained_users'] / max(cohort['total_users'], 1), 3)
+        result[f'cohort_{window}_days'] = {
+            'total_users': cohort['total_users'],
+            'retained_users': cohort['retained_users']
+        }
+    return result
 
-        # 統計各時間段的留存
-        for doc in active_premium + active_trial:
-            try:
-                data = doc.to_dict()
-                created_at = data.get('created_at')
 
-                if not created_at or not isinstance(created_at, datetime):
-                    continue
+@admin_analytics_bp.route('/retention/cohorts', methods=['GET'])
+@require_admin
+def get_retention_cohorts():
+    """
+    獲取群組留存矩陣（按註冊週/月分組）
 
-                # 7天留存
-                if created_at <= day_7_ago:
-                    retained_7_days += 1
+    Query Parameters:
+        - granularity: week 或 month（默認 week）
+        - periods: 群組數（默認 week 52、month 12，最大 52）
 
-                # 30天留存
-                if created_at <= day_30_ago:
-                    retained_30_days += 1
+    Returns:
+        {
+            "granularity": "week",
+            "periods": 52,
+            "cohorts": [
+                {
+                    "cohort": "2025-01-06",
+                    "size": 120,
+                    "retained": [118, 80, 65, ...],
+                    "retention": [0.983, 0.667, 0.542, ...]
+                },
+                ...
+            ]
+        }
 
-                # 90天留存
-                if created_at <= month_3_ago:
-                    retained_90_days += 1
+        retained[k] 為該群組在註冊後第 k 個週期內有試用或付費區間的人數。
+    """
+    if subscription_service is None or db is None:
+        return jsonify({'error': 'Service not available'}), 503
 
-            except Exception as e:
-                logger.warning(f"Failed to process subscription {doc.id}: {e}")
-                continue
+    try:
+        granularity = request.args.get('granularity', 'week')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': f'Invalid granularity: {granularity}'}), 400
+
+        default_periods = 52 if granularity == 'week' else 12
+        periods = max(1, min(int(request.args.get('periods', default_periods)), 52))
+
+        result = get_cached_analytics(
+            'retention_cohorts',
+            lambda: _compute_retention_cohorts(granularity, periods),
+            granularity=granularity,
+            periods=periods
+        )
+        return jsonify(result), 200
 
-        # 計算留存率
-        day_7_retention = (retained_7_days / max(users_7_days_ago, 1))
-        day_30_retention = (retained_30_days / max(users_30_days_ago, 1))
-        month_3_retention = (retained_90_days / max(users_90_days_ago, 1))
-
-        result = {
-            'day_7_retention': round(day_7_retention, 3),
-            'day_30_retention': round(day_30_retention, 3),
-            'month_3_retention': round(month_3_retention, 3),
-            'cohort_7_days': {
-                'total_users': users_7_days_ago,
-                'retained_users': retained_7_days
-            },
-            'cohort_30_days': {
-                'total_users': users_30_days_ago,
-                'retained_users': retained_30_days
+    except Exception as e:
+        logger.error(f"Error getting cohort retention: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+def _compute_retention_cohorts(granularity, periods):
+    """計算群組留存矩陣（不經過緩存）"""
+    now = datetime.now(timezone.utc)
+    window_start = period_starts(granularity, now, periods)[0]
+
+    # ✅ 只掃描窗口內註冊的用戶（投影字段），一次掃描得到整個矩陣
+    timeline = SubscriptionTimeline.from_subscriptions(
+        stream_subscription_rows(
+            db.collection('subscriptions').where('created_at', '>=', window_start),
+            order_by='created_at'
+        )
+    )
+    return compute_cohort_retention(timeline, granularity, periods, now=now)
+
+
+@admin_analytics_bp.route('/funnel', methods=['GET'])
+@require_admin
+def get_funnel():
+    """
+    獲取試用 → 付費轉換漏斗（按註冊週/月分組）
+
+    Query Parameters:
+        - granularity: week 或 month（默認 month）
+        - periods: 群組數（默認 12，最大 52）
+
+    Returns:
+        {
+            "granularity": "month",
+            "periods": 12,
+            "totals": {
+                "signup": 1000,
+                "trial": 950,
+                "premium": 200,
+                "renewal": 120,
+                "conversion": {
+                    "signup_to_trial": 0.95,
+                    "trial_to_premium": 0.211,
+                    "premium_to_renewal": 0.6
+                }
             },
-            'cohort_90_days': {
-                'total_users': users_90_days_ago,
-                'retained_users': retained_90_days
+            "cohorts": [
+                {"cohort": "2025-01", "signup": 80, "trial": 76, "premium": 15, "renewal": 9, "conversion": {...}},
+                ...
+            ],
+            "time_to_convert": {
+                "converted": 200,
+                "histogram": [{"bucket": "0-1", "count": 12}, ..., {"bucket": "90+", "count": 3}],
+                "percentiles": {"p25": 3.1, "p50": 8.0, "p75": 14.5, "p90": 31.2},
+                "mean": 11.7
             }
         }
 
-        # 設置緩存
-        set_cached_data('retention', result)
+        renewal 為付費區間已超過首個計費週期的用戶；
+        time_to_convert 為 trial_start_at 到 premium_start_at 的天數。
+    """
+    if subscription_service is None or db is None:
+        return jsonify({'error': 'Service not available'}), 503
 
+    try:
+        granularity = request.args.get('granularity', 'month')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': f'Invalid granularity: {granularity}'}), 400
+
+        periods = max(1, min(int(request.args.get('periods', 12)), 52))
+
+        result = get_cached_analytics(
+            'funnel',
+            lambda: _compute_funnel(granularity, periods),
+            granularity=granularity,
+            periods=periods
+        )
         return jsonify(result), 200
 
     except Exception as e:
-        logger.error(f"Error getting retention analysis: {e}", exc_info=True)
+        logger.error(f"Error getting conversion funnel: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+def _compute_funnel(granularity, periods):
+    """計算轉換漏斗（不經過緩存）"""
+    now = datetime.now(timezone.utc)
+    window_start = period_starts(granularity, now, periods)[0]
+
+    # ✅ 只掃描窗口內註冊的用戶（投影字段），一次掃描得到所有群組與分佈
+    timeline = SubscriptionTimeline.from_subscriptions(
+        stream_subscription_rows(
+            db.collection('subscriptions').where('created_at', '>=', window_start),
+            order_by='created_at'
+        )
+    )
+    return compute_conversion_funnel(timeline, granularity, periods, now=now)
+
+
 @admin_analytics_bp.route('/trends', methods=['GET'])
 @require_admin
 def get_trends():
@@ -437,133 +887,206 @@ def get_trends():
     獲取趨勢數據（過去 30 天）
 
     Query Parameters:
-        - days: 要獲取的天數（默認 30，最大 90）
+        - days: 要獲取的天數（默認 30，範圍 1–90）
 
     Returns:
         {
             "dates": ["2025-11-01", "2025-11-02", ...],
             "new_users": [5, 8, 12, ...],
             "new_premium_users": [1, 2, 1, ...],
-            "active_users": [100, 105, 115, ...]
+            "active_users": [100, 105, 115, ...],
+            "active_trial_users": [60, 62, 70, ...],
+            "active_premium_users": [40, 43, 45, ...]
         }
+
+        active_* 為每天結束時（今天為當前時間）的精確活躍人數。
     """
     if subscription_service is None or db is None:
         return jsonify({'error': 'Service not available'}), 503
 
     try:
         # 獲取查詢參數
-        days = min(int(request.args.get('days', 30)), 90)
+        days = max(1, min(int(request.args.get('days', 30)), 90))
 
-        # 檢查緩存
-        cached_result = get_cached_data('trends', days=days)
-        if cached_result is not None:
-            return jsonify(cached_result), 200
+        result = get_cached_analytics('trends', lambda: _compute_trends(days), days=days)
+        return jsonify(result), 200
 
-        now = datetime.now(timezone.utc)
-        start_date = now - timedelta(days=days)
-
-        subscriptions_ref = db.collection('subscriptions')
-
-        # 初始化趨勢數據
-        trends_data = {}
-        for i in range(days + 1):
-            date = start_date + timedelta(days=i)
-            date_key = date.strftime('%Y-%m-%d')
-            trends_data[date_key] = {
-                'new_users': 0,
-                'new_premium_users': 0,
-                'active_users': 0
-            }
+    except Exception as e:
+        logger.error(f"Error getting trends data: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
-        # ✅ 優化1: 只查詢時間範圍內創建的用戶（新用戶統計）
-        new_users_docs = list(
-            subscriptions_ref
-            .where('created_at', '>=', start_date)
-            .limit(2000)
-            .stream()
-        )
 
-        for doc in new_users_docs:
-            try:
-                data = doc.to_dict()
-                created_at = data.get('created_at')
+def _compute_trends(days):
+    """計算趨勢數據（不經過緩存）"""
+    now = datetime.now(timezone.utc)
+    start_date = now - timedelta(days=days)
+
+    # ✅ 優先讀取每日匯總，缺失或過期時才即時掃描
+    rollups = analytics_rollup_service.get_range(
+        start_date.date(), now.date(), max_age=ANALYTICS_CACHE_TTL['trends'], now=now
+    )
+    if rollups is not None:
+        return _trends_from_rollups(rollups)
+
+    # ✅ 一次掃描所有訂閱的區間字段，用 sweep-line 計算每天精確的活躍人數
+    # 成本與查詢天數無關（7 天與 90 天都只需一次掃描）
+    timeline = SubscriptionTimeline.from_subscriptions(
+        stream_subscription_rows(db.collection('subscriptions'))
+    )
+    return _trends_result(compute_daily_activity(timeline, start_date.date(), now.date(), now=now))
+
+
+def _trends_result(activity):
+    """由每日活躍數據組裝趨勢數據"""
+    active_trial = activity['active_trial_users'].tolist()
+    active_premium = activity['active_premium_users'].tolist()
+
+    return {
+        'dates': activity['dates'],
+        'new_users': activity['new_users'].tolist(),
+        'new_premium_users': activity['new_premium_users'].tolist(),
+        'active_users': [t + p for t, p in zip(active_trial, active_premium)],
+        'active_trial_users': active_trial,
+        'active_premium_users': active_premium,
+    }
+
+
+# ========== 每日匯總（analytics_daily） ==========
+
+def _overview_from_rollups(rollups, week_start, month_start):
+    """從每日匯總計算總覽統計"""
+    latest = rollups[-1]
+    week_key = week_start.strftime('%Y-%m-%d')
+    month_key = month_start.strftime('%Y-%m-%d')
+
+    return _overview_result({
+        'total_users': latest['total_users'],
+        'trial_users': latest['active_trials'],
+        'premium_users': latest['premium_users'],
+        'active_premium_users': latest['active_premium'],
+        'today_new_users': latest['new_users'],
+        'this_week_new_users': sum(r['new_users'] for r in rollups if r['date'] >= week_key),
+        'this_month_new_users': sum(r['new_users'] for r in rollups if r['date'] >= month_key),
+    })
+
+
+def _revenue_from_rollups(rollups, month_start):
+    """從每日匯總計算收入摘要（今天與上月最後一天的快照 MRR）"""
+    latest = rollups[-1]
+    month_key = month_start.strftime('%Y-%m-%d')
+    last_month = [r for r in rollups if r['date'] < month_key][-1]
+
+    return {
+        **_revenue_summary(
+            latest['revenue'], last_month['revenue'], latest['active_premium'], latest['revenue_by_platform']
+        ),
+        'extensions': aggregate_extension_stats(db.collection('subscriptions')),
+    }
+
+
+def _retention_from_rollups(rollup):
+    """從今天的每日匯總計算留存分析"""
+    return _retention_result({
+        window: {
+            'total_users': rollup['retention'][f'day_{window}']['cohort_users'],
+            'retained_users': rollup['retention'][f'day_{window}']['retained_users']
+        }
+        for window in (7, 30, 90)
+    })
 
-                if created_at and isinstance(created_at, datetime):
-                    date_key = created_at.strftime('%Y-%m-%d')
-                    if date_key in trends_data:
-                        trends_data[date_key]['new_users'] += 1
 
-            except Exception as e:
-                logger.warning(f"Failed to process new user {doc.id}: {e}")
-                continue
+def _trends_from_rollups(rollups):
+    """從每日匯總生成趨勢數據"""
+    return {
+        'dates': [r['date'] for r in rollups],
+        'new_users': [r['new_users'] for r in rollups],
+        'new_premium_users': [r['new_premium_users'] for r in rollups],
+        'active_users': [r['active_trials'] + r['active_premium'] for r in rollups],
+        'active_trial_users': [r['active_trials'] for r in rollups],
+        'active_premium_users': [r['active_premium'] for r in rollups],
+    }
 
-        # ✅ 優化2: 只查詢時間範圍內開始付費的用戶（新付費用戶統計）
-        new_premium_docs = list(
-            subscriptions_ref
-            .where('is_premium', '==', True)
-            .where('premium_start_at', '>=', start_date)
-            .limit(2000)
-            .stream()
-        )
 
-        for doc in new_premium_docs:
-            try:
-                data = doc.to_dict()
-                premium_start = data.get('premium_start_at')
+@admin_analytics_bp.route('/rollups/refresh', methods=['POST'])
+@require_admin
+def refresh_rollups():
+    """
+    重建每日匯總（供 Cloud Scheduler 等排程任務定期調用）
 
-                if premium_start and isinstance(premium_start, datetime):
-                    date_key = premium_start.strftime('%Y-%m-%d')
-                    if date_key in trends_data:
-                        trends_data[date_key]['new_premium_users'] += 1
+    Request Body (optional):
+        {
+            "days": 2  # 重建最近 N 天（含今天），默認 2，最大 400
+        }
 
-            except Exception as e:
-                logger.warning(f"Failed to process new premium user {doc.id}: {e}")
-                continue
+    Returns:
+        {
+            "success": true,
+            "rebuilt_days": 2
+        }
+    """
+    if db is None:
+        return jsonify({'error': 'Service not available'}), 503
+
+    try:
+        data = request.get_json(silent=True) or {}
+        days = data.get('days', 2)
+        if not isinstance(days, int) or days <= 0 or days > 400:
+            return jsonify({'error': 'Invalid days parameter'}), 400
+
+        rebuilt = analytics_rollup_service.refresh_recent(days)
 
-        # ✅ 優化3: 活躍用戶統計 - 簡化版本
-        # 注意: 完整的每日活躍用戶統計需要遍歷所有用戶，這裡使用近似算法
-        # 只統計最後一天的活躍用戶數，其他天使用估算
-        logger.info("Calculating active users for trends (simplified)")
-
-        # 查詢今日活躍的付費用戶
-        active_premium_today = subscriptions_ref.where('is_premium', '==', True).where('premium_end_at', '>', now).limit(1000).stream()
-        active_premium_count = sum(1 for _ in active_premium_today)
-
-        # 查詢今日活躍的試用用戶
-        active_trial_today = subscriptions_ref.where('is_premium', '==', False).where('trial_end_at', '>', now).limit(1000).stream()
-        active_trial_count = sum(1 for _ in active_trial_today)
-
-        # 今日總活躍用戶
-        total_active_today = active_premium_count + active_trial_count
-
-        # 對於歷史日期，使用線性估算（從 start_date 的活躍用戶數到今日的活躍用戶數）
-        # 這是一個簡化的方法，避免對每一天都進行全量查詢
-        for i in range(days + 1):
-            date_key = (start_date + timedelta(days=i)).strftime('%Y-%m-%d')
-            # 簡單估算: 假設活躍用戶數線性增長
-            estimated_active = int(total_active_today * (0.8 + 0.2 * i / days))  # 從80%增長到100%
-            trends_data[date_key]['active_users'] = estimated_active
-
-        # 最後一天使用實際值
-        today_key = now.strftime('%Y-%m-%d')
-        if today_key in trends_data:
-            trends_data[today_key]['active_users'] = total_active_today
-
-        # 格式化輸出
-        sorted_dates = sorted(trends_data.keys())
-        result = {
-            'dates': sorted_dates,
-            'new_users': [trends_data[date]['new_users'] for date in sorted_dates],
-            'new_premium_users': [trends_data[date]['new_premium_users'] for date in sorted_dates],
-            'active_users': [trends_data[date]['active_users'] for date in sorted_dates],
-            'note': 'Active users are estimated for performance. For exact data, please use a dedicated analytics tool.'
+        # 匯總已更新，清空緩存讓下一次請求讀取新數據
+        _analytics_cache.clear()
+
+        admin_info = get_admin_info()
+        logger.info(f"Admin {admin_info['email']} refreshed {rebuilt} analytics rollups")
+
+        return jsonify({
+            'success': True,
+            'rebuilt_days': rebuilt
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error refreshing analytics rollups: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_analytics_bp.route('/cache/warm', methods=['POST'])
+@require_admin
+def warm_cache():
+    """
+    預熱常用分析緩存（供 Cloud Scheduler 等排程任務定期調用）
+
+    重算 dashboard / overview / revenue / retention / trends（Dashboard 默認參數）中
+    已過期或即將過期的結果，讓 Dashboard 請求總是命中緩存。
+
+    Request Body (optional):
+        {
+            "margin": 60  # 剩餘有效期少於 N 秒的結果也重算，默認 60
         }
 
-        # 設置緩存
-        set_cached_data('trends', result, days=days)
+    Returns:
+        {
+            "success": true,
+            "refreshed": ["overview", "trends"]
+        }
+    """
+    if subscription_service is None or db is None:
+        return jsonify({'error': 'Service not available'}), 503
 
-        return jsonify(result), 200
+    try:
+        data = request.get_json(silent=True) or {}
+        margin = data.get('margin', 60)
+        if not isinstance(margin, (int, float)) or margin < 0:
+            return jsonify({'error': 'Invalid margin parameter'}), 400
+
+        refreshed = warm_analytics_cache(margin=margin)
+
+        return jsonify({
+            'success': True,
+            'refreshed': refreshed
+        }), 200
 
     except Exception as e:
-        logger.error(f"Error getting trends data: {e}", exc_info=True)
+        logger.error(f"Error warming analytics cache: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
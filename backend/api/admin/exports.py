@@ -0,0 +1,103 @@
+"""
+快照導出 API
+
+把 Firestore 集合導出為列式文件（Parquet / Arrow）供離線分析下載。
+導出包含用戶 Email 等個人資料，只有 Super Admin 可以訪問，並記錄審計日誌。
+
+API 端點:
+- GET /api/v1/admin/exports/<collection>?format=parquet - 下載集合快照
+  collection: subscriptions | users | invite_code_usages
+"""
+from flask import Blueprint, jsonify, request, send_file
+from datetime import datetime, timezone
+import logging
+import os
+import tempfile
+
+try:
+    from firebase_admin import firestore
+    from utils.firebase_init import init_firebase
+
+    # 確保 Firebase 已初始化
+    init_firebase()
+    db = firestore.client()
+except Exception as e:
+    logging.warning(f"Could not initialize Firebase: {e}")
+    db = None
+
+from middleware.admin_auth import require_super_admin, get_admin_info
+from services.audit_log_service import audit_log_service
+from services.snapshot_export import EXPORT_SPECS, FORMATS, export_collection, pa
+
+logger = logging.getLogger(__name__)
+
+admin_exports_bp = Blueprint('admin_exports', __name__)
+
+MIME_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+
+@admin_exports_bp.route('/<collection>', methods=['GET'])
+@require_super_admin
+def export_snapshot(collection: str):
+    """
+    下載集合的列式快照
+
+    Args:
+        collection: subscriptions | users | invite_code_usages
+
+    Query Parameters:
+        - format: parquet（默認）或 arrow
+
+    Returns:
+        列式文件（附件下載），文件先分塊寫入臨時目錄，響應結束後刪除
+    """
+    if db is None or pa is None:
+        return jsonify({'error': 'Service not available'}), 503
+
+    if collection not in EXPORT_SPECS:
+        return jsonify({'error': f'Invalid collection: {collection}'}), 400
+
+    file_format = request.args.get('format', 'parquet')
+    if file_format not in FORMATS:
+        return jsonify({'error': f'Invalid format: {file_format}'}), 400
+
+    admin_info = get_admin_info()
+    fd, path = tempfile.mkstemp(suffix=f'.{file_format}')
+    os.close(fd)
+
+    try:
+        stats = export_collection(db, collection, path, file_format=file_format)
+
+        audit_log_service.log_action(
+            admin_uid=admin_info['uid'],
+            admin_email=admin_info['email'],
+            admin_role=admin_info['role'],
+            action_type='export_snapshot',
+            details={
+                'collection': collection,
+                'format': file_format,
+                'rows': stats['rows']
+            },
+            ip_address=request.headers.get('X-Forwarded-For', request.remote_addr),
+            user_agent=request.headers.get('User-Agent')
+        )
+
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        response = send_file(
+            path,
+            mimetype=MIME_TYPES[file_format],
+            as_attachment=True,
+            download_name=f'{collection}_{stamp}.{file_format}'
+        )
+        response.headers['X-Export-Rows'] = str(stats['rows'])
+        response.call_on_close(lambda: os.remove(path))
+        return response
+
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        logger.error(f"Error exporting {collection} snapshot: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
@@ -9,11 +9,14 @@ API 端點:
 - GET /api/v1/admin/invite-codes/{code}/usages - 獲取邀請碼使用記錄
 - POST /api/v1/admin/invite-codes/{code}/disable - 禁用邀請碼
 - GET /api/v1/admin/invite-codes/stats - 獲取邀請碼統計
+- GET /api/v1/admin/invite-codes/leaderboard - 獲取邀請排行榜與病毒係數
 """
 from flask import Blueprint, request, jsonify, g
 import logging
+import re
 import sys
 import os
+from datetime import datetime, timezone
 
 try:
     from firebase_admin import firestore
@@ -39,12 +42,24 @@ except ImportError as e:
 
 from middleware.admin_auth import require_admin, get_admin_info
 from services.audit_log_service import audit_log_service
+from services.referral_leaderboard import get_leaderboard
+from utils.cache import TTLCache, cache_key
+from utils.concurrency import count_query, fan_out
+from utils.list_counts import invalidate_counts, list_total, parse_count_mode
+from utils.pagination import InvalidCursor, paginate
 
 logger = logging.getLogger(__name__)
 
 # 創建 Blueprint
 admin_invite_codes_bp = Blueprint('admin_invite_codes', __name__)
 
+# 排行榜結果緩存（過期後重算時只增量讀取新的使用記錄）
+LEADERBOARD_CACHE_TTL = 120  # 2 minutes
+_leaderboard_cache = TTLCache('invite_leaderboard', max_entries=32, default_ttl=LEADERBOARD_CACHE_TTL)
+
+# 排行榜窗口：Nd（1-365 天）或 all
+_WINDOW_PATTERN = re.compile(r'^(\d{1,3})d$')
+
 
 @admin_invite_codes_bp.route('', methods=['GET'])
 @admin_invite_codes_bp.route('/', methods=['GET'])
@@ -54,8 +69,10 @@ def list_invite_codes():
     獲取邀請碼列表
 
     Query Parameters:
-        - page: 頁碼（默認 1）
+        - page: 頁碼（默認 1；沒有 cursor 時使用，深度翻頁請改用 cursor）
+        - cursor: 上一次返回的 next_cursor / prev_cursor（每頁只讀取 limit 筆）
         - limit: 每頁數量（默認 50，最大 100）
+        - count: 總數模式 approx（默認，短 TTL 緩存）/ exact（重新計數）/ none（不計數，total 為 null）
         - status: 篩選狀態 (active, inactive, all)
         - owner_uid: 按擁有者 UID 篩選
 
@@ -66,7 +83,9 @@ def list_invite_codes():
                 "page": 1,
                 "limit": 50,
                 "total": 100,
-                "total_pages": 2
+                "total_pages": 2,
+                "next_cursor": "eyJzIjoi...",
+                "prev_cursor": null
             }
         }
     """
@@ -79,12 +98,11 @@ def list_invite_codes():
         limit = min(int(request.args.get('limit', 50)), 100)
         status_filter = request.args.get('status', 'all')
         owner_uid = request.args.get('owner_uid')
+        cursor = request.args.get('cursor')
+        count_mode = parse_count_mode(request.args.get('count'))
 
-        # 計算偏移量
-        offset = (page - 1) * limit
-
-        # 查詢邀請碼
-        query = db.collection('invite_codes').order_by('created_at', direction=firestore.Query.DESCENDING)
+        # 查詢邀請碼（按 created_at 降序，排序由 paginate 加上）
+        query = db.collection('invite_codes')
 
         # 應用篩選
         if status_filter == 'active':
@@ -95,12 +113,16 @@ def list_invite_codes():
         if owner_uid:
             query = query.where('owner_uid', '==', owner_uid)
 
-        # 使用聚合查詢獲取總數（高效，不讀取文檔內容）
-        agg_result = query.count().get()
-        total = agg_result[0][0].value
+        # 總數（按 count 模式使用緩存的聚合結果；未知狀態不篩選）
+        count_status = status_filter if status_filter in ('active', 'inactive') else 'all'
+        total = list_total(query, 'invite_codes', count_mode, status=count_status, owner_uid=owner_uid or '')
 
-        # 分頁查詢
-        docs = list(query.limit(limit).offset(offset).stream())
+        # 游標分頁查詢
+        result = paginate(
+            query, limit, cursor=cursor, page=page, sort=[('created_at', True)],
+            scope=f'invite_codes:{status_filter}:{owner_uid or ""}'
+        )
+        docs = result.docs
 
         # 格式化數據
         invite_codes = []
@@ -128,18 +150,24 @@ def list_invite_codes():
                 continue
 
         # 計算分頁信息
-        total_pages = (total + limit - 1) // limit
+        total_pages = (total + limit - 1) // limit if total is not None else None
 
         return jsonify({
             'data': invite_codes,
             'pagination': {
-                'page': page,
+                'page': None if cursor else page,
                 'limit': limit,
                 'total': total,
-                'total_pages': total_pages
+                'total_pages': total_pages,
+                'next_cursor': result.next_cursor,
+                'prev_cursor': result.prev_cursor
             }
         }), 200
 
+    except InvalidCursor as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
+    except ValueError as e:
+        return jsonify({'error': 'Invalid parameters', 'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing invite codes: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -312,6 +340,7 @@ def disable_invite_code(code: str):
         subscription_service.repo.update_invite_code(code.upper(), {
             'is_active': False
         })
+        invalidate_counts('invite_codes')
 
         # 記錄審計日誌
         admin_info = get_admin_info()
@@ -361,22 +390,27 @@ def get_invite_code_stats():
         return jsonify({'error': 'Service not available'}), 503
 
     try:
-        # 使用聚合查詢統計邀請碼（高效，不讀取文檔內容）
+        # 使用聚合查詢統計邀請碼與使用記錄（高效，不讀取文檔內容），4 個查詢並發執行
         codes_ref = db.collection('invite_codes')
-        total_codes = codes_ref.count().get()[0][0].value
-        active_codes = codes_ref.where('is_active', '==', True).count().get()[0][0].value
-        inactive_codes = total_codes - active_codes
-
-        # 使用聚合查詢統計使用記錄
         usages_ref = db.collection('invite_code_usages')
-        total_usages = usages_ref.count().get()[0][0].value
-        rewarded_usages = usages_ref.where('reward_granted', '==', True).count().get()[0][0].value
+        counts, errors = fan_out({
+            'total_codes': lambda: count_query(codes_ref),
+            'active_codes': lambda: count_query(codes_ref.where('is_active', '==', True)),
+            'total_usages': lambda: count_query(usages_ref),
+            'rewarded_usages': lambda: count_query(usages_ref.where('reward_granted', '==', True)),
+        }, default=0)
+
+        total_codes = counts['total_codes']
+        active_codes = counts['active_codes']
+        inactive_codes = total_codes - active_codes
+        total_usages = counts['total_usages']
+        rewarded_usages = counts['rewarded_usages']
         pending_rewards = total_usages - rewarded_usages
 
         # 計算轉換率（已發放獎勵 / 總使用次數）
         conversion_rate = (rewarded_usages / total_usages) if total_usages > 0 else 0.0
 
-        return jsonify({
+        result = {
             'total_codes': total_codes,
             'active_codes': active_codes,
             'inactive_codes': inactive_codes,
@@ -384,8 +418,89 @@ def get_invite_code_stats():
             'rewarded_usages': rewarded_usages,
             'pending_rewards': pending_rewards,
             'conversion_rate': round(conversion_rate, 3)
-        }), 200
+        }
+        if errors:
+            # 部分查詢失敗：返回部分結果，並標記失敗的指標
+            result['partial_failures'] = sorted(errors)
+
+        return jsonify(result), 200
 
     except Exception as e:
         logger.error(f"Error getting invite code stats: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
+
+
+@admin_invite_codes_bp.route('/leaderboard', methods=['GET'])
+@require_admin
+def get_invite_leaderboard():
+    """
+    獲取邀請排行榜與病毒係數
+
+    Query Parameters:
+        - k: 排行榜人數（默認 50，最大 200）
+        - window: 時間窗口，按 used_at 計算（Nd，1-365 天，或 all；默認 30d）
+
+    Returns:
+        {
+            "window": "30d",
+            "k": 50,
+            "top_by_usages": [
+                {"inviter_uid": "...", "usages": 12, "rewarded_usages": 8},
+                ...
+            ],
+            "top_by_rewarded_usages": [...],
+            "usages": 350,
+            "rewarded_usages": 280,
+            "inviters": 120,
+            "invites_per_inviter": 2.917,
+            "invites_per_user": 0.035,
+            "conversion_rate": 0.8,
+            "virality_coefficient": 0.028,
+            "computed_at": "..."
+        }
+
+        virality_coefficient = invites_per_user（窗口內使用次數 / 總用戶數）× conversion_rate
+    """
+    if subscription_service is None or db is None:
+        return jsonify({'error': 'Service not available'}), 503
+
+    try:
+        k = request.args.get('k', 50, type=int)
+        if k is None or k <= 0 or k > 200:
+            return jsonify({'error': 'Invalid k parameter'}), 400
+
+        window = request.args.get('window', '30d')
+        match = _WINDOW_PATTERN.match(window)
+        if window == 'all':
+            window_days = None
+        elif match and 1 <= int(match.group(1)) <= 365:
+            window_days = int(match.group(1))
+        else:
+            return jsonify({'error': f'Invalid window: {window}'}), 400
+
+        result = _leaderboard_cache.get_or_compute(
+            cache_key('leaderboard', k=k, window=window),
+            lambda: _compute_leaderboard(window, window_days, k)
+        )
+        return jsonify(result), 200
+
+    except Exception as e:
+        logger.error(f"Error getting invite leaderboard: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+def _compute_leaderboard(window, window_days, k):
+    """增量刷新窗口狀態並生成排行榜（不經過緩存）"""
+    board = get_leaderboard(window_days)
+
+    # ✅ 首次全量掃描窗口，之後只讀取 used_at / reward_granted_at 游標之後的記錄
+    read = board.refresh(db.collection('invite_code_usages'))
+    logger.info(f"Invite leaderboard ({window}) refreshed with {read} usage document(s)")
+
+    total_users = count_query(db.collection('subscriptions'))
+    return {
+        'window': window,
+        'k': k,
+        **board.result(k, total_users),
+        'computed_at': datetime.now(timezone.utc).isoformat(),
+    }
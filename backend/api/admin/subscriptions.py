@@ -37,6 +37,8 @@ except ImportError as e:
 
 from middleware.admin_auth import require_admin, get_admin_info
 from services.audit_log_service import audit_log_service
+from utils.list_counts import invalidate_counts, list_total, parse_count_mode
+from utils.pagination import paginate
 
 logger = logging.getLogger(__name__)
 
@@ -52,8 +54,10 @@ def list_subscriptions():
     獲取訂閱列表
 
     Query Parameters:
-        - page: 頁碼（默認 1）
+        - page: 頁碼（默認 1；沒有 cursor 時使用，深度翻頁請改用 cursor）
+        - cursor: 上一次返回的 next_cursor / prev_cursor（每頁只讀取 limit 筆）
         - limit: 每頁數量（默認 50，最大 100）
+        - count: 總數模式 approx（默認，短 TTL 緩存）/ exact（重新計數）/ none（不計數，total 為 null）
         - status: 篩選狀態 (in_trial, premium_active, expired, all)
 
     Returns:
@@ -63,7 +67,9 @@ def list_subscriptions():
                 "page": 1,
                 "limit": 50,
                 "total": 100,
-                "total_pages": 2
+                "total_pages": 2,
+                "next_cursor": "eyJzIjoi...",
+                "prev_cursor": null
             }
         }
     """
@@ -75,27 +81,32 @@ def list_subscriptions():
         page = int(request.args.get('page', 1))
         limit = min(int(request.args.get('limit', 50)), 100)
         status_filter = request.args.get('status', 'all')
+        cursor = request.args.get('cursor')
+        count_mode = parse_count_mode(request.args.get('count'))
 
-        # 計算偏移量
-        offset = (page - 1) * limit
-
-        # 查詢訂閱
+        # 查詢訂閱（默認按 UID 排序）
         query = db.collection('subscriptions')
+        sort = []
 
         # 應用狀態篩選
         if status_filter == 'in_trial':
-            # 試用中的用戶
+            # 試用中的用戶（不等過濾要求第一個排序字段是 trial_start_at）
             query = query.where('trial_start_at', '!=', None)
+            sort = [('trial_start_at', False)]
         elif status_filter == 'premium_active':
             # 付費中的用戶
             query = query.where('is_premium', '==', True)
 
-        # 使用聚合查詢獲取總數（高效，不讀取文檔內容）
-        agg_result = query.count().get()
-        total = agg_result[0][0].value
+        # 總數（按 count 模式使用緩存的聚合結果；未知狀態不篩選）
+        count_status = status_filter if status_filter in ('in_trial', 'premium_active') else 'all'
+        total = list_total(query, 'subscriptions', count_mode, status=count_status)
 
-        # 分頁查詢
-        docs = list(query.limit(limit).offset(offset).stream())
+        # 游標分頁查詢
+        result = paginate(
+            query, limit, cursor=cursor, page=page, sort=sort,
+            scope=f'subscriptions:{status_filter}'
+        )
+        docs = result.docs
 
         # 批量獲取用戶信息（減少查詢次數）
         uids = [doc.id for doc in docs]
@@ -124,7 +135,7 @@ def list_subscriptions():
             subscriptions.append(data)
 
         # 計算總頁數
-        total_pages = (total + limit - 1) // limit
+        total_pages = (total + limit - 1) // limit if total is not None else None
 
         admin_info = get_admin_info()
         logger.info(f"Admin {admin_info['email']} listed subscriptions (page={page}, limit={limit})")
@@ -132,14 +143,17 @@ def list_subscriptions():
         return jsonify({
             'data': subscriptions,
             'pagination': {
-                'page': page,
+                'page': None if cursor else page,
                 'limit': limit,
                 'total': total,
-                'total_pages': total_pages
+                'total_pages': total_pages,
+                'next_cursor': result.next_cursor,
+                'prev_cursor': result.prev_cursor
             }
         }), 200
 
     except ValueError as e:
+        # 包括 InvalidCursor
         return jsonify({'error': 'Invalid parameters', 'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing subscriptions: {e}", exc_info=True)
@@ -266,6 +280,7 @@ def extend_subscription(uid: str):
             granted_by=admin_uid,
             notes=notes
         )
+        invalidate_counts('subscriptions')
 
         # 記錄審計日誌
         audit_log_service.log_action(
@@ -377,6 +392,7 @@ def cancel_subscription(uid: str):
             'cancelled_by': admin_uid,
             'updated_at': cancelled_at
         })
+        invalidate_counts('subscriptions')
 
         # 記錄審計日誌
         audit_log_service.log_action(
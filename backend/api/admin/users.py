@@ -6,6 +6,7 @@
 API 端點:
 - GET /api/v1/admin/users - 獲取用戶列表
 - GET /api/v1/admin/users/{uid} - 獲取用戶詳情
+- GET /api/v1/admin/users/{uid}/full - 用戶詳情頁的所有面板（一次請求）
 """
 from flask import Blueprint, request, jsonify, g
 import logging
@@ -25,6 +26,12 @@ except Exception as e:
     db = None
 
 from middleware.admin_auth import require_admin
+from middleware.conditional import latest_modified, not_modified
+from services.readiness_cache import inject_trend_data, readiness_cache
+from services.user_search_index import SearchIndexNotReady, user_search_index
+from utils.concurrency import fan_out
+from utils.list_counts import list_total, parse_count_mode
+from utils.pagination import DESCENDING, InvalidCursor, paginate
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +39,16 @@ logger = logging.getLogger(__name__)
 admin_users_bp = Blueprint('admin_users', __name__)
 
 
+def start_user_search_index():
+    """啟動用戶搜尋索引的背景刷新（每個進程只啟動一次；Firestore 不可用時不啟動）"""
+    if db is not None:
+        user_search_index.start(db)
+
+
+# /full 可以包含的面板
+FULL_PANELS = ('training_overview', 'weekly_plan', 'weekly_summary', 'readiness', 'readiness_history')
+
+
 @admin_users_bp.route('', methods=['GET'])
 @admin_users_bp.route('/', methods=['GET'])
 @require_admin
@@ -40,9 +57,11 @@ def list_users():
     獲取用戶列表
 
     Query Parameters:
-        - page: 頁碼（默認 1）
+        - page: 頁碼（默認 1；沒有 cursor 時使用，深度翻頁請改用 cursor）
+        - cursor: 上一次返回的 next_cursor / prev_cursor（按 UID 排序，每頁只讀取 limit 筆）
         - limit: 每頁數量（默認 50，最大 100）
-        - search: 搜尋 UID 或 email
+        - count: 總數模式 approx（默認，短 TTL 緩存）/ exact（重新計數）/ none（不計數，total 為 null）
+        - search: 搜尋 UID、email 或顯示名稱（部分匹配按相關度排序）
 
     Returns:
         {
@@ -51,7 +70,9 @@ def list_users():
                 "page": 1,
                 "limit": 50,
                 "total": 100,
-                "total_pages": 2
+                "total_pages": 2,
+                "next_cursor": "eyJzIjoi...",
+                "prev_cursor": null
             }
         }
     """
@@ -63,6 +84,9 @@ def list_users():
         page = int(request.args.get('page', 1))
         limit = min(int(request.args.get('limit', 50)), 100)
         search = request.args.get('search', '').strip()
+        cursor = request.args.get('cursor')
+        count_mode = parse_count_mode(request.args.get('count'))
+        next_cursor = prev_cursor = None
 
         # 計算偏移量
         offset = (page - 1) * limit
@@ -97,42 +121,44 @@ def list_users():
                 except Exception as e:
                     logger.debug(f"Email lookup failed: {e}")
 
-            # 優化策略3: 如果上述都沒找到，進行部分匹配 (限制最大讀取數量)
-            if not all_users:
-                # ⚠️ 警告: 部分匹配需要讀取多個文檔
-                # 為了避免讀取所有用戶，我們限制最大讀取數量為500
-                MAX_SEARCH_DOCS = 500
-                logger.warning(f"Performing partial match search (limited to {MAX_SEARCH_DOCS} docs)")
-
-                count = 0
-                for doc in users_ref.limit(MAX_SEARCH_DOCS).stream():
-                    user_data = doc.to_dict()
-                    user_data['uid'] = doc.id
-                    count += 1
-
-                    # 搜尋 UID 或 email (部分匹配)
-                    if (search.lower() in doc.id.lower() or
-                        (user_data.get('email', '').lower() and search.lower() in user_data.get('email', '').lower())):
-                        all_users.append(user_data)
-
-                if count >= MAX_SEARCH_DOCS:
-                    logger.warning(f"Search reached max document limit ({MAX_SEARCH_DOCS}). Results may be incomplete.")
-
-            # 分頁
-            total = len(all_users)
-            users = all_users[offset:offset + limit]
+            if all_users:
+                # 分頁
+                total = len(all_users)
+                users = all_users[offset:offset + limit]
+            else:
+                # 優化策略3: 部分匹配走用戶搜尋索引（email / UID / display_name，按相關度排序），
+                # 索引由背景執行緒維護，這裡只讀取當前頁的用戶文檔
+                start_user_search_index()
+                try:
+                    page_uids, total = user_search_index.search(search, offset=offset, limit=limit)
+                except SearchIndexNotReady:
+                    return jsonify({
+                        'error': 'Search index warming up',
+                        'message': 'User search is still loading, please retry shortly'
+                    }), 503
+                docs = {
+                    doc.id: doc
+                    for doc in db.get_all([users_ref.document(uid) for uid in page_uids])
+                    if doc.exists
+                } if page_uids else {}
+                users = []
+                for uid in page_uids:
+                    if uid in docs:
+                        user_data = docs[uid].to_dict()
+                        user_data['uid'] = uid
+                        users.append(user_data)
         else:
-            # 沒有搜尋條件，直接分頁查詢
-            docs = users_ref.limit(limit).offset(offset).stream()
+            # 沒有搜尋條件，按 UID 游標分頁查詢
+            result = paginate(users_ref, limit, cursor=cursor, page=page, scope='users')
+            next_cursor, prev_cursor = result.next_cursor, result.prev_cursor
             users = []
-            for doc in docs:
+            for doc in result.docs:
                 user_data = doc.to_dict()
                 user_data['uid'] = doc.id
                 users.append(user_data)
 
-            # 使用 Firestore 聚合查詢獲取總數（不讀取文檔內容，高效！）
-            agg_result = users_ref.count().get()
-            total = agg_result[0][0].value
+            # 總數（按 count 模式使用緩存的聚合結果）
+            total = list_total(users_ref, 'users', count_mode)
 
         # 格式化用戶數據
         formatted_users = []
@@ -155,18 +181,24 @@ def list_users():
             formatted_users.append(formatted_user)
 
         # 計算總頁數
-        total_pages = (total + limit - 1) // limit
+        total_pages = (total + limit - 1) // limit if total is not None else None
 
         return jsonify({
             'data': formatted_users,
             'pagination': {
-                'page': page,
+                'page': None if cursor and not search else page,
                 'limit': limit,
                 'total': total,
-                'total_pages': total_pages
+                'total_pages': total_pages,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor
             }
         }), 200
 
+    except InvalidCursor as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
+    except ValueError as e:
+        return jsonify({'error': 'Invalid parameters', 'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing users: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -195,6 +227,11 @@ def get_user(uid: str):
         if not user_doc.exists:
             return jsonify({'error': 'User not found'}), 404
 
+        # 用戶文檔未變時返回 304，不再序列化
+        cached = not_modified(user_doc.update_time, last_modified=latest_modified(user_doc.update_time))
+        if cached is not None:
+            return cached
+
         user_data = user_doc.to_dict()
         user_data['uid'] = uid
 
@@ -206,6 +243,144 @@ def get_user(uid: str):
         return jsonify({'error': str(e)}), 500
 
 
+@admin_users_bp.route('/<uid>/full', methods=['GET'])
+@require_admin
+def get_user_full(uid: str):
+    """
+    用戶詳情頁的所有面板（一次請求）
+
+    只讀取一次 users/{uid}；各面板依賴的文檔（訓練總覽、週課表、週回顧、
+    當天準備度、rolling_trends）用一次 get_all 批量讀取，與準備度歷史查詢並發執行。
+
+    Args:
+        uid: 用戶 UID
+
+    Query Parameters:
+        include: 逗號分隔的面板（默認全部）：
+            training_overview, weekly_plan, weekly_summary, readiness, readiness_history
+        date: 準備度日期 (YYYY-MM-DD)，默認為今天
+        days: 準備度歷史天數，默認 28 天，最大 90 天
+
+    Returns:
+        {
+            "user": {...},
+            "training_overview": {...},   # 與 /<uid>/training-overview 的響應相同
+            "weekly_plan": {...},         # 與 /<uid>/weekly-plan 的響應相同
+            "weekly_summary": {...},      # 與 /<uid>/weekly-summary 的響應相同
+            "readiness": {...},           # 與 /<uid>/readiness 的響應相同
+            "readiness_history": {...},   # 與 /<uid>/readiness/history 的響應相同
+            "errors": {"readiness_history": "..."}  # 只在有面板失敗時出現
+        }
+    """
+    if db is None:
+        return jsonify({'error': 'Service not available'}), 503
+
+    try:
+        include = request.args.get('include')
+        panels = [p.strip() for p in include.split(',') if p.strip()] if include else list(FULL_PANELS)
+        unknown = sorted(set(panels) - set(FULL_PANELS))
+        if unknown:
+            return jsonify({
+                'error': 'Invalid include',
+                'message': f"Unknown panels: {', '.join(unknown)}. Valid: {', '.join(FULL_PANELS)}"
+            }), 400
+
+        date_doc_id = _readiness_date_id(request.args.get('date'))
+        if date_doc_id is None:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        days = _history_days(request.args.get('days'))
+
+        user_ref = db.collection('users').document(uid)
+        user_doc = user_ref.get()
+        if not user_doc.exists:
+            return jsonify({'error': 'User not found'}), 404
+
+        user_data = user_doc.to_dict()
+        user_data['uid'] = uid
+
+        # 依賴用戶字段的文檔，一次 get_all 批量讀取
+        active_training_id = user_data.get('active_training_id')
+        active_weekly_plan_id = user_data.get('active_weekly_plan_id')
+        summary_id, last_week = _weekly_summary_id(active_weekly_plan_id)
+
+        refs = {}
+        if 'training_overview' in panels and active_training_id:
+            refs['training_overview'] = db.collection('plan_race_run_overview').document(active_training_id)
+        if 'weekly_plan' in panels and active_weekly_plan_id:
+            refs['weekly_plan'] = db.collection('plan_race_run_weekly').document(active_weekly_plan_id)
+        if 'weekly_summary' in panels and summary_id:
+            refs['weekly_summary'] = db.collection('weekly_summary').document(summary_id)
+        cached_readiness = readiness_cache.get_fresh(uid, date_doc_id) if 'readiness' in panels else None
+        if 'readiness' in panels and cached_readiness is None:
+            refs['readiness'] = user_ref.collection('training_readiness').document(date_doc_id)
+            refs['rolling_trends'] = _rolling_trends_ref(uid)
+
+        tasks = {}
+        if refs:
+            tasks['documents'] = lambda: {doc.reference.path: doc for doc in db.get_all(list(refs.values()))}
+        if 'readiness_history' in panels:
+            tasks['readiness_history'] = lambda: _readiness_history_payload(uid, days)
+        results, errors = fan_out(tasks) if tasks else ({}, {})
+
+        fetched = results.get('documents') or {}
+
+        def doc_for(name):
+            ref = refs.get(name)
+            return fetched.get(ref.path) if ref is not None else None
+
+        response = {'user': user_data}
+        panel_errors = {}
+        builders = {
+            'training_overview': lambda: _training_overview_payload(active_training_id, doc_for('training_overview')),
+            'weekly_plan': lambda: _weekly_plan_payload(active_weekly_plan_id, doc_for('weekly_plan')),
+            'weekly_summary': lambda: _weekly_summary_payload(summary_id, last_week, doc_for('weekly_summary')),
+            'readiness': lambda: cached_readiness or _readiness_payload(
+                uid, date_doc_id, doc_for('readiness'), doc_for('rolling_trends')
+            ),
+            'readiness_history': lambda: results['readiness_history'],
+        }
+        for panel in panels:
+            if panel == 'readiness_history' and 'readiness_history' in errors:
+                panel_errors[panel] = errors['readiness_history']
+            elif panel in refs and 'documents' in errors:
+                panel_errors[panel] = errors['documents']
+            else:
+                try:
+                    response[panel] = builders[panel]()
+                    continue
+                except Exception as e:
+                    logger.error(f"Error building {panel} for user {uid}: {e}", exc_info=True)
+                    panel_errors[panel] = str(e)
+            response[panel] = None
+
+        if panel_errors:
+            response['errors'] = panel_errors
+
+        return jsonify(response), 200
+
+    except ValueError as e:
+        return jsonify({'error': 'Invalid parameters', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting full profile for user {uid}: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+def _training_overview_payload(active_training_id, plan_doc) -> dict:
+    """訓練總覽面板（plan_race_run_overview/{active_training_id}）"""
+    if not active_training_id:
+        return {'training_overview': None, 'message': 'No active training plan'}
+
+    if plan_doc is None or not plan_doc.exists:
+        return {'training_overview': None, 'message': 'Training plan overview not found'}
+
+    plan_data = plan_doc.to_dict()
+    return {
+        'training_overview': plan_data.get('overview'),
+        'training_id': active_training_id,
+        'created_at': plan_data.get('created_at'),
+    }
+
+
 @admin_users_bp.route('/<uid>/training-overview', methods=['GET'])
 @require_admin
 def get_user_training_overview(uid: str):
@@ -229,33 +404,50 @@ def get_user_training_overview(uid: str):
         if not user_doc.exists:
             return jsonify({'error': 'User not found'}), 404
 
-        user_data = user_doc.to_dict()
-        active_training_id = user_data.get('active_training_id')
-
-        if not active_training_id:
-            return jsonify({'training_overview': None, 'message': 'No active training plan'}), 200
+        active_training_id = user_doc.to_dict().get('active_training_id')
 
         # 查詢 plan_race_run_overview collection
-        plan_ref = db.collection('plan_race_run_overview').document(active_training_id)
-        plan_doc = plan_ref.get()
+        plan_doc = None
+        if active_training_id:
+            plan_doc = db.collection('plan_race_run_overview').document(active_training_id).get()
 
-        if not plan_doc.exists:
-            return jsonify({'training_overview': None, 'message': 'Training plan overview not found'}), 200
+        plan_version = plan_doc.update_time if plan_doc is not None else None
+        cached = not_modified(
+            user_doc.update_time, active_training_id, plan_version,
+            last_modified=latest_modified(user_doc.update_time, plan_version)
+        )
+        if cached is not None:
+            return cached
 
-        plan_data = plan_doc.to_dict()
-
-        # 返回訓練總覽數據
-        return jsonify({
-            'training_overview': plan_data.get('overview'),
-            'training_id': active_training_id,
-            'created_at': plan_data.get('created_at'),
-        }), 200
+        return jsonify(_training_overview_payload(active_training_id, plan_doc)), 200
 
     except Exception as e:
         logger.error(f"Error getting training overview for user {uid}: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+def _weekly_plan_payload(active_weekly_plan_id, weekly_doc) -> dict:
+    """週課表面板（plan_race_run_weekly/{active_weekly_plan_id}）"""
+    if not active_weekly_plan_id:
+        return {
+            'weekly_plan': None,
+            'weekly_plan_id': None,
+        }
+
+    if weekly_doc is None or not weekly_doc.exists:
+        return {
+            'weekly_plan': None,
+            'weekly_plan_id': active_weekly_plan_id,
+        }
+
+    weekly_data = weekly_doc.to_dict()
+    return {
+        'weekly_plan': weekly_data,
+        'weekly_plan_id': active_weekly_plan_id,
+        'created_at': weekly_data.get('created_at'),
+    }
+
+
 @admin_users_bp.route('/<uid>/weekly-plan', methods=['GET'])
 @require_admin
 def get_user_weekly_plan(uid: str):
@@ -273,42 +465,91 @@ def get_user_weekly_plan(uid: str):
 
     try:
         # 獲取用戶的 active_weekly_plan_id
-        user_data = db.collection('users').document(uid).get().to_dict()
+        user_doc = db.collection('users').document(uid).get()
+        user_data = user_doc.to_dict()
 
         if not user_data:
             return jsonify({'error': 'User not found'}), 404
 
         active_weekly_plan_id = user_data.get('active_weekly_plan_id')
 
-        if not active_weekly_plan_id:
-            return jsonify({
-                'weekly_plan': None,
-                'weekly_plan_id': None,
-            }), 200
-
         # 從 plan_race_run_weekly collection 獲取週課表
-        weekly_ref = db.collection('plan_race_run_weekly').document(active_weekly_plan_id)
-        weekly_doc = weekly_ref.get()
-
-        if not weekly_doc.exists:
-            return jsonify({
-                'weekly_plan': None,
-                'weekly_plan_id': active_weekly_plan_id,
-            }), 200
+        weekly_doc = None
+        if active_weekly_plan_id:
+            weekly_doc = db.collection('plan_race_run_weekly').document(active_weekly_plan_id).get()
 
-        weekly_data = weekly_doc.to_dict()
+        weekly_version = weekly_doc.update_time if weekly_doc is not None else None
+        cached = not_modified(
+            user_doc.update_time, active_weekly_plan_id, weekly_version,
+            last_modified=latest_modified(user_doc.update_time, weekly_version)
+        )
+        if cached is not None:
+            return cached
 
-        return jsonify({
-            'weekly_plan': weekly_data,
-            'weekly_plan_id': active_weekly_plan_id,
-            'created_at': weekly_data.get('created_at'),
-        }), 200
+        return jsonify(_weekly_plan_payload(active_weekly_plan_id, weekly_doc)), 200
 
     except Exception as e:
         logger.error(f"Error getting weekly plan for user {uid}: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+def _weekly_summary_id(active_weekly_plan_id):
+    """
+    從週課表 ID 計算上週的週回顧 ID
+
+    格式：{prefix}_{week_number} -> {prefix}_{week_number-1}_summary
+    例如：003bcz2NC4aLX0PgJARs_11 -> 003bcz2NC4aLX0PgJARs_10_summary
+
+    Returns:
+        (summary_id, last_week)；沒有週課表、無法解析或第一週時為 (None, None)
+    """
+    if not active_weekly_plan_id:
+        return None, None
+
+    try:
+        parts = active_weekly_plan_id.rsplit('_', 1)
+        if len(parts) != 2:
+            logger.warning(f"Invalid weekly_plan_id format: {active_weekly_plan_id}")
+            return None, None
+
+        prefix = parts[0]  # 003bcz2NC4aLX0PgJARs
+        current_week = int(parts[1])  # 11
+
+        # 上週的週數（第一週沒有上週回顧）
+        last_week = current_week - 1
+        if last_week < 1:
+            return None, None
+
+        return f"{prefix}_{last_week}_summary", last_week
+
+    except (ValueError, IndexError) as e:
+        logger.warning(f"Failed to parse weekly_plan_id {active_weekly_plan_id}: {e}")
+        return None, None
+
+
+def _weekly_summary_payload(summary_id, last_week, summary_doc) -> dict:
+    """週回顧面板（weekly_summary/{summary_id}）"""
+    if not summary_id:
+        return {
+            'weekly_summary': None,
+            'summary_id': None,
+        }
+
+    if summary_doc is None or not summary_doc.exists:
+        return {
+            'weekly_summary': None,
+            'summary_id': summary_id,
+        }
+
+    summary_data = summary_doc.to_dict()
+    return {
+        'weekly_summary': summary_data,
+        'summary_id': summary_id,
+        'week_number': last_week,
+        'created_at': summary_data.get('created_at'),
+    }
+
+
 @admin_users_bp.route('/<uid>/weekly-summary', methods=['GET'])
 @require_admin
 def get_user_weekly_summary(uid: str):
@@ -337,74 +578,115 @@ def get_user_weekly_summary(uid: str):
         if not user_doc.exists:
             return jsonify({'error': 'User not found'}), 404
 
-        user_data = user_doc.to_dict()
-        active_weekly_plan_id = user_data.get('active_weekly_plan_id')
-
-        if not active_weekly_plan_id:
-            return jsonify({
-                'weekly_summary': None,
-                'summary_id': None,
-            }), 200
-
-        # 解析週課表 ID，計算上週的週回顧 ID
-        # 格式：{prefix}_{week_number}
-        # 例如：003bcz2NC4aLX0PgJARs_11
-        try:
-            parts = active_weekly_plan_id.rsplit('_', 1)
-            if len(parts) != 2:
-                logger.warning(f"Invalid weekly_plan_id format: {active_weekly_plan_id}")
-                return jsonify({
-                    'weekly_summary': None,
-                    'summary_id': None,
-                }), 200
-
-            prefix = parts[0]  # 003bcz2NC4aLX0PgJARs
-            current_week = int(parts[1])  # 11
-
-            # 上週的週數
-            last_week = current_week - 1
-
-            if last_week < 1:
-                # 第一週沒有上週回顧
-                return jsonify({
-                    'weekly_summary': None,
-                    'summary_id': None,
-                }), 200
-
-            # 構建週回顧 ID
-            summary_id = f"{prefix}_{last_week}_summary"
-
-        except (ValueError, IndexError) as e:
-            logger.warning(f"Failed to parse weekly_plan_id {active_weekly_plan_id}: {e}")
-            return jsonify({
-                'weekly_summary': None,
-                'summary_id': None,
-            }), 200
+        summary_id, last_week = _weekly_summary_id(user_doc.to_dict().get('active_weekly_plan_id'))
 
         # 從 weekly_summary collection 獲取週回顧
-        summary_ref = db.collection('weekly_summary').document(summary_id)
-        summary_doc = summary_ref.get()
+        summary_doc = None
+        if summary_id:
+            summary_doc = db.collection('weekly_summary').document(summary_id).get()
 
-        if not summary_doc.exists:
-            return jsonify({
-                'weekly_summary': None,
-                'summary_id': summary_id,
-            }), 200
+        summary_version = summary_doc.update_time if summary_doc is not None else None
+        cached = not_modified(
+            user_doc.update_time, summary_id, summary_version,
+            last_modified=latest_modified(user_doc.update_time, summary_version)
+        )
+        if cached is not None:
+            return cached
 
-        summary_data = summary_doc.to_dict()
-
-        return jsonify({
-            'weekly_summary': summary_data,
-            'summary_id': summary_id,
-            'week_number': last_week,
-            'created_at': summary_data.get('created_at'),
-        }), 200
+        return jsonify(_weekly_summary_payload(summary_id, last_week, summary_doc)), 200
 
     except Exception as e:
         logger.error(f"Error getting weekly summary for user {uid}: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+def _history_days(value) -> int:
+    """準備度歷史天數（默認 28，限制在 1–90）；不是整數時拋出 ValueError"""
+    if value is None:
+        return 28
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"days must be an integer, got {value!r}")
+    return max(1, min(days, 90))
+
+
+def _readiness_date_id(date_str):
+    """準備度文檔 ID（YYYY-MM-DD，默認為今天）；格式錯誤時返回 None"""
+    if not date_str:
+        return datetime.now().strftime('%Y-%m-%d')
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        logger.error(f"Invalid date format: {date_str}")
+        return None
+
+
+def _rolling_trends_ref(uid: str):
+    return db.collection('readiness_metrics').document(uid).collection('rolling_trends').document('current')
+
+
+def _readiness_payload(uid: str, date_doc_id: str, readiness_doc, rolling_trends_doc) -> dict:
+    """準備度面板（來源文檔的 update_time 沒變時沿用 readiness_cache 中的響應）"""
+    return readiness_cache.resolve(
+        uid, date_doc_id, readiness_doc, rolling_trends_doc,
+        lambda: _build_readiness_payload(uid, date_doc_id, readiness_doc, rolling_trends_doc)
+    )
+
+
+def _build_readiness_payload(uid: str, date_doc_id: str, readiness_doc, rolling_trends_doc) -> dict:
+    """
+    構建準備度面板：指定日期的文檔；當天沒有數據時返回最近的文檔
+
+    rolling_trends 讀取失敗不影響準備度數據本身。
+    """
+    if readiness_doc is not None and readiness_doc.exists:
+        readiness_data = readiness_doc.to_dict()
+        readiness_data['doc_id'] = date_doc_id
+        logger.info(f"Found readiness data for {uid} on {date_doc_id}")
+        found_for_date = True
+    else:
+        # 如果當天沒有數據，按文檔 ID (日期) 降序取最新的一筆
+        logger.info(f"No data for {date_doc_id}, fetching latest document")
+        latest_docs = list(db.collection('users')
+                          .document(uid)
+                          .collection('training_readiness')
+                          .order_by('__name__', direction=DESCENDING)
+                          .limit(1)
+                          .stream())
+
+        if not latest_docs:
+            logger.warning(f"No readiness data found for user {uid}")
+            return {
+                'readiness': None,
+                'found_for_date': False,
+                'message': 'No readiness data found'
+            }
+
+        latest_doc = latest_docs[0]
+        readiness_data = latest_doc.to_dict()
+        readiness_data['doc_id'] = latest_doc.id
+        logger.info(f"Returning data from {latest_doc.id}")
+        found_for_date = False
+
+    # 注入 trend_data 從 readiness_metrics/{uid}/rolling_trends/current
+    try:
+        trends = readiness_cache.trends(uid, rolling_trends_doc)
+        if not trends:
+            logger.warning(f"No rolling_trends found for {uid}")
+        inject_trend_data(readiness_data, trends)
+    except Exception as e:
+        logger.error(f"Error reading rolling_trends for {uid}: {e}")
+
+    payload = {
+        'readiness': readiness_data,
+        'found_for_date': found_for_date
+    }
+    if not found_for_date:
+        payload['message'] = f"Returned data from {readiness_data['doc_id']}"
+    return payload
+
+
 @admin_users_bp.route('/<uid>/readiness', methods=['GET'])
 @require_admin
 def get_user_readiness(uid: str):
@@ -420,161 +702,72 @@ def get_user_readiness(uid: str):
     Returns:
         訓練準備度數據，如果沒有數據則返回 null
     """
-    logger.info(f"========== GET READINESS REQUEST for uid={uid} ==========")
-
     if db is None:
         logger.error("Database not initialized")
         return jsonify({'error': 'Service not available'}), 503
 
     try:
-        from datetime import timedelta
-
         # 獲取日期參數，默認為今天
-        date_str = request.args.get('date')
-        if date_str:
-            try:
-                target_date = datetime.strptime(date_str, '%Y-%m-%d')
-            except ValueError:
-                logger.error(f"Invalid date format: {date_str}")
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-        else:
-            target_date = datetime.now()
-
-        logger.info(f"Target date: {target_date.strftime('%Y-%m-%d')}")
+        date_doc_id = _readiness_date_id(request.args.get('date'))
+        if date_doc_id is None:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
 
-        # 查詢 users/{uid}/training_readiness/{date} subcollection
-        date_doc_id = target_date.strftime('%Y-%m-%d')
-        logger.info(f"Querying document: users/{uid}/training_readiness/{date_doc_id}")
+        # 最近確認過的響應直接返回（切換日期時不重複讀取 Firestore）
+        cached = readiness_cache.get_fresh(uid, date_doc_id)
+        if cached is not None:
+            return jsonify(cached), 200
 
+        # 查詢 users/{uid}/training_readiness/{date} 與 rolling_trends（一次批量讀取）
         readiness_ref = db.collection('users').document(uid).collection('training_readiness').document(date_doc_id)
-        readiness_doc = readiness_ref.get()
-        logger.info(f"Document exists: {readiness_doc.exists}")
-
-        if readiness_doc.exists:
-            readiness_data = readiness_doc.to_dict()
-            readiness_data['doc_id'] = date_doc_id
-            logger.info(f"Found readiness data for {uid} on {date_doc_id}")
-
-            # 注入 trend_data 從 readiness_metrics/{uid}/rolling_trends/current
-            try:
-                rolling_trends_ref = db.collection('readiness_metrics').document(uid).collection('rolling_trends').document('current')
-                rolling_trends_doc = rolling_trends_ref.get()
-
-                if rolling_trends_doc.exists:
-                    rolling_trends = rolling_trends_doc.to_dict()
-                    logger.info(f"Found rolling_trends for {uid}")
-
-                    # 只取最近 28 天的數據
-                    trend_data_dict = {}
-                    for metric_name in ['speed', 'endurance', 'race_fitness', 'training_load', 'recovery']:
-                        if metric_name in rolling_trends:
-                            metric_trend = rolling_trends[metric_name]
-                            dates = metric_trend.get('dates', [])
-                            values = metric_trend.get('values', [])
-                            direction = metric_trend.get('direction', 'stable')
-
-                            # 只取最後 28 天
-                            if len(dates) > 28:
-                                dates = dates[-28:]
-                                values = values[-28:]
-
-                            trend_data_dict[metric_name] = {
-                                'dates': dates,
-                                'values': values,
-                                'direction': direction
-                            }
-
-                    # 為每個指標注入 trend_data
-                    for metric_name in ['speed', 'endurance', 'race_fitness', 'training_load', 'recovery']:
-                        if metric_name in readiness_data and metric_name in trend_data_dict:
-                            # 如果 readiness_data[metric_name] 還沒有 trend_data，注入它
-                            if isinstance(readiness_data[metric_name], dict):
-                                if 'trend_data' not in readiness_data[metric_name] or readiness_data[metric_name]['trend_data'] is None:
-                                    readiness_data[metric_name]['trend_data'] = trend_data_dict[metric_name]
-                                    logger.info(f"Injected trend_data for {metric_name}")
-                else:
-                    logger.warning(f"No rolling_trends found for {uid}")
-            except Exception as e:
-                logger.error(f"Error reading rolling_trends for {uid}: {e}")
+        trends_ref = _rolling_trends_ref(uid)
+        docs = {doc.reference.path: doc for doc in db.get_all([readiness_ref, trends_ref])}
 
-            return jsonify({
-                'readiness': readiness_data,
-                'found_for_date': True
-            }), 200
+        payload = _readiness_payload(uid, date_doc_id, docs.get(readiness_ref.path), docs.get(trends_ref.path))
+        return jsonify(payload), 200
 
-        # 如果當天沒有數據，簡單地列出最近的文檔
-        logger.info(f"No data for {date_doc_id}, fetching recent documents")
-        recent_docs = list(db.collection('users')
-                          .document(uid)
-                          .collection('training_readiness')
-                          .limit(10)
-                          .stream())
+    except Exception as e:
+        logger.error(f"Error getting readiness for user {uid}: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
-        if recent_docs:
-            # 按文檔 ID (日期) 排序，取最新的
-            recent_docs.sort(key=lambda x: x.id, reverse=True)
-            latest_doc = recent_docs[0]
-            readiness_data = latest_doc.to_dict()
-            readiness_data['doc_id'] = latest_doc.id
-            logger.info(f"Returning data from {latest_doc.id}")
-
-            # 注入 trend_data 從 readiness_metrics/{uid}/rolling_trends/current
-            try:
-                rolling_trends_ref = db.collection('readiness_metrics').document(uid).collection('rolling_trends').document('current')
-                rolling_trends_doc = rolling_trends_ref.get()
-
-                if rolling_trends_doc.exists:
-                    rolling_trends = rolling_trends_doc.to_dict()
-                    logger.info(f"Found rolling_trends for {uid} (fallback)")
-
-                    # 只取最近 28 天的數據
-                    trend_data_dict = {}
-                    for metric_name in ['speed', 'endurance', 'race_fitness', 'training_load', 'recovery']:
-                        if metric_name in rolling_trends:
-                            metric_trend = rolling_trends[metric_name]
-                            dates = metric_trend.get('dates', [])
-                            values = metric_trend.get('values', [])
-                            direction = metric_trend.get('direction', 'stable')
-
-                            # 只取最後 28 天
-                            if len(dates) > 28:
-                                dates = dates[-28:]
-                                values = values[-28:]
-
-                            trend_data_dict[metric_name] = {
-                                'dates': dates,
-                                'values': values,
-                                'direction': direction
-                            }
-
-                    # 為每個指標注入 trend_data
-                    for metric_name in ['speed', 'endurance', 'race_fitness', 'training_load', 'recovery']:
-                        if metric_name in readiness_data and metric_name in trend_data_dict:
-                            if isinstance(readiness_data[metric_name], dict):
-                                if 'trend_data' not in readiness_data[metric_name] or readiness_data[metric_name]['trend_data'] is None:
-                                    readiness_data[metric_name]['trend_data'] = trend_data_dict[metric_name]
-                                    logger.info(f"Injected trend_data for {metric_name} (fallback)")
-                else:
-                    logger.warning(f"No rolling_trends found for {uid} (fallback)")
-            except Exception as e:
-                logger.error(f"Error reading rolling_trends for {uid} (fallback): {e}")
 
-            return jsonify({
-                'readiness': readiness_data,
-                'found_for_date': False,
-                'message': f'Returned data from {latest_doc.id}'
-            }), 200
+def _readiness_history_payload(uid: str, days: int, date_from=None, date_to=None, cursor=None) -> dict:
+    """
+    準備度歷史面板（按文檔 ID = 日期降序，每頁 days 筆）
 
-        logger.warning(f"No readiness data found for user {uid}")
-        return jsonify({
-            'readiness': None,
-            'found_for_date': False,
-            'message': 'No readiness data found'
-        }), 200
+    只讀取 days + 1 個文檔（多讀一筆判斷是否還有下一頁），不再遍歷整個子集合。
 
-    except Exception as e:
-        logger.error(f"Error getting readiness for user {uid}: {str(e)}", exc_info=True)
-        return jsonify({'error': str(e)}), 500
+    Args:
+        date_from / date_to: 可選的日期窗口（YYYY-MM-DD，含兩端）
+        cursor: 上一次返回的 next_cursor / prev_cursor
+
+    Raises:
+        InvalidCursor: 游標無效
+    """
+    readiness_ref = db.collection('users').document(uid).collection('training_readiness')
+    query = readiness_ref
+    if date_from:
+        query = query.where('__name__', '>=', readiness_ref.document(date_from))
+    if date_to:
+        query = query.where('__name__', '<=', readiness_ref.document(date_to))
+
+    result = paginate(
+        query, days, cursor=cursor, sort=[('__name__', True)],
+        scope=f'readiness_history:{uid}:{date_from or ""}:{date_to or ""}'
+    )
+
+    history_data = []
+    for doc in result.docs:
+        data = doc.to_dict()
+        data['doc_id'] = doc.id
+        history_data.append(data)
+
+    return {
+        'history': history_data,
+        'days': days,
+        'count': len(history_data),
+        'next_cursor': result.next_cursor,
+        'prev_cursor': result.prev_cursor
+    }
 
 
 @admin_users_bp.route('/<uid>/readiness/history', methods=['GET'])
@@ -587,10 +780,13 @@ def get_user_readiness_history(uid: str):
         uid: 用戶 UID
 
     Query Parameters:
-        days: 查詢天數，默認 28 天，最大 90 天
+        days: 每頁天數（文檔數），默認 28 天，最大 90 天
+        from: 可選，窗口開始日期 (YYYY-MM-DD，含)
+        to: 可選，窗口結束日期 (YYYY-MM-DD，含)
+        cursor: 可選，上一次返回的 next_cursor（更早）/ prev_cursor（更新）
 
     Returns:
-        訓練準備度歷史數據列表
+        訓練準備度歷史數據列表（日期降序）
     """
     if db is None:
         logger.error("Database not initialized")
@@ -598,32 +794,23 @@ def get_user_readiness_history(uid: str):
 
     try:
         # 獲取查詢天數
-        days = min(int(request.args.get('days', 28)), 90)
-        logger.info(f"Fetching readiness history for user {uid}, days={days}")
-
-        # 簡單地列出所有文檔，避免 where 查詢需要索引的問題
-        all_docs = list(db.collection('users')
-                       .document(uid)
-                       .collection('training_readiness')
-                       .stream())
-
-        logger.info(f"Found {len(all_docs)} total readiness documents for user {uid}")
-
-        # 按文檔 ID (日期) 排序，取最近的
-        all_docs.sort(key=lambda x: x.id, reverse=True)
+        try:
+            days = _history_days(request.args.get('days'))
+        except ValueError as e:
+            return jsonify({'error': 'Invalid parameters', 'message': str(e)}), 400
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        for value in (date_from, date_to):
+            if value and _readiness_date_id(value) != value:
+                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
 
-        history_data = []
-        for doc in all_docs[:days]:
-            data = doc.to_dict()
-            data['doc_id'] = doc.id
-            history_data.append(data)
+        logger.info(f"Fetching readiness history for user {uid}, days={days}, from={date_from}, to={date_to}")
 
-        return jsonify({
-            'history': history_data,
-            'days': days,
-            'count': len(history_data)
-        }), 200
+        payload = _readiness_history_payload(uid, days, date_from, date_to, request.args.get('cursor'))
+        return jsonify(payload), 200
 
+    except InvalidCursor as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting readiness history for user {uid}: {str(e)}", exc_info=True)
         return jsonify({'error': str(e), 'details': 'Check server logs'}), 500
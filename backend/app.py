@@ -27,6 +27,8 @@ if API_SERVICE_PATH not in sys.path:
 from flask import Flask, jsonify
 from flask_cors import CORS
 
+from middleware.conditional import init_conditional_requests
+
 # ✅ 引用 api_service 的現有代碼
 try:
     from domains.subscription.subscription_service import subscription_service
@@ -53,11 +55,16 @@ except ImportError as e:
     admin_invite_codes_bp = None
 
 try:
-    from api.admin.analytics import admin_analytics_bp
+    from api.admin.analytics import (
+        admin_analytics_bp, start_analytics_warmer, start_rollup_refresher, start_subscription_counters
+    )
     print("✅ Successfully imported admin analytics blueprint")
 except ImportError as e:
     print(f"⚠️  Warning: Could not import admin analytics blueprint: {e}")
     admin_analytics_bp = None
+    start_analytics_warmer = None
+    start_rollup_refresher = None
+    start_subscription_counters = None
 
 try:
     from api.admin.admins import admin_admins_bp
@@ -67,11 +74,12 @@ except ImportError as e:
     admin_admins_bp = None
 
 try:
-    from api.admin.users import admin_users_bp
+    from api.admin.users import admin_users_bp, start_user_search_index
     print("✅ Successfully imported admin users blueprint")
 except ImportError as e:
     print(f"⚠️  Warning: Could not import admin users blueprint: {e}")
     admin_users_bp = None
+    start_user_search_index = None
 
 try:
     from api.admin.subscription_tools import admin_subscription_tools_bp
@@ -87,6 +95,13 @@ except ImportError as e:
     print(f"⚠️  Warning: Could not import admin LLM meta blueprint: {e}")
     admin_llm_meta_bp = None
 
+try:
+    from api.admin.exports import admin_exports_bp
+    print("✅ Successfully imported admin exports blueprint")
+except ImportError as e:
+    print(f"⚠️  Warning: Could not import admin exports blueprint: {e}")
+    admin_exports_bp = None
+
 # from api.admin.audit_logs import admin_audit_logs_bp
 
 # 配置日誌
@@ -106,6 +121,9 @@ ALLOWED_ORIGINS = os.getenv(
 ).split(',')
 CORS(app, origins=ALLOWED_ORIGINS, supports_credentials=True)
 
+# Admin GET 響應的 ETag / Last-Modified 條件請求（內容未變時返回 304）
+init_conditional_requests(app)
+
 # 註冊 Admin 路由
 if admin_subscriptions_bp is not None:
     app.register_blueprint(admin_subscriptions_bp, url_prefix='/api/v1/admin/subscriptions')
@@ -119,6 +137,21 @@ if admin_analytics_bp is not None:
     app.register_blueprint(admin_analytics_bp, url_prefix='/api/v1/admin/analytics')
     logger.info("✅ Registered analytics blueprint at /api/v1/admin/analytics")
 
+    # 分析緩存預熱（每 ANALYTICS_WARM_INTERVAL 秒，未設置或為 0 時不啟動）
+    analytics_warm_interval = int(os.getenv('ANALYTICS_WARM_INTERVAL', '0'))
+    if analytics_warm_interval > 0:
+        start_analytics_warmer(analytics_warm_interval)
+
+    # 每日匯總刷新（每 ANALYTICS_ROLLUP_INTERVAL 秒，應小於 5 分鐘；每個啟用的進程都會掃描 subscriptions，
+    # 多 worker / 多實例部署時改用 Cloud Scheduler 調用 /rollups/refresh，不需設置）
+    analytics_rollup_interval = int(os.getenv('ANALYTICS_ROLLUP_INTERVAL', '0'))
+    if analytics_rollup_interval > 0:
+        start_rollup_refresher(analytics_rollup_interval)
+
+    # 訂閱增量計數器（ANALYTICS_COUNTERS_LISTENER=true 時在本進程監聽 subscriptions 變更）
+    if os.getenv('ANALYTICS_COUNTERS_LISTENER', 'false').lower() == 'true':
+        start_subscription_counters()
+
 if admin_admins_bp is not None:
     app.register_blueprint(admin_admins_bp, url_prefix='/api/v1/admin/admins')
     logger.info("✅ Registered admins blueprint at /api/v1/admin/admins")
@@ -127,6 +160,9 @@ if admin_users_bp is not None:
     app.register_blueprint(admin_users_bp, url_prefix='/api/v1/admin/users')
     logger.info("✅ Registered users blueprint at /api/v1/admin/users")
 
+    # 用戶搜尋索引（背景載入 / 刷新，搜尋請求不掃描 users）
+    start_user_search_index()
+
 if admin_subscription_tools_bp is not None:
     app.register_blueprint(admin_subscription_tools_bp, url_prefix='/api/v1/admin/subscription-tools')
     logger.info("✅ Registered subscription tools blueprint at /api/v1/admin/subscription-tools")
@@ -135,6 +171,18 @@ if admin_llm_meta_bp is not None:
     app.register_blueprint(admin_llm_meta_bp, url_prefix='/api/v1/admin/llm-meta')
     logger.info("✅ Registered LLM meta blueprint at /api/v1/admin/llm-meta")
 
+if admin_exports_bp is not None:
+    app.register_blueprint(admin_exports_bp, url_prefix='/api/v1/admin/exports')
+    logger.info("✅ Registered exports blueprint at /api/v1/admin/exports")
+
+# 預先下載 ID Token 公鑰（背景執行緒，不阻塞啟動）
+try:
+    import threading
+    from middleware.admin_auth import prewarm_google_public_keys
+    threading.Thread(target=prewarm_google_public_keys, name='prewarm-id-token-keys', daemon=True).start()
+except ImportError as e:
+    logger.warning(f"Could not pre-warm ID token public keys: {e}")
+
 # app.register_blueprint(admin_audit_logs_bp, url_prefix='/api/v1/admin/audit-logs')
 
 # === 基礎路由 ===
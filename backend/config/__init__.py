@@ -1,4 +1,5 @@
 """Config module"""
 from .admin_config import SUPER_ADMIN_EMAILS, AdminRole
+from .pricing_config import DEFAULT_MONTHLY_PRICE, PLATFORM_MONTHLY_PRICES, PLAN_PRICING
 
-__all__ = ['SUPER_ADMIN_EMAILS', 'AdminRole']
+__all__ = ['SUPER_ADMIN_EMAILS', 'AdminRole', 'DEFAULT_MONTHLY_PRICE', 'PLATFORM_MONTHLY_PRICES', 'PLAN_PRICING']
@@ -0,0 +1,48 @@
+"""
+訂閱定價配置
+
+收入分析按每個訂閱的方案與價格換算月經常性收入（MRR），解析順序：
+1. 訂閱文檔上的 price（每個計費週期的金額）÷ 方案的計費月數
+2. 方案價目表 PLAN_PRICING[product_id]
+3. 付款平台默認月費 PLATFORM_MONTHLY_PRICES[payment_platform]
+4. DEFAULT_MONTHLY_PRICE
+
+方案價目表可用環境變量 PLAN_PRICING（JSON）覆蓋，例如:
+    PLAN_PRICING='{"premium_monthly": {"price": 150, "months": 1},
+                   "premium_yearly": {"price": 1490, "months": 12}}'
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 沒有方案信息時的默認月費（TWD）
+DEFAULT_MONTHLY_PRICE = 150
+
+# 付款平台默認月費（管理員贈送的訂閱不產生收入）
+PLATFORM_MONTHLY_PRICES = {
+    'admin_grant': 0,
+}
+
+
+def _load_plan_pricing():
+    raw = os.getenv('PLAN_PRICING', '')
+    if not raw:
+        return {}
+    try:
+        plans = json.loads(raw)
+        return {
+            product_id: {'price': float(plan['price']), 'months': int(plan.get('months', 1))}
+            for product_id, plan in plans.items()
+        }
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"⚠️  Invalid PLAN_PRICING, ignoring: {e}")
+        return {}
+
+
+# 方案價目表：product_id → {price: 每個計費週期金額, months: 計費月數}
+PLAN_PRICING = _load_plan_pricing()
+
+
+__all__ = ['DEFAULT_MONTHLY_PRICE', 'PLATFORM_MONTHLY_PRICES', 'PLAN_PRICING']
@@ -7,14 +7,19 @@ Admin 認證中間件
 1. 從 Authorization header 獲取 Firebase Token
 2. 驗證 Token 並獲取用戶信息
 3. 檢查是否為超級管理員（環境變量白名單）
-4. 如果不是超級管理員，檢查 Firestore 中的 is_admin
+4. 如果不是超級管理員，檢查 Firestore 中的 is_admin（結果緩存，見 services.admin_role_cache）
 5. 設置 g.admin_uid, g.admin_email, g.is_super_admin 等全局變量
+
+已驗證的 Token 以其 SHA-256 為 key 緩存在進程內（有效至 Token 的 exp），
+同一 Token 的並發請求（例如用戶詳情頁的多個並行 API）只需驗證一次簽名。
 """
 from functools import wraps
 from flask import request, jsonify, g
+import hashlib
 import logging
 import sys
 import os
+import time
 
 try:
     from firebase_admin import auth, firestore
@@ -29,9 +34,65 @@ except Exception as e:
     db = None
 
 from config.admin_config import SUPER_ADMIN_EMAILS, AdminRole
+from services.admin_role_cache import admin_role_cache
+from utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# 已驗證 ID Token 緩存上限（超過時淘汰最久未使用的 Token）
+TOKEN_CACHE_MAX_ENTRIES = 1024
+
+_verified_tokens = TTLCache('verified_id_tokens', max_entries=TOKEN_CACHE_MAX_ENTRIES, default_ttl=0)
+
+
+def verify_id_token_cached(token):
+    """
+    驗證 Firebase ID Token（已驗證過且未過期的 Token 直接返回緩存的 claims）
+
+    緩存 key 為 Token 的 SHA-256（不在內存中保存原始 Token），有效期到 Token 的 exp；
+    驗證失敗不緩存。沒有 exp 的 claims 不緩存。
+
+    Raises:
+        與 auth.verify_id_token 相同
+    """
+    key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    claims = _verified_tokens.get(key)
+    if claims is not None:
+        return claims
+
+    claims = auth.verify_id_token(token)
+    exp = claims.get('exp')
+    if isinstance(exp, (int, float)):
+        ttl = exp - time.time()
+        if ttl > 0:
+            _verified_tokens.set(key, claims, ttl=ttl)
+    return claims
+
+
+def prewarm_google_public_keys():
+    """
+    預先下載 Google 的 ID Token 公鑰（firebase_admin 按 Cache-Control 緩存）
+
+    讓第一個管理員請求不必等待公鑰下載。公鑰緩存在 firebase_admin 的 TokenVerifier 的
+    HTTP session 中，沒有公開 API 可以預熱，因此這裡使用其內部屬性（版本見 requirements.txt）。
+    預熱只是盡力而為：任何失敗（未初始化默認 app、SDK 內部結構改變、網絡錯誤）都只記錄
+    debug 日誌，第一次驗證時 firebase_admin 會照常下載，不影響啟動。
+
+    Returns:
+        bool: 是否成功
+    """
+    if auth is None:
+        return False
+    try:
+        from firebase_admin import _token_gen
+        verifier = auth._get_client(None)._token_verifier
+        verifier.request(_token_gen.ID_TOKEN_CERT_URI)
+    except Exception as e:
+        logger.debug(f"Skipping ID token public key pre-warm: {e}")
+        return False
+    logger.info("✅ Pre-warmed Google ID token public keys")
+    return True
+
 
 def require_admin(f):
     """
@@ -69,7 +130,7 @@ def require_admin(f):
 
         # 2. 驗證 Firebase Token
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = verify_id_token_cached(token)
             uid = decoded_token['uid']
             email = decoded_token.get('email')
 
@@ -108,10 +169,9 @@ def require_admin(f):
             g.is_super_admin = True
             return f(*args, **kwargs)
 
-        # 4. 檢查是否為系統 Admin（Firestore）
+        # 4. 檢查是否為系統 Admin（Firestore，結果按 uid 緩存）
         try:
-            user_doc = db.collection('users').document(uid).get()
-            if user_doc.exists and user_doc.get('is_admin'):
+            if admin_role_cache.is_admin(db, uid):
                 logger.info(f"✅ Admin authenticated: {email}")
                 g.admin_uid = uid
                 g.admin_email = email
@@ -170,7 +230,7 @@ def require_super_admin(f):
 
         # 驗證 Firebase Token
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = verify_id_token_cached(token)
             uid = decoded_token['uid']
             email = decoded_token.get('email')
 
@@ -0,0 +1,116 @@
+"""
+HTTP 條件請求中間件（ETag / Last-Modified）
+
+前端在切換焦點或頁面時會重新請求相同的資料，內容沒變時不需要再傳一次完整響應：
+
+- 所有 Admin GET 的 200 JSON 響應都帶強 ETag（默認為響應內容的哈希）與
+  Cache-Control: private, no-cache（瀏覽器可以緩存，但每次使用前都要向服務器確認）
+- 請求帶 If-None-Match / If-Modified-Since 且內容未變時返回 304（不帶響應體）
+- 知道來源文檔版本（Firestore update_time）的端點在讀取文檔後調用 not_modified：
+  ETag 由版本計算，未變時直接返回 304，連 to_dict / JSON 序列化都跳過
+
+使用方式:
+    init_conditional_requests(app)
+
+    @bp.route('/<uid>')
+    def get_user(uid):
+        user_doc = users_ref.document(uid).get()
+        cached = not_modified(user_doc.update_time, last_modified=user_doc.update_time)
+        if cached is not None:
+            return cached
+        return jsonify(user_doc.to_dict()), 200
+"""
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Optional
+
+from flask import Response, g, request
+from werkzeug.http import is_resource_modified
+
+logger = logging.getLogger(__name__)
+
+ADMIN_PREFIX = '/api/v1/admin'
+
+# 響應格式版本（改變響應結構時遞增，讓客戶端持有的舊 ETag 失效）
+ETAG_FORMAT_VERSION = 1
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def latest_modified(*times: Any) -> Optional[datetime]:
+    """多個 update_time 中最晚的一個（忽略 None 與非 datetime 值）"""
+    values = [t for t in times if isinstance(t, datetime)]
+    return max(values) if values else None
+
+
+def version_etag(*versions: Any) -> str:
+    """由端點、查詢參數與來源版本計算 ETag（不含引號）"""
+    material = repr((
+        ETAG_FORMAT_VERSION,
+        request.endpoint,
+        sorted(request.args.items(multi=True)),
+        versions,
+    ))
+    return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+
+def _not_modified_response(etag: str, last_modified: Optional[datetime]) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def not_modified(*versions: Any, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    以來源版本判斷客戶端的緩存是否仍然有效
+
+    Args:
+        *versions: 決定響應內容的版本（文檔 update_time、文檔 ID 等，需可 repr）
+        last_modified: 可選，響應的最後修改時間（Last-Modified / If-Modified-Since）
+
+    Returns:
+        未修改時返回 304 響應（調用方直接返回）；否則返回 None，
+        並記錄 ETag 供之後的 200 響應使用（不再對響應內容做哈希）
+    """
+    if request.method != 'GET':
+        return None
+
+    etag = version_etag(*versions)
+    g.conditional_etag = etag
+    g.conditional_last_modified = last_modified
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return _not_modified_response(etag, last_modified)
+    return None
+
+
+def _apply_conditional(response: Response) -> Response:
+    """after_request：為 Admin GET 的 JSON 響應加上 ETag，並處理條件請求"""
+    if (
+        request.method != 'GET'
+        or not request.path.startswith(ADMIN_PREFIX)
+        or response.status_code != 200
+        or response.mimetype != 'application/json'
+        or response.is_streamed
+    ):
+        return response
+
+    etag = g.get('conditional_etag')
+    if etag:
+        response.set_etag(etag)
+        last_modified = g.get('conditional_last_modified')
+        if last_modified is not None:
+            response.last_modified = last_modified
+    else:
+        response.add_etag()
+
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+def init_conditional_requests(app) -> None:
+    """註冊條件請求處理"""
+    app.after_request(_apply_conditional)
@@ -0,0 +1,53 @@
+"""
+回填每日分析匯總（analytics_daily）
+
+從 subscriptions 的試用/付費區間一次掃描重建歷史每日匯總。
+
+使用方式:
+    python scripts/backfill_analytics_daily.py --start 2025-01-01
+    python scripts/backfill_analytics_daily.py --start 2025-01-01 --end 2025-06-30
+    python scripts/backfill_analytics_daily.py --days 90
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# 添加 backend 到 Python path
+BACKEND_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_PATH)
+
+from services.analytics_rollup_service import analytics_rollup_service
+
+
+def parse_date(value: str):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填 analytics_daily 每日匯總')
+    parser.add_argument('--start', type=parse_date, help='開始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end', type=parse_date, help='結束日期 (YYYY-MM-DD)，默認今天')
+    parser.add_argument('--days', type=int, default=90, help='未指定 --start 時回填最近 N 天（默認 90）')
+    args = parser.parse_args()
+
+    today = datetime.now(timezone.utc).date()
+    end_date = args.end or today
+    start_date = args.start or (end_date - timedelta(days=args.days - 1))
+
+    if start_date > end_date:
+        print("❌ 開始日期不能晚於結束日期")
+        sys.exit(1)
+
+    print(f"📊 回填每日匯總: {start_date.isoformat()} ~ {end_date.isoformat()}")
+    written = analytics_rollup_service.rebuild(start_date, end_date)
+
+    if written == 0:
+        print("❌ 沒有寫入任何匯總（請檢查 Firebase 憑證）")
+        sys.exit(1)
+
+    print(f"✅ 已寫入 {written} 筆 analytics_daily 文檔")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+導出 Firestore 列式快照（Parquet / Arrow）
+
+以字段投影 + 游標分頁讀取 subscriptions、users（不含憑證）與 invite_code_usages，
+分塊寫入列式文件，供離線分析使用。
+
+使用方式:
+    python scripts/export_snapshot.py
+    python scripts/export_snapshot.py --collections subscriptions users --format arrow
+    python scripts/export_snapshot.py --out-dir ./snapshots --chunk-rows 20000
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+# 添加 backend 到 Python path
+BACKEND_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_PATH)
+
+from services.snapshot_export import DEFAULT_CHUNK_ROWS, EXPORT_SPECS, FORMATS, export_collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description='導出 Firestore 列式快照')
+    parser.add_argument('--collections', nargs='+', choices=sorted(EXPORT_SPECS), default=sorted(EXPORT_SPECS),
+                        help='要導出的集合（默認全部）')
+    parser.add_argument('--format', choices=FORMATS, default='parquet', help='文件格式（默認 parquet）')
+    parser.add_argument('--out-dir', default='snapshots', help='輸出目錄（默認 ./snapshots）')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'每個分塊的行數（默認 {DEFAULT_CHUNK_ROWS}）')
+    args = parser.parse_args()
+
+    try:
+        from firebase_admin import firestore
+        from utils.firebase_init import init_firebase
+
+        init_firebase()
+        db = firestore.client()
+    except Exception as e:
+        print(f"❌ 無法初始化 Firebase: {e}")
+        sys.exit(1)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    extension = 'parquet' if args.format == 'parquet' else 'arrow'
+
+    for collection in args.collections:
+        path = os.path.join(args.out_dir, f'{collection}_{stamp}.{extension}')
+        print(f"📦 導出 {collection} → {path}")
+        stats = export_collection(db, collection, path, file_format=args.format, chunk_rows=args.chunk_rows)
+        print(f"✅ {stats['rows']} 行（{stats['chunks']} 個分塊）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+管理員角色緩存（uid → 是否為系統 Admin）
+
+require_admin 對非超級管理員需要讀取 users/{uid}.is_admin，這裡把判斷結果緩存在進程內：
+
+- 是管理員的結果緩存 ADMIN_ROLE_TTL 秒，不是管理員的結果只緩存 NEGATIVE_ROLE_TTL 秒
+  （重複的 403 探測也不再每次讀取 Firestore）
+- grant_admin / revoke_admin 調用 invalidate：立即刪除本進程的條目，
+  並遞增 admin_meta/roles.version（版本戳）
+- 每個進程最多每 VERSION_CHECK_INTERVAL 秒讀取一次版本戳，
+  版本變化時清空本進程的緩存，其他 worker / 實例也會在數秒內生效
+
+Firestore 結構:
+    admin_meta/roles:
+        - version: int（每次授予 / 撤銷管理員權限時遞增）
+        - updated_at: datetime
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+try:
+    from firebase_admin import firestore
+except ImportError as e:
+    logging.warning(f"Could not import firebase_admin: {e}")
+    firestore = None
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ADMIN_ROLE_TTL = 300  # 5 minutes
+NEGATIVE_ROLE_TTL = 30  # 30 seconds
+VERSION_CHECK_INTERVAL = 2  # seconds
+
+VERSION_COLLECTION = 'admin_meta'
+VERSION_DOCUMENT = 'roles'
+
+
+class AdminRoleCache:
+    """帶版本戳失效的管理員角色緩存"""
+
+    def __init__(
+        self,
+        ttl: float = ADMIN_ROLE_TTL,
+        negative_ttl: float = NEGATIVE_ROLE_TTL,
+        version_check_interval: float = VERSION_CHECK_INTERVAL,
+        max_entries: int = 1024
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.version_check_interval = version_check_interval
+        self._cache = TTLCache('admin_roles', max_entries=max_entries, default_ttl=ttl)
+        self._version: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _version_ref(self, db):
+        return db.collection(VERSION_COLLECTION).document(VERSION_DOCUMENT)
+
+    def _sync_version(self, db) -> None:
+        """距離上次檢查超過 version_check_interval 秒時讀取版本戳，變化時清空緩存"""
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.version_check_interval:
+                return
+            self._checked_at = now
+
+        try:
+            doc = self._version_ref(db).get()
+            version = (doc.to_dict() or {}).get('version', 0) if doc.exists else 0
+        except Exception as e:
+            # 讀取失敗時沿用現有緩存（TTL 仍然限制過期時間）
+            logger.warning(f"Could not read admin role version: {e}")
+            return
+
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._cache.clear()
+                logger.info(f"Admin role version changed ({self._version} → {version}), cache cleared")
+            self._version = version
+
+    def is_admin(self, db, uid: str) -> bool:
+        """
+        uid 是否為系統 Admin（users/{uid}.is_admin）
+
+        Raises:
+            Firestore 讀取 users/{uid} 失敗時拋出原異常（不緩存）
+        """
+        self._sync_version(db)
+
+        cached = self._cache.get(uid)
+        if cached is not None:
+            return cached
+
+        user_doc = db.collection('users').document(uid).get()
+        is_admin = bool(user_doc.exists and (user_doc.to_dict() or {}).get('is_admin'))
+        self._cache.set(uid, is_admin, ttl=self.ttl if is_admin else self.negative_ttl)
+        return is_admin
+
+    def invalidate(self, db, uid: str) -> None:
+        """
+        角色變更後調用：刪除本進程的條目並遞增版本戳（其他進程下次檢查時清空緩存）
+        """
+        self._cache.invalidate(uid)
+        try:
+            self._version_ref(db).set({
+                'version': firestore.Increment(1),
+                'updated_at': firestore.SERVER_TIMESTAMP,
+            }, merge=True)
+        except Exception as e:
+            logger.error(f"Could not bump admin role version: {e}")
+
+        # 下一次查詢立即重新讀取版本戳（同時清掉並發請求可能寫回的舊結果）
+        with self._lock:
+            self._checked_at = None
+
+
+# 全局單例
+admin_role_cache = AdminRoleCache()
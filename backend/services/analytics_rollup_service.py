@@ -0,0 +1,290 @@
+"""
+分析數據每日匯總服務
+
+將 subscriptions 匯總成每日一筆的 analytics_daily 文檔，
+Dashboard 只需讀取 ~90 筆小文檔，而不必每次掃描所有訂閱。
+
+Firestore 結構:
+    analytics_daily/{YYYY-MM-DD}:
+        - date: str (YYYY-MM-DD, UTC)
+        - snapshot_at: datetime (快照時間 = 當天結束；今天則為計算時間)
+        - new_users: int (當天 created_at)
+        - new_premium_users: int (當天 premium_start_at)
+        - churned: int (當天 premium_end_at 到期)
+        - active_trials: int (快照時試用中且非付費)
+        - active_premium: int (快照時付費中)
+        - total_users: int (快照時累計用戶數)
+        - premium_users: int (快照時累計付費用戶數，is_premium = true)
+        - revenue: float (快照時的月經常性收入，按各訂閱方案月費計算)
+        - revenue_by_platform: dict (按付款平台的月經常性收入)
+        - retention: dict (day_7/day_30/day_90 群組的 cohort_users 與 retained_users)
+        - computed_at: datetime
+
+所有天數都在一次訂閱掃描中完成：訂閱被解碼成列式時間線
+（services.subscription_timeline），各項指標以向量化的區間掃描計算。
+
+匯總只由排程寫入：請求路徑（get_range）只讀取，從不掃描 subscriptions。
+- 已結束的日子（今天之前）只有在當天結束後計算的匯總才完整；當天結束前寫入的是部分數據，
+  視為缺失
+- 今天的匯總是某個時間點的快照，computed_at 超過 max_age 秒即視為缺失
+任何一天缺失時 get_range 返回 None，調用方退回即時計算。
+
+排程依賴：必須定期調用 refresh_recent（默認重建昨天與今天），二選一：
+- 排程任務（如 Cloud Scheduler）定期 POST /api/v1/admin/analytics/rollups/refresh
+- 設置 ANALYTICS_ROLLUP_INTERVAL（秒），由 app 在本進程啟動背景刷新執行緒
+  （見 api.admin.analytics.start_rollup_refresher；每個啟用的進程都會掃描，適合單進程部署）
+間隔應小於 TODAY_ROLLUP_MAX_AGE 與各分析緩存的 TTL，否則今天的匯總經常過期而退回即時計算。
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Union
+import logging
+
+import numpy as np
+
+try:
+    from firebase_admin import firestore
+    from utils.firebase_init import init_firebase
+
+    # 確保 Firebase 已初始化
+    init_firebase()
+    db = firestore.client()
+except Exception as e:
+    logging.warning(f"Could not initialize Firebase: {e}")
+    db = None
+
+from services.subscription_timeline import (
+    SECONDS_PER_DAY,
+    SubscriptionRow,
+    SubscriptionTimeline,
+    compute_daily_activity,
+    count_active,
+    count_events,
+    count_until,
+    daily_snapshots,
+    day_edges,
+    stream_subscription_rows,
+    sum_active,
+)
+from services.revenue_engine import resolve_monthly_prices
+
+logger = logging.getLogger(__name__)
+
+# 留存群組（創建後 N 天仍活躍）
+RETENTION_WINDOWS = (7, 30, 90)
+
+# Firestore 批量寫入上限
+_BATCH_SIZE = 500
+
+# 今天的匯總最多沿用多久（超過則視為缺失，調用方退回即時計算）
+TODAY_ROLLUP_MAX_AGE = 300  # 5 minutes
+
+
+def compute_daily_rollups(
+    subscriptions: Iterable[Union[SubscriptionRow, Dict[str, Any]]],
+    start_date: date,
+    end_date: date,
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    在一次遍歷中計算 [start_date, end_date] 每一天的匯總數據
+
+    Args:
+        subscriptions: SubscriptionRow（或訂閱 dict）的可迭代對象，只會遍歷一次
+        start_date: 開始日期（UTC，含）
+        end_date: 結束日期（UTC，含）
+        now: 當前時間（默認 UTC now），今天的快照時間為 now
+
+    Returns:
+        list: 每天一個 dict（字段見模塊說明），按日期排序
+    """
+    now = now or datetime.now(timezone.utc)
+    if end_date < start_date:
+        return []
+
+    timeline = SubscriptionTimeline.from_subscriptions(subscriptions)
+    activity = compute_daily_activity(timeline, start_date, end_date, now=now)
+
+    edges = day_edges(start_date, end_date)
+    snapshots = daily_snapshots(edges, now)
+
+    # 當天到期的付費（只計算已經到期的）
+    premium_end = timeline.premium_end
+    churned = count_events(np.where(premium_end <= now.timestamp(), premium_end, np.nan), edges)
+
+    total_users = count_until(timeline.created_at, snapshots)
+    premium_users = count_until(np.where(timeline.is_premium, timeline.premium_start, np.nan), snapshots)
+
+    # 月經常性收入：活躍付費區間的月費總和
+    prices = resolve_monthly_prices(timeline)
+    revenue = sum_active(timeline.premium_start, timeline.premium_end, prices, snapshots)
+    platform_revenue = {}
+    for platform in timeline.platforms():
+        rows = timeline.platform == platform
+        platform_revenue[platform] = sum_active(
+            timeline.premium_start[rows], timeline.premium_end[rows], prices[rows], snapshots
+        )
+
+    # 留存：創建滿 N 天後仍處於活躍區間（區間起點裁剪到滿 N 天的時間點）
+    active_starts, active_ends = timeline.active_intervals()
+    segments_per_row = len(active_starts) // max(len(timeline), 1)
+    cohort_users, retained_users = {}, {}
+    for window in RETENTION_WINDOWS:
+        eligible_at = timeline.created_at + window * SECONDS_PER_DAY
+        cohort_users[window] = count_until(eligible_at, snapshots)
+        clipped_starts = np.maximum(active_starts, np.tile(eligible_at, segments_per_row))
+        retained_users[window] = count_active(clipped_starts, active_ends, snapshots)
+
+    computed_at = datetime.now(timezone.utc)
+    rollups = []
+    for i, date_key in enumerate(activity['dates']):
+        active_premium = int(activity['active_premium_users'][i])
+        revenue_by_platform = {
+            p: round(float(amounts[i]), 2) for p, amounts in platform_revenue.items() if amounts[i]
+        }
+        rollups.append({
+            'date': date_key,
+            'snapshot_at': datetime.fromtimestamp(snapshots[i], tz=timezone.utc),
+            'new_users': int(activity['new_users'][i]),
+            'new_premium_users': int(activity['new_premium_users'][i]),
+            'churned': int(churned[i]),
+            'active_trials': int(activity['active_trial_users'][i]),
+            'active_premium': active_premium,
+            'total_users': int(total_users[i]),
+            'premium_users': int(premium_users[i]),
+            'revenue': round(float(revenue[i]), 2),
+            'revenue_by_platform': revenue_by_platform,
+            'retention': {
+                f'day_{w}': {
+                    'cohort_users': int(cohort_users[w][i]),
+                    'retained_users': int(retained_users[w][i])
+                }
+                for w in RETENTION_WINDOWS
+            },
+            'computed_at': computed_at,
+        })
+
+    return rollups
+
+
+class AnalyticsRollupService:
+    """每日分析匯總服務"""
+
+    COLLECTION_NAME = 'analytics_daily'
+
+    @staticmethod
+    def rebuild(start_date: date, end_date: Optional[date] = None) -> int:
+        """
+        重建 [start_date, end_date] 的每日匯總（一次掃描 subscriptions）
+
+        Args:
+            start_date: 開始日期（UTC，含）
+            end_date: 結束日期（UTC，含），默認今天
+
+        Returns:
+            int: 寫入的文檔數
+        """
+        if db is None:
+            logger.error("Firebase not initialized, cannot rebuild analytics rollups")
+            return 0
+
+        now = datetime.now(timezone.utc)
+        end_date = min(end_date or now.date(), now.date())
+
+        rows = stream_subscription_rows(db.collection('subscriptions'))
+        rollups = compute_daily_rollups(rows, start_date, end_date, now=now)
+
+        collection_ref = db.collection(AnalyticsRollupService.COLLECTION_NAME)
+        for i in range(0, len(rollups), _BATCH_SIZE):
+            batch = db.batch()
+            for rollup in rollups[i:i + _BATCH_SIZE]:
+                batch.set(collection_ref.document(rollup['date']), rollup)
+            batch.commit()
+
+        logger.info(
+            f"✅ Rebuilt {len(rollups)} analytics rollups "
+            f"({start_date.isoformat()} ~ {end_date.isoformat()})"
+        )
+        return len(rollups)
+
+    @staticmethod
+    def refresh_recent(days: int = 2) -> int:
+        """
+        刷新最近 N 天（含今天）的匯總，供排程任務定期調用
+
+        默認包含昨天：午夜前最後一次寫入的昨天匯總是部分數據，跨日後的第一次刷新補全。
+        """
+        today = datetime.now(timezone.utc).date()
+        return AnalyticsRollupService.rebuild(today - timedelta(days=days - 1), today)
+
+    @staticmethod
+    def get_range(
+        start_date: date,
+        end_date: date,
+        max_age: float = TODAY_ROLLUP_MAX_AGE,
+        now: Optional[datetime] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        讀取 [start_date, end_date] 的每日匯總（只讀，不會掃描 subscriptions）
+
+        今天之前的匯總必須在當天結束後計算；範圍包含今天時，今天的匯總必須在 max_age 秒內計算。
+
+        Args:
+            max_age: 今天的匯總最多沿用的秒數（調用方傳入對應分析的緩存 TTL）
+            now: 當前時間（默認 UTC now）
+
+        Returns:
+            list: 按日期排序的匯總數據；任何一天缺失、不完整或過期時返回 None（調用方應退回即時計算）
+        """
+        if db is None:
+            return None
+        now = now or datetime.now(timezone.utc)
+        end_date = min(end_date, now.date())
+
+        try:
+            start_key = start_date.strftime('%Y-%m-%d')
+            end_key = end_date.strftime('%Y-%m-%d')
+            docs = (
+                db.collection(AnalyticsRollupService.COLLECTION_NAME)
+                .where('date', '>=', start_key)
+                .where('date', '<=', end_key)
+                .order_by('date')
+                .stream()
+            )
+            rollups = [doc.to_dict() for doc in docs]
+        except Exception as e:
+            logger.warning(f"Failed to read analytics rollups: {e}")
+            return None
+
+        expected_days = (end_date - start_date).days + 1
+        complete = [r for r in rollups if _is_complete(r, now, max_age)]
+        if len(complete) != max(expected_days, 0):
+            logger.info(
+                f"Analytics rollups incomplete ({len(complete)}/{expected_days}), "
+                f"falling back to live computation"
+            )
+            return None
+
+        return complete
+
+
+def _is_complete(rollup: Dict[str, Any], now: datetime, max_age: float) -> bool:
+    """
+    匯總是否可用
+
+    已結束的日子：computed_at 不早於當天結束（否則只包含當天部分數據）；
+    今天：computed_at 在 max_age 秒內。
+    """
+    computed_at = rollup.get('computed_at')
+    if not isinstance(computed_at, datetime):
+        return False
+    if computed_at.tzinfo is None:
+        computed_at = computed_at.replace(tzinfo=timezone.utc)
+
+    day_end = datetime.strptime(rollup['date'], '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
+    if day_end <= now:
+        return computed_at >= day_end
+    return (now - computed_at).total_seconds() <= max_age
+
+
+# 創建全局實例
+analytics_rollup_service = AnalyticsRollupService()
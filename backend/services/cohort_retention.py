@@ -0,0 +1,110 @@
+"""
+群組留存矩陣（cohort × period）
+
+按註冊時間（created_at）把用戶分到週或月群組，統計每個群組在之後第 k 個週期
+仍然活躍（試用或付費區間與該週期重疊）的人數。
+
+計算方式：對訂閱時間線的活躍區間與週期邊界做 NumPy 廣播比較，
+得到「用戶 × 週期」的活躍矩陣，再按 (群組, 週期偏移) 累加。
+一次投影掃描即可得到完整矩陣，不需要按群組逐一查詢。
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from services.subscription_timeline import SubscriptionTimeline, period_starts
+
+GRANULARITIES = ('week', 'month')
+
+# 每次廣播處理的行數（限制「行 × 週期」布林矩陣的內存）
+_CHUNK_ROWS = 20000
+
+
+def cohort_label(start: datetime, granularity: str) -> str:
+    return start.strftime('%Y-%m-%d') if granularity == 'week' else start.strftime('%Y-%m')
+
+
+def compute_cohort_retention(
+    timeline: SubscriptionTimeline,
+    granularity: str = 'week',
+    periods: int = 52,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    計算群組留存矩陣
+
+    Args:
+        timeline: 訂閱時間線（只需包含窗口內註冊的用戶，窗口外的會被忽略）
+        granularity: 'week' 或 'month'
+        periods: 群組/週期數（含當前週期）
+        now: 當前時間（默認 UTC now），當前週期只統計到 now
+
+    Returns:
+        {
+            "granularity": "week",
+            "periods": 52,
+            "cohorts": [
+                {
+                    "cohort": "2025-01-06",
+                    "size": 120,
+                    "retained": [118, 80, 65, ...],   # 第 0..k 個週期仍活躍的人數
+                    "retention": [0.983, 0.667, ...]
+                },
+                ...
+            ]
+        }
+    """
+    now = now or datetime.now(timezone.utc)
+    starts = period_starts(granularity, now, periods)
+    edges = np.array([d.timestamp() for d in starts], dtype=np.float64)
+    period_begin = edges[:-1]
+    period_end = np.minimum(edges[1:], now.timestamp())
+
+    created = timeline.created_at
+    cohort = np.searchsorted(edges, created, side='right') - 1
+    in_window = ~np.isnan(created) & (cohort >= 0) & (cohort < periods) & (created <= now.timestamp())
+
+    # 活躍區間：每行 3 段（付費前試用、付費後試用、付費），形狀 (3, 行數)
+    seg_starts, seg_ends = timeline.active_intervals()
+    n = len(timeline)
+    seg_starts = seg_starts.reshape(3, n)
+    seg_ends = seg_ends.reshape(3, n)
+
+    counts = np.zeros((periods, periods), dtype=np.int64)  # [群組, 週期偏移]
+    for lo in range(0, n, _CHUNK_ROWS):
+        hi = min(lo + _CHUNK_ROWS, n)
+        rows = in_window[lo:hi]
+        if not rows.any():
+            continue
+
+        s = seg_starts[:, lo:hi][:, rows, None]
+        e = seg_ends[:, lo:hi][:, rows, None]
+        # (3, m, 1) 與 (periods,) 廣播 → (m, periods)：任一段與週期重疊即為活躍
+        active = ((s < e) & (s < period_end) & (e > period_begin)).any(axis=0)
+
+        row_idx, period_idx = np.nonzero(active)
+        row_cohort = cohort[lo:hi][rows][row_idx]
+        offsets = period_idx - row_cohort
+        keep = offsets >= 0
+        np.add.at(counts, (row_cohort[keep], offsets[keep]), 1)
+
+    sizes = np.bincount(cohort[in_window], minlength=periods)
+
+    cohorts = []
+    for c in range(periods):
+        elapsed = periods - c
+        retained = counts[c, :elapsed]
+        size = int(sizes[c])
+        cohorts.append({
+            'cohort': cohort_label(starts[c], granularity),
+            'size': size,
+            'retained': retained.tolist(),
+            'retention': np.round(retained / max(size, 1), 3).tolist(),
+        })
+
+    return {
+        'granularity': granularity,
+        'periods': periods,
+        'cohorts': cohorts,
+    }
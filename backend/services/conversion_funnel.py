@@ -0,0 +1,150 @@
+"""
+試用 → 付費轉換漏斗
+
+按註冊時間（created_at）把用戶分到週或月群組，統計每個群組到達各階段的人數：
+
+    signup（註冊）→ trial（有試用期）→ premium（已付費）→ renewal（付費超過首個計費週期）
+
+並統計從 trial_start_at 到 premium_start_at 的轉換天數分佈（直方圖與百分位數）。
+
+計算方式：一次投影掃描得到的訂閱時間線上，用 searchsorted 分組、bincount 累加，
+全部向量化，不需要按群組逐一查詢。
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from services.cohort_retention import cohort_label
+from services.revenue_engine import resolve_billing_months
+from services.subscription_timeline import SECONDS_PER_DAY, SubscriptionTimeline, period_starts
+
+STAGES = ('signup', 'trial', 'premium', 'renewal')
+
+# 每個計費月按 31 天計算（付費區間超過首個計費週期即視為已續訂）
+RENEWAL_DAYS_PER_MONTH = 31
+
+# 轉換天數直方圖的分桶邊界（天），最後一桶為 90 天以上
+TIME_TO_CONVERT_BINS = (0, 1, 3, 7, 14, 30, 60, 90)
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+def _bucket_label(i: int) -> str:
+    if i == len(TIME_TO_CONVERT_BINS) - 1:
+        return f'{TIME_TO_CONVERT_BINS[i]}+'
+    return f'{TIME_TO_CONVERT_BINS[i]}-{TIME_TO_CONVERT_BINS[i + 1]}'
+
+
+def _stage_counts(sizes: Dict[str, np.ndarray], i=None) -> Dict[str, Any]:
+    """各階段人數與相對上一階段的轉換率"""
+    counts = {stage: int(sizes[stage][i] if i is not None else sizes[stage].sum()) for stage in STAGES}
+    rates = {}
+    for prev, stage in zip(STAGES, STAGES[1:]):
+        rates[f'{prev}_to_{stage}'] = round(counts[stage] / max(counts[prev], 1), 3)
+    return {**counts, 'conversion': rates}
+
+
+def time_to_convert_distribution(days: np.ndarray) -> Dict[str, Any]:
+    """
+    轉換天數的直方圖與百分位數
+
+    Returns:
+        {
+            "converted": 120,
+            "histogram": [{"bucket": "0-1", "count": 10}, ..., {"bucket": "90+", "count": 2}],
+            "percentiles": {"p25": 2.5, "p50": 7.0, "p75": 13.2, "p90": 28.0},
+            "mean": 9.4
+        }
+    """
+    counts = np.bincount(
+        np.searchsorted(TIME_TO_CONVERT_BINS, days, side='right') - 1,
+        minlength=len(TIME_TO_CONVERT_BINS)
+    )
+    if len(days):
+        values = np.percentile(days, PERCENTILES)
+        percentiles = {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, values)}
+        mean = round(float(days.mean()), 2)
+    else:
+        percentiles = {f'p{p}': None for p in PERCENTILES}
+        mean = None
+
+    return {
+        'converted': int(len(days)),
+        'histogram': [
+            {'bucket': _bucket_label(i), 'count': int(count)}
+            for i, count in enumerate(counts)
+        ],
+        'percentiles': percentiles,
+        'mean': mean,
+    }
+
+
+def compute_conversion_funnel(
+    timeline: SubscriptionTimeline,
+    granularity: str = 'month',
+    periods: int = 12,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    計算按群組的轉換漏斗與轉換天數分佈
+
+    Args:
+        timeline: 訂閱時間線（只需包含窗口內註冊的用戶，窗口外的會被忽略）
+        granularity: 'week' 或 'month'
+        periods: 群組數（含當前週期）
+        now: 當前時間（默認 UTC now），之後才發生的事件不計入
+
+    Returns:
+        {
+            "granularity": "month",
+            "periods": 12,
+            "totals": {"signup": 1000, "trial": 950, "premium": 200, "renewal": 120,
+                       "conversion": {"signup_to_trial": 0.95, ...}},
+            "cohorts": [{"cohort": "2025-01", "signup": 80, ..., "conversion": {...}}, ...],
+            "time_to_convert": time_to_convert_distribution(...)
+        }
+    """
+    now = now or datetime.now(timezone.utc)
+    now_ts = now.timestamp()
+    starts = period_starts(granularity, now, periods)
+    edges = np.array([d.timestamp() for d in starts], dtype=np.float64)
+
+    created = timeline.created_at
+    cohort = np.searchsorted(edges, created, side='right') - 1
+    in_window = ~np.isnan(created) & (cohort >= 0) & (cohort < periods) & (created <= now_ts)
+
+    trial_start = timeline.trial_start
+    premium_start = timeline.premium_start
+    premium_end = timeline.premium_end
+
+    # NaN 與任何值比較都是 False，缺失字段不會到達該階段
+    reached = {
+        'signup': in_window,
+        'trial': in_window & (trial_start < timeline.trial_end) & (trial_start <= now_ts),
+        'premium': in_window & (premium_start <= now_ts),
+    }
+    renewal_seconds = resolve_billing_months(timeline) * RENEWAL_DAYS_PER_MONTH * SECONDS_PER_DAY
+    paid_until = np.minimum(premium_end, now_ts)
+    reached['renewal'] = reached['premium'] & (paid_until - premium_start > renewal_seconds)
+
+    sizes = {
+        stage: np.bincount(cohort[rows], minlength=periods)
+        for stage, rows in reached.items()
+    }
+
+    # 轉換天數只統計真的有 trial_start_at 的用戶（trial_start 已用 created_at 補齊缺失值）
+    trial_start_at = timeline.trial_start_at
+    converted = reached['premium'] & ~np.isnan(trial_start_at)
+    days = np.maximum(premium_start[converted] - trial_start_at[converted], 0.0) / SECONDS_PER_DAY
+
+    return {
+        'granularity': granularity,
+        'periods': periods,
+        'totals': _stage_counts(sizes),
+        'cohorts': [
+            {'cohort': cohort_label(starts[c], granularity), **_stage_counts(sizes, c)}
+            for c in range(periods)
+        ],
+        'time_to_convert': time_to_convert_distribution(days),
+    }
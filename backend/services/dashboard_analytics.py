@@ -0,0 +1,111 @@
+"""
+Dashboard 合併分析（一次掃描，多個歸約）
+
+Dashboard 頁面需要的總覽、收入、留存、趨勢四組指標，原本各自查詢
+subscriptions（活躍付費 / 活躍試用會被重複掃描三到四次）。
+這裡把一次字段投影掃描解碼成的 SubscriptionTimeline 共享給四個歸約函數：
+
+- overview_counts: 總覽計數（總用戶、試用、付費、新增）
+- retention_counts: 7 / 30 / 90 天群組的留存人數
+- compute_mrr_series: MRR 序列（services.revenue_engine）
+- compute_daily_activity: 每日新增與活躍人數（services.subscription_timeline）
+
+所有歸約都是對同一批 NumPy 列的向量化運算，不再讀取 Firestore。
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from services.analytics_rollup_service import RETENTION_WINDOWS
+from services.revenue_engine import compute_mrr_series
+from services.subscription_timeline import (
+    SECONDS_PER_DAY,
+    SubscriptionTimeline,
+    compute_daily_activity,
+)
+
+
+def overview_counts(timeline: SubscriptionTimeline, now: datetime) -> Dict[str, int]:
+    """
+    總覽計數（與 /overview 的即時計數查詢語義相同）
+
+    Returns:
+        {"total_users": 1000, "premium_users": 150, "trial_users": 300,
+         "active_premium_users": 120, "today_new_users": 5,
+         "this_week_new_users": 35, "this_month_new_users": 150}
+    """
+    now_ts = now.timestamp()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=now.weekday())
+    month_start = today_start.replace(day=1)
+
+    is_premium = timeline.is_premium
+    created_at = timeline.created_at
+
+    # NaN 與任何值比較都是 False，缺失字段不計入
+    return {
+        'total_users': len(timeline),
+        'premium_users': int(is_premium.sum()),
+        'trial_users': int(((timeline.trial_end > now_ts) & ~is_premium).sum()),
+        'active_premium_users': int(((timeline.premium_end > now_ts) & is_premium).sum()),
+        'today_new_users': int((created_at >= today_start.timestamp()).sum()),
+        'this_week_new_users': int((created_at >= week_start.timestamp()).sum()),
+        'this_month_new_users': int((created_at >= month_start.timestamp()).sum()),
+    }
+
+
+def retention_counts(timeline: SubscriptionTimeline, now: datetime) -> Dict[int, Dict[str, int]]:
+    """
+    留存群組人數（與 /retention 的即時掃描語義相同）
+
+    群組為創建滿 N 天的用戶；留存為其中當前仍在付費期（付費用戶）
+    或試用期（非付費用戶）內的人數。
+
+    Returns:
+        {7: {"total_users": 800, "retained_users": 600}, 30: {...}, 90: {...}}
+    """
+    now_ts = now.timestamp()
+    is_premium = timeline.is_premium
+    active = np.where(is_premium, timeline.premium_end > now_ts, timeline.trial_end > now_ts)
+
+    result = {}
+    for window in RETENTION_WINDOWS:
+        cohort = timeline.created_at <= now_ts - window * SECONDS_PER_DAY
+        result[window] = {
+            'total_users': int(cohort.sum()),
+            'retained_users': int((cohort & active).sum()),
+        }
+    return result
+
+
+def compute_dashboard(
+    timeline: SubscriptionTimeline,
+    days: int = 30,
+    months: int = 12,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    在同一條時間線上執行 Dashboard 的四個歸約
+
+    Args:
+        timeline: 所有訂閱的時間線（一次掃描）
+        days: 趨勢天數
+        months: MRR 序列月數
+        now: 當前時間（默認 UTC now）
+
+    Returns:
+        {
+            "overview": overview_counts(...),
+            "retention": retention_counts(...),
+            "mrr_series": compute_mrr_series(...),
+            "activity": compute_daily_activity(...)
+        }
+    """
+    now = now or datetime.now(timezone.utc)
+    return {
+        'overview': overview_counts(timeline, now),
+        'retention': retention_counts(timeline, now),
+        'mrr_series': compute_mrr_series(timeline, months, now=now),
+        'activity': compute_daily_activity(timeline, (now - timedelta(days=days)).date(), now.date(), now=now),
+    }
@@ -0,0 +1,120 @@
+"""
+訓練準備度面板緩存（準備度文檔 + rolling_trends 合併後的響應）
+
+管理員在準備度面板上切換日期時，同一用戶的同一天會被反覆請求。這裡按 (uid, 日期) 緩存
+合併後的響應，並記錄來源文檔的 update_time：
+
+- REVALIDATE_INTERVAL 秒內的重複請求直接返回緩存，不讀取 Firestore
+- 超過後由調用方重新讀取來源文檔（一次 get_all），update_time 都沒變時沿用緩存的響應，
+  不再重建；任一文檔變化（或當天沒有文檔、使用了最新文檔的回退結果）時重建
+- rolling_trends 的 28 天切片按 (uid, update_time) 緩存，同一用戶的不同日期共用
+- 條目按 LRU 淘汰，最長保留 READINESS_CACHE_TTL 秒
+
+使用方式:
+    payload = readiness_cache.get_fresh(uid, date_id)
+    if payload is None:
+        payload = readiness_cache.resolve(uid, date_id, readiness_doc, trends_doc, build_fn)
+"""
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.cache import TTLCache
+
+REVALIDATE_INTERVAL = 60  # seconds
+READINESS_CACHE_TTL = 1800  # 30 minutes
+READINESS_CACHE_MAX_ENTRIES = 512
+
+# 注入 trend_data 的準備度指標與天數
+READINESS_METRICS = ('speed', 'endurance', 'race_fitness', 'training_load', 'recovery')
+TREND_DAYS = 28
+
+
+def _version(doc):
+    return doc.update_time if doc is not None and doc.exists else None
+
+
+def trend_slices(rolling_trends: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """rolling_trends 中各指標最近 TREND_DAYS 天的趨勢"""
+    trends = {}
+    for metric_name in READINESS_METRICS:
+        metric_trend = rolling_trends.get(metric_name)
+        if metric_trend is None:
+            continue
+        trends[metric_name] = {
+            'dates': metric_trend.get('dates', [])[-TREND_DAYS:],
+            'values': metric_trend.get('values', [])[-TREND_DAYS:],
+            'direction': metric_trend.get('direction', 'stable')
+        }
+    return trends
+
+
+def inject_trend_data(readiness_data: Dict[str, Any], trends: Dict[str, Dict[str, Any]]) -> None:
+    """把趨勢注入到準備度的各指標中（已有 trend_data 的不覆蓋）"""
+    for metric_name, trend in trends.items():
+        metric = readiness_data.get(metric_name)
+        if isinstance(metric, dict) and metric.get('trend_data') is None:
+            metric['trend_data'] = trend
+
+
+class ReadinessCache:
+    """按 (uid, 日期) 與來源文檔 update_time 緩存的準備度響應"""
+
+    def __init__(
+        self,
+        revalidate_interval: float = REVALIDATE_INTERVAL,
+        ttl: float = READINESS_CACHE_TTL,
+        max_entries: int = READINESS_CACHE_MAX_ENTRIES
+    ):
+        self.revalidate_interval = revalidate_interval
+        self._payloads = TTLCache('readiness_payloads', max_entries=max_entries, default_ttl=ttl)
+        self._trends = TTLCache('readiness_trends', max_entries=max_entries, default_ttl=ttl)
+
+    def get_fresh(self, uid: str, date_id: str) -> Optional[Dict[str, Any]]:
+        """REVALIDATE_INTERVAL 秒內確認過的響應（否則返回 None，調用方讀取來源文檔後調用 resolve）"""
+        entry = self._payloads.get((uid, date_id))
+        if entry is not None and time.monotonic() - entry['checked_at'] < self.revalidate_interval:
+            return entry['payload']
+        return None
+
+    def resolve(
+        self,
+        uid: str,
+        date_id: str,
+        readiness_doc,
+        trends_doc,
+        build_fn: Callable[[], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        來源文檔的 update_time 與緩存一致時沿用緩存的響應，否則調用 build_fn 重建並緩存
+
+        Args:
+            readiness_doc: 該日期的準備度文檔（可能不存在）
+            trends_doc: rolling_trends/current 文檔（可能不存在）
+            build_fn: 構建響應
+        """
+        key = (uid, date_id)
+        versions = (_version(readiness_doc), _version(trends_doc))
+        entry = self._payloads.get(key)
+        if entry is not None and versions[0] is not None and entry['versions'] == versions:
+            entry['checked_at'] = time.monotonic()
+            return entry['payload']
+
+        payload = build_fn()
+        self._payloads.set(key, {'payload': payload, 'versions': versions, 'checked_at': time.monotonic()})
+        return payload
+
+    def trends(self, uid: str, trends_doc) -> Dict[str, Dict[str, Any]]:
+        """rolling_trends 的切片（同一版本只計算一次；文檔不存在時為空）"""
+        version = _version(trends_doc)
+        if version is None:
+            return {}
+        key = (uid, version)
+        return self._trends.get_or_compute(key, lambda: trend_slices(trends_doc.to_dict() or {}))
+
+    def clear(self) -> None:
+        self._payloads.clear()
+        self._trends.clear()
+
+
+# 全局單例
+readiness_cache = ReadinessCache()
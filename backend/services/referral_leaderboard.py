@@ -0,0 +1,211 @@
+"""
+邀請排行榜與病毒係數（增量維護）
+
+對 invite_code_usages 維護一個時間窗口內的邀請狀態：
+
+- 首次刷新時以字段投影掃描窗口內的使用記錄（按 used_at 排序）
+- 之後每次刷新只讀取 used_at >= 上次游標的新記錄，以及 reward_granted_at >= 上次游標
+  的記錄（之前的使用記錄後來發放了獎勵），不再重讀全部歷史
+- 記錄按文檔 ID 去重，游標邊界上重複讀到的記錄不會重複計數
+- 超出窗口的記錄按 used_at 最小堆淘汰
+- Top-K 以大小為 k 的堆（heapq.nsmallest，按計數降序）從每個邀請人的計數中選出
+
+增量狀態可能因漏掉的更新而漂移，每 FULL_REBUILD_INTERVAL 秒全量重建一次。
+
+病毒係數 K = 每用戶邀請數 × 邀請轉換率
+    每用戶邀請數 = 窗口內使用次數 / 總用戶數
+    邀請轉換率 = 已發放獎勵的使用次數 / 使用次數（被邀請人度過退款期才發放獎勵）
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.firestore_scan import scan_query
+
+logger = logging.getLogger(__name__)
+
+# 增量狀態的全量重建間隔（秒）
+FULL_REBUILD_INTERVAL = 6 * 3600
+
+# 讀取的字段（投影）
+_FIELDS = ['inviter_uid', 'invitee_uid', 'used_at', 'reward_granted', 'reward_granted_at']
+
+
+def _later(current: Optional[datetime], value) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return current
+    return value if current is None or value > current else current
+
+
+class ReferralLeaderboard:
+    """
+    一個時間窗口內的邀請排行榜狀態
+
+    Args:
+        window_days: 窗口天數（None 表示全部歷史）
+    """
+
+    def __init__(self, window_days: Optional[int] = None):
+        self.window_days = window_days
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._usages: Dict[str, List[Any]] = {}  # doc_id → [used_ts, inviter_uid, rewarded]
+        self._expiry: List[Tuple[float, str]] = []  # (used_ts, doc_id) 最小堆
+        self._usage_counts = Counter()
+        self._rewarded_counts = Counter()
+        self._rewarded_total = 0
+        self._used_cursor: Optional[datetime] = None
+        self._reward_cursor: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._usages)
+
+    def _cutoff(self, now: datetime) -> Optional[datetime]:
+        return now - timedelta(days=self.window_days) if self.window_days else None
+
+    def apply(self, doc_id: str, data: Dict[str, Any], now: Optional[datetime] = None) -> None:
+        """加入或更新一筆使用記錄（重複的記錄只更新獎勵狀態）"""
+        now = now or datetime.now(timezone.utc)
+        used_at = data.get('used_at')
+        inviter = data.get('inviter_uid')
+        rewarded = bool(data.get('reward_granted'))
+        self._used_cursor = _later(self._used_cursor, used_at)
+        self._reward_cursor = _later(self._reward_cursor, data.get('reward_granted_at'))
+
+        existing = self._usages.get(doc_id)
+        if existing is not None:
+            if rewarded and not existing[2]:
+                existing[2] = True
+                self._rewarded_counts[existing[1]] += 1
+                self._rewarded_total += 1
+            return
+
+        cutoff = self._cutoff(now)
+        if not isinstance(used_at, datetime) or not inviter or (cutoff and used_at < cutoff):
+            return
+
+        used_ts = used_at.timestamp()
+        self._usages[doc_id] = [used_ts, inviter, rewarded]
+        heapq.heappush(self._expiry, (used_ts, doc_id))
+        self._usage_counts[inviter] += 1
+        if rewarded:
+            self._rewarded_counts[inviter] += 1
+            self._rewarded_total += 1
+
+    def evict(self, now: Optional[datetime] = None) -> int:
+        """淘汰超出窗口的記錄，返回淘汰數"""
+        cutoff = self._cutoff(now or datetime.now(timezone.utc))
+        if cutoff is None:
+            return 0
+        cutoff_ts = cutoff.timestamp()
+        evicted = 0
+        while self._expiry and self._expiry[0][0] < cutoff_ts:
+            _, doc_id = heapq.heappop(self._expiry)
+            _, inviter, rewarded = self._usages.pop(doc_id)
+            self._usage_counts[inviter] -= 1
+            if not self._usage_counts[inviter]:
+                del self._usage_counts[inviter]
+            if rewarded:
+                self._rewarded_counts[inviter] -= 1
+                self._rewarded_total -= 1
+                if not self._rewarded_counts[inviter]:
+                    del self._rewarded_counts[inviter]
+            evicted += 1
+        return evicted
+
+    def refresh(self, usages_ref, now: Optional[datetime] = None) -> int:
+        """
+        從 Firestore 增量刷新（首次或超過 FULL_REBUILD_INTERVAL 時全量重建）
+
+        Returns:
+            int: 本次讀取的文檔數
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            cutoff = self._cutoff(now)
+            rebuild = self._built_at is None or time.monotonic() - self._built_at > FULL_REBUILD_INTERVAL
+            if rebuild:
+                self._reset()
+                self._built_at = time.monotonic()
+                queries = []
+            elif self._reward_cursor is not None:
+                queries = [(usages_ref.where('reward_granted_at', '>=', self._reward_cursor), 'reward_granted_at')]
+            else:
+                queries = []
+
+            # 新的使用記錄：從最新 used_at 游標（首次為窗口起點）開始讀取
+            since = self._used_cursor or cutoff
+            queries.insert(0, (usages_ref.where('used_at', '>=', since) if since else usages_ref, 'used_at'))
+
+            read = 0
+            for query, order_by in queries:
+                for doc in scan_query(query.select(_FIELDS), order_by=order_by):
+                    self.apply(doc.id, doc.to_dict() or {}, now)
+                    read += 1
+            if rebuild and self._reward_cursor is None:
+                # 重建時還沒有任何已發放的獎勵：之後發放的獎勵時間一定晚於本次重建
+                self._reward_cursor = now
+            self.evict(now)
+            return read
+
+    def top(self, k: int, by: str = 'usages') -> List[Dict[str, Any]]:
+        """
+        使用次數（by='usages'）或已獎勵次數（by='rewarded_usages'）最多的 k 個邀請人
+
+        同分時按邀請人 UID 排序，結果穩定。
+        """
+        counts = self._usage_counts if by == 'usages' else self._rewarded_counts
+        best = heapq.nsmallest(k, counts.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            {
+                'inviter_uid': inviter,
+                'usages': self._usage_counts[inviter],
+                'rewarded_usages': self._rewarded_counts[inviter],
+            }
+            for inviter, _ in best
+        ]
+
+    def summary(self, total_users: int) -> Dict[str, Any]:
+        """窗口內的總量與病毒係數"""
+        usages = len(self._usages)
+        inviters = len(self._usage_counts)
+        invites_per_user = usages / max(total_users, 1)
+        conversion_rate = self._rewarded_total / usages if usages else 0.0
+        return {
+            'usages': usages,
+            'rewarded_usages': self._rewarded_total,
+            'inviters': inviters,
+            'invites_per_inviter': round(usages / max(inviters, 1), 3),
+            'invites_per_user': round(invites_per_user, 4),
+            'conversion_rate': round(conversion_rate, 3),
+            'virality_coefficient': round(invites_per_user * conversion_rate, 4),
+        }
+
+    def result(self, k: int, total_users: int) -> Dict[str, Any]:
+        """排行榜與病毒係數（與刷新互斥，讀到一致的狀態）"""
+        with self._lock:
+            return {
+                'top_by_usages': self.top(k, 'usages'),
+                'top_by_rewarded_usages': self.top(k, 'rewarded_usages'),
+                **self.summary(total_users),
+            }
+
+
+_leaderboards: Dict[Optional[int], ReferralLeaderboard] = {}
+_leaderboards_lock = threading.Lock()
+
+
+def get_leaderboard(window_days: Optional[int]) -> ReferralLeaderboard:
+    """本進程內各窗口共用的排行榜狀態"""
+    with _leaderboards_lock:
+        board = _leaderboards.get(window_days)
+        if board is None:
+            board = _leaderboards[window_days] = ReferralLeaderboard(window_days)
+        return board
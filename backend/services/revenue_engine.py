@@ -0,0 +1,153 @@
+"""
+收入引擎（MRR / ARR 時間序列）
+
+按每個訂閱的方案、價格與付款平台換算月費（見 config.pricing_config），
+在訂閱付費區間上一次向量化計算：
+
+- mrr: 每月月底（當月為當前時間）的月經常性收入
+- recognized_revenue: 按天數把月費分攤到各月的收入（跨月的區間按比例拆分）
+- new / expansion / contraction / churned / reactivated MRR:
+  相鄰兩個月底快照之間，每個客戶（uid）MRR 變化的分類
+
+    mrr[m] - mrr[m-1] = new + reactivated + expansion - contraction - churned
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config.pricing_config import DEFAULT_MONTHLY_PRICE, PLATFORM_MONTHLY_PRICES, PLAN_PRICING
+from services.subscription_timeline import SubscriptionTimeline, period_starts
+
+
+def resolve_billing_months(timeline: SubscriptionTimeline) -> np.ndarray:
+    """每行訂閱的計費月數（方案價目表中沒有的方案按 1 個月）"""
+    billing_months = np.ones(len(timeline))
+    for product_id in set(timeline.product_id.tolist()):
+        plan = PLAN_PRICING.get(product_id)
+        if plan:
+            billing_months[timeline.product_id == product_id] = plan['months']
+    return billing_months
+
+
+def resolve_monthly_prices(timeline: SubscriptionTimeline) -> np.ndarray:
+    """
+    每行訂閱的月費
+
+    優先使用訂閱上的 price（按方案計費月數折算），其次方案價目表，
+    再其次付款平台默認月費，最後 DEFAULT_MONTHLY_PRICE。
+    """
+    n = len(timeline)
+    billing_months = resolve_billing_months(timeline)
+    plan_prices = np.full(n, np.nan)
+    for product_id in set(timeline.product_id.tolist()):
+        plan = PLAN_PRICING.get(product_id)
+        if plan:
+            plan_prices[timeline.product_id == product_id] = plan['price'] / plan['months']
+
+    platform_prices = np.full(n, float(DEFAULT_MONTHLY_PRICE))
+    for platform, price in PLATFORM_MONTHLY_PRICES.items():
+        platform_prices[timeline.platform == platform] = price
+
+    own_prices = timeline.price / billing_months
+    return np.where(
+        ~np.isnan(own_prices), own_prices,
+        np.where(~np.isnan(plan_prices), plan_prices, platform_prices)
+    )
+
+
+def _round(values: np.ndarray) -> list:
+    return np.round(values, 2).tolist()
+
+
+def compute_mrr_series(
+    timeline: SubscriptionTimeline,
+    months: int = 12,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    計算最近 months 個月（含當月）的 MRR 序列與變動分類
+
+    Args:
+        timeline: 訂閱時間線（只需包含付費區間與窗口重疊的訂閱）
+        months: 月數（含當月）
+        now: 當前時間（默認 UTC now）
+
+    Returns:
+        {
+            "months": ["2025-01", ...],
+            "mrr": [...],
+            "recognized_revenue": [...],
+            "new_mrr": [...],
+            "expansion_mrr": [...],
+            "contraction_mrr": [...],
+            "churned_mrr": [...],
+            "reactivated_mrr": [...],
+            "current_mrr": 15000.0,
+            "active_subscriptions": 100,
+            "by_platform": {"stripe": 10000.0, ...}
+        }
+
+        reactivated 指窗口內曾經有 MRR、中斷後重新付費的客戶（按 uid 合併多段付費）。
+    """
+    now = now or datetime.now(timezone.utc)
+    now_ts = now.timestamp()
+    starts = period_starts('month', now, months)
+    edges = np.array([d.timestamp() for d in starts], dtype=np.float64)
+    month_begin = edges[:-1]
+    month_end = np.minimum(edges[1:], now_ts)
+    # 快照：窗口開始時 + 每月月底（當月為 now）
+    snapshots = np.concatenate([edges[:1], month_end])
+
+    prices = resolve_monthly_prices(timeline)
+    premium_start, premium_end = timeline.premium_intervals()
+    valid = premium_start < premium_end
+    s = premium_start[valid][:, None]
+    e = premium_end[valid][:, None]
+    p = prices[valid]
+
+    # 每行在各快照時的 MRR（行 × 快照）
+    row_mrr = np.where((s <= snapshots) & (e > snapshots), p[:, None], 0.0)
+
+    # 按天分攤收入：區間與每月 [月初, min(月底, now)) 的重疊比例
+    overlap = np.clip(np.minimum(e, month_end) - np.maximum(s, month_begin), 0.0, None)
+    recognized = (p[:, None] * overlap / (edges[1:] - month_begin)).sum(axis=0)
+
+    # 合併同一客戶的多段付費（沒有 uid 的行各自視為一個客戶）
+    uids = timeline.uid[valid]
+    keys = np.array([uid if uid is not None else f'#{i}' for i, uid in enumerate(uids)], dtype=object)
+    if len(keys):
+        _, customer = np.unique(keys, return_inverse=True)
+        customer_mrr = np.zeros((customer.max() + 1, len(snapshots)))
+        np.add.at(customer_mrr, customer, row_mrr)
+    else:
+        customer_mrr = np.zeros((0, len(snapshots)))
+
+    prev = customer_mrr[:, :-1]
+    cur = customer_mrr[:, 1:]
+    seen_before = np.logical_or.accumulate(prev > 0, axis=1) if prev.size else prev > 0
+    started = (prev == 0) & (cur > 0)
+
+    current_rows = row_mrr[:, -1]
+    active_now = (s[:, 0] <= snapshots[-1]) & (e[:, 0] > snapshots[-1])
+    by_platform = {}
+    for platform in sorted(set(timeline.platform[valid].tolist())):
+        if not platform:
+            continue
+        amount = current_rows[timeline.platform[valid] == platform].sum()
+        if amount:
+            by_platform[platform] = round(float(amount), 2)
+
+    return {
+        'months': [d.strftime('%Y-%m') for d in starts[:-1]],
+        'mrr': _round(customer_mrr[:, 1:].sum(axis=0)),
+        'recognized_revenue': _round(recognized),
+        'new_mrr': _round(np.where(started & ~seen_before, cur, 0.0).sum(axis=0)),
+        'reactivated_mrr': _round(np.where(started & seen_before, cur, 0.0).sum(axis=0)),
+        'expansion_mrr': _round(np.where((prev > 0) & (cur > prev), cur - prev, 0.0).sum(axis=0)),
+        'contraction_mrr': _round(np.where((prev > 0) & (cur > 0) & (cur < prev), prev - cur, 0.0).sum(axis=0)),
+        'churned_mrr': _round(np.where((prev > 0) & (cur == 0), prev, 0.0).sum(axis=0)),
+        'current_mrr': round(float(current_rows.sum()), 2),
+        'active_subscriptions': int(active_now.sum()),
+        'by_platform': by_platform,
+    }
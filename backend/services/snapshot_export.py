@@ -0,0 +1,255 @@
+"""
+列式快照導出（Parquet / Arrow）
+
+把 subscriptions、users、invite_code_usages 以字段投影 + 游標分頁讀出，
+按固定行數分塊寫入 Parquet 或 Arrow IPC 文件，供離線分析直接以向量化方式讀取，
+不必再對生產 Firestore 執行臨時腳本。
+
+- 只導出列出的字段（users 不包含 garmin_tokens / strava_tokens 等憑證，
+  subscriptions 不包含收據與第三方支付 ID）
+- 內存中最多只有一頁文檔與一個未寫出的分塊（與集合大小無關）
+- 每個集合使用固定 schema，缺失或類型不符的值寫為 null
+
+使用方式:
+    stats = export_collection(db, 'subscriptions', '/tmp/subscriptions.parquet')
+
+依賴 pyarrow（未安裝時 export_collection 拋出 RuntimeError）。
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError as e:
+    logging.warning(f"Could not import pyarrow: {e}")
+    pa = None
+    pa_ipc = None
+    pq = None
+
+from utils.firestore_scan import DEFAULT_PAGE_SIZE, scan_query
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('parquet', 'arrow')
+
+# 每個寫出分塊的行數
+DEFAULT_CHUNK_ROWS = 5000
+
+# 導出字段：(字段名, 類型)；文檔 ID 以 id_field 寫入
+EXPORT_SPECS: Dict[str, Dict[str, Any]] = {
+    'subscriptions': {
+        'id_field': 'uid',
+        'fields': [
+            ('created_at', 'timestamp'),
+            ('updated_at', 'timestamp'),
+            ('trial_days', 'int'),
+            ('trial_start_at', 'timestamp'),
+            ('trial_end_at', 'timestamp'),
+            ('is_premium', 'bool'),
+            ('premium_start_at', 'timestamp'),
+            ('premium_end_at', 'timestamp'),
+            ('total_extension_days', 'int'),
+            ('payment_platform', 'string'),
+            ('product_id', 'string'),
+            ('price', 'float'),
+        ],
+    },
+    'users': {
+        'id_field': 'uid',
+        'fields': [
+            ('email', 'string'),
+            ('display_name', 'string'),
+            ('preferred_language', 'string'),
+            ('vdot', 'float'),
+            ('is_admin', 'bool'),
+            ('data_source', 'string'),
+            ('apple_health_last_sync', 'timestamp'),
+            ('created_at', 'timestamp'),
+            ('updated_at', 'timestamp'),
+            ('last_login_at', 'timestamp'),
+        ],
+    },
+    'invite_code_usages': {
+        'id_field': 'id',
+        'fields': [
+            ('code', 'string'),
+            ('inviter_uid', 'string'),
+            ('invitee_uid', 'string'),
+            ('used_at', 'timestamp'),
+            ('reward_granted', 'bool'),
+            ('reward_granted_at', 'timestamp'),
+            ('reward_days', 'int'),
+            ('inviter_past_refund_period', 'bool'),
+            ('invitee_past_refund_period', 'bool'),
+        ],
+    },
+}
+
+
+def _arrow_type(kind: str):
+    return {
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'bool': pa.bool_(),
+        'string': pa.string(),
+    }[kind]
+
+
+def _coerce(value: Any, kind: str) -> Any:
+    """把 Firestore 值轉成 schema 類型（類型不符時為 None）"""
+    if value is None:
+        return None
+    if kind == 'timestamp':
+        if not isinstance(value, datetime):
+            return None
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if kind == 'bool':
+        return value if isinstance(value, bool) else None
+    if kind == 'int':
+        return int(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if kind == 'float':
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    return str(value)
+
+
+def export_schema(collection: str):
+    """集合的 Arrow schema"""
+    spec = EXPORT_SPECS[collection]
+    return pa.schema(
+        [(spec['id_field'], pa.string())]
+        + [(name, _arrow_type(kind)) for name, kind in spec['fields']]
+    )
+
+
+class _ChunkedWriter:
+    """按分塊寫出 RecordBatch 的 Parquet / Arrow 寫入器"""
+
+    def __init__(self, path: str, schema, file_format: str):
+        self.schema = schema
+        if file_format == 'parquet':
+            self._writer = pq.ParquetWriter(path, schema, compression='zstd')
+            self._write = self._writer.write_batch
+        else:
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa_ipc.new_file(self._sink, schema)
+            self._write = self._writer.write_batch
+
+    def write(self, columns: Dict[str, List[Any]]) -> None:
+        self._write(pa.RecordBatch.from_pydict(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+        sink = getattr(self, '_sink', None)
+        if sink is not None:
+            sink.close()
+
+
+def iter_export_rows(query, collection: str, page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    以字段投影分頁讀取集合，逐筆產出按 schema 轉換後的 (id, values)
+
+    Args:
+        query: 集合的 CollectionReference
+        collection: EXPORT_SPECS 中的集合名
+        page_size: 每頁文檔數
+    """
+    fields = EXPORT_SPECS[collection]['fields']
+    projected = query.select([name for name, _ in fields])
+    for doc in scan_query(projected, page_size=page_size):
+        data = doc.to_dict() or {}
+        yield doc.id, [_coerce(data.get(name), kind) for name, kind in fields]
+
+
+def export_rows(
+    rows,
+    collection: str,
+    path: str,
+    file_format: str = 'parquet',
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Dict[str, Any]:
+    """
+    把 (id, values) 行寫入列式文件（每 chunk_rows 行寫出一個分塊）
+
+    Returns:
+        {"collection": "users", "path": "...", "format": "parquet", "rows": 1000, "chunks": 1}
+    """
+    if pa is None:
+        raise RuntimeError('pyarrow is not installed')
+    if file_format not in FORMATS:
+        raise ValueError(f'Invalid format: {file_format}')
+
+    spec = EXPORT_SPECS[collection]
+    names = [spec['id_field']] + [name for name, _ in spec['fields']]
+    writer = _ChunkedWriter(path, export_schema(collection), file_format)
+
+    def empty_chunk() -> Tuple[Dict[str, List[Any]], int]:
+        return {name: [] for name in names}, 0
+
+    total, chunks = 0, 0
+    columns, size = empty_chunk()
+    try:
+        for doc_id, values in rows:
+            columns[names[0]].append(doc_id)
+            for name, value in zip(names[1:], values):
+                columns[name].append(value)
+            size += 1
+            if size >= chunk_rows:
+                writer.write(columns)
+                total, chunks = total + size, chunks + 1
+                columns, size = empty_chunk()
+
+        if size or chunks == 0:
+            writer.write(columns)
+            total, chunks = total + size, chunks + 1
+    finally:
+        writer.close()
+
+    return {
+        'collection': collection,
+        'path': path,
+        'format': file_format,
+        'rows': total,
+        'chunks': chunks,
+    }
+
+
+def export_collection(
+    db,
+    collection: str,
+    path: str,
+    file_format: str = 'parquet',
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    """
+    導出一個集合到 Parquet / Arrow 文件
+
+    Args:
+        db: Firestore client
+        collection: subscriptions / users / invite_code_usages
+        path: 輸出文件路徑
+        file_format: parquet 或 arrow
+        chunk_rows: 每個分塊的行數
+        page_size: 每頁讀取的文檔數
+    """
+    if collection not in EXPORT_SPECS:
+        raise ValueError(f'Invalid collection: {collection}')
+
+    start = time.monotonic()
+    stats = export_rows(
+        iter_export_rows(db.collection(collection), collection, page_size=page_size),
+        collection,
+        path,
+        file_format=file_format,
+        chunk_rows=chunk_rows
+    )
+    logger.info(
+        f"Exported {stats['rows']} {collection} rows to {path} "
+        f"({stats['chunks']} chunk(s), {time.monotonic() - start:.2f}s)"
+    )
+    return stats
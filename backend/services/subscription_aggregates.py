@@ -0,0 +1,156 @@
+"""
+訂閱服務端聚合（Firestore sum / avg / count）
+
+收入與延長天數統計只依賴文檔上存儲的數值字段時，直接用聚合查詢在服務端計算，
+讀取成本與訂閱數量無關（固定數量的聚合查詢），不必串流所有文檔：
+
+- aggregate_mrr: 指定時間點的 MRR、活躍付費數與各平台 MRR
+- aggregate_extension_stats: 訂閱延長天數（total_extension_days）統計
+
+月費需要按方案價目表（PLAN_PRICING）換算時屬於計算字段，服務端無法聚合，
+aggregate_mrr 拋出 AggregationUnavailable，由調用方改用串流掃描
+（services.revenue_engine）。延長天數統計在聚合失敗時以投影串流計算。
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable
+
+from config.pricing_config import DEFAULT_MONTHLY_PRICE, PLATFORM_MONTHLY_PRICES, PLAN_PRICING
+from utils.concurrency import aggregate_query, fan_out
+from utils.firestore_scan import scan_query
+
+logger = logging.getLogger(__name__)
+
+
+class AggregationUnavailable(Exception):
+    """當前配置或數據無法用服務端聚合精確計算（調用方應改用串流掃描）"""
+
+
+def supports_aggregated_mrr() -> bool:
+    """沒有方案價目表時，月費只取決於文檔上的 price 與付款平台，可在服務端聚合"""
+    return not PLAN_PRICING
+
+
+def _priced_count(result: Dict[str, Any]) -> int:
+    """
+    price 為數值的文檔數（sum / avg 反推）
+
+    Firestore 的 sum / avg 只計入數值文檔；avg 為 None 表示沒有數值文檔。
+    avg 為 0 時無法反推（所有價格都是 0），拋出 AggregationUnavailable。
+    """
+    avg = result.get('avg_price')
+    if avg is None:
+        return 0
+    if avg == 0:
+        raise AggregationUnavailable('cannot derive priced count from zero average price')
+    return int(round(result['sum_price'] / avg))
+
+
+def _active_totals(boundary: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """
+    由兩個邊界查詢相減得到時間點 t 的活躍付費統計
+
+    付費區間為 [premium_start_at, premium_end_at)，t 時活躍的集合
+    = {premium_end_at > t} - {premium_start_at > t}
+    （開始晚於 t 的區間一定也在 t 之後結束）。
+    """
+    ending, starting = boundary['end'], boundary['start']
+    count = ending['count'] - starting['count']
+    priced = _priced_count(ending) - _priced_count(starting)
+    return {
+        'count': count,
+        'price_sum': (ending.get('sum_price') or 0) - (starting.get('sum_price') or 0),
+        'unpriced': count - priced,
+    }
+
+
+def aggregate_mrr(subscriptions_ref, at: datetime, platforms: Iterable[str]) -> Dict[str, Any]:
+    """
+    以聚合查詢計算時間點 at 的 MRR（與 resolve_monthly_prices 的解析規則一致）
+
+    每個分組（全部 + 每個付款平台）各兩個聚合查詢（count + sum/avg price），並發執行。
+
+    Args:
+        subscriptions_ref: subscriptions 集合
+        at: 時間點
+        platforms: 需要分平台統計的付款平台
+
+    Returns:
+        {"mrr": 15000.0, "active_subscriptions": 100, "by_platform": {"stripe": 10000.0, ...}}
+
+    Raises:
+        AggregationUnavailable: 配置了方案價目表、聚合查詢失敗或無法精確反推
+    """
+    if not supports_aggregated_mrr():
+        raise AggregationUnavailable('plan pricing requires per-subscription price resolution')
+
+    platforms = sorted(set(platforms) | set(PLATFORM_MONTHLY_PRICES))
+    groups = {None: subscriptions_ref}
+    for platform in platforms:
+        groups[platform] = subscriptions_ref.where('payment_platform', '==', platform)
+
+    tasks = {}
+    for group, query in groups.items():
+        for side, field in (('end', 'premium_end_at'), ('start', 'premium_start_at')):
+            tasks[(group, side)] = (
+                lambda q=query.where(field, '>', at): aggregate_query(q, sums=['price'], avgs=['price'])
+            )
+    results, errors = fan_out(tasks)
+    if errors:
+        raise AggregationUnavailable(f'aggregation queries failed: {sorted(errors.values())}')
+
+    totals = {
+        group: _active_totals({side: results[(group, side)] for side in ('end', 'start')})
+        for group in groups
+    }
+
+    by_platform = {}
+    rest_sum, rest_unpriced = totals[None]['price_sum'], totals[None]['unpriced']
+    for platform in platforms:
+        group = totals[platform]
+        amount = group['price_sum'] + PLATFORM_MONTHLY_PRICES.get(platform, DEFAULT_MONTHLY_PRICE) * group['unpriced']
+        if amount:
+            by_platform[platform] = round(float(amount), 2)
+        rest_sum -= group['price_sum']
+        rest_unpriced -= group['unpriced']
+
+    mrr = sum(by_platform.values()) + rest_sum + DEFAULT_MONTHLY_PRICE * rest_unpriced
+    return {
+        'mrr': round(float(mrr), 2),
+        'active_subscriptions': int(totals[None]['count']),
+        'by_platform': by_platform,
+    }
+
+
+def _extension_result(extended: int, total_days: float) -> Dict[str, Any]:
+    return {
+        'extended_subscriptions': int(extended),
+        'total_extension_days': int(total_days or 0),
+        'average_extension_days': round(total_days / extended, 2) if extended else 0.0,
+    }
+
+
+def aggregate_extension_stats(subscriptions_ref) -> Dict[str, Any]:
+    """
+    訂閱延長天數統計（服務端 count + sum，失敗時投影串流）
+
+    Args:
+        subscriptions_ref: 訂閱集合或查詢
+
+    Returns:
+        {"extended_subscriptions": 40, "total_extension_days": 1200, "average_extension_days": 30.0}
+    """
+    extended = subscriptions_ref.where('total_extension_days', '>', 0)
+    try:
+        result = aggregate_query(extended, sums=['total_extension_days'])
+        return _extension_result(result['count'], result['sum_total_extension_days'])
+    except Exception as e:
+        logger.warning(f"Extension aggregation failed, streaming instead: {e}")
+
+    count, total = 0, 0
+    for doc in scan_query(extended.select(['total_extension_days']), order_by='total_extension_days'):
+        days = (doc.to_dict() or {}).get('total_extension_days')
+        if isinstance(days, (int, float)) and days > 0:
+            count, total = count + 1, total + days
+    return _extension_result(count, total)
+
@@ -0,0 +1,366 @@
+"""
+訂閱增量計數器
+
+在進程內監聽 subscriptions 的變更（Firestore on_snapshot），把每個文檔變更前後的差異
+應用到計數器上，總覽統計只需讀取計數器（O(1)），不必重新執行聚合查詢。
+
+計數器:
+- total_users: 訂閱總數
+- premium_users: is_premium = true 的訂閱數
+- trial_users: 試用未過期且非付費（trial_end_at > now 且 is_premium = false）
+- active_premium_users: 付費未過期（is_premium = true 且 premium_end_at > now）
+- new_per_day: 每天（UTC）新增的訂閱數
+
+活躍試用/付費會隨時間過期而不一定有文檔變更：每個計入活躍的文檔把到期時間放入
+最小堆，讀取時彈出已到期的條目並扣減，不需要掃描。
+
+監聽器（SubscriptionCounterListener）另外:
+- 定期把計數器寫入 analytics_counters/subscriptions（checkpoint），
+  沒有啟動監聽器的 worker / 實例也能以一次文檔讀取得到總覽數據
+- 定期全量重掃（字段投影）重建計數器，修正可能的漂移；重掃期間的變更會在重建後重放
+
+Firestore 結構:
+    analytics_counters/subscriptions:
+        - total_users, premium_users, trial_users, active_premium_users: int
+        - new_per_day: dict (YYYY-MM-DD -> int，最近 62 天)
+        - checkpoint_at: datetime
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from services.subscription_timeline import SubscriptionRow, stream_subscription_rows, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# checkpoint 中保留的每日新增天數（足夠計算本週、本月）
+CHECKPOINT_DAYS = 62
+
+
+class _DocState:
+    """單個訂閱對計數器的貢獻"""
+    __slots__ = ('created_day', 'is_premium', 'trial_end', 'premium_end', 'generation', 'in_trial', 'in_premium')
+
+    def __init__(self, created_day, is_premium, trial_end, premium_end, generation):
+        self.created_day = created_day
+        self.is_premium = is_premium
+        self.trial_end = trial_end
+        self.premium_end = premium_end
+        self.generation = generation
+        self.in_trial = False
+        self.in_premium = False
+
+
+def _new_user_counts(new_per_day: Dict[str, int], now: datetime) -> Dict[str, int]:
+    """由每日新增計算今天 / 本週 / 本月新增"""
+    today = now.astimezone(timezone.utc).date()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    def since(start):
+        days = (today - start).days + 1
+        return sum(new_per_day.get((start + timedelta(days=i)).strftime('%Y-%m-%d'), 0) for i in range(days))
+
+    return {
+        'today_new_users': since(today),
+        'this_week_new_users': since(week_start),
+        'this_month_new_users': since(month_start),
+    }
+
+
+class SubscriptionCounters:
+    """
+    由訂閱文檔狀態維護的計數器
+
+    apply(uid, row) 以文檔的最新狀態替換其舊的貢獻（upsert 語義，可重放）。
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, _DocState] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._trial_expiry = []    # (trial_end, uid, generation) 最小堆
+        self._premium_expiry = []  # (premium_end, uid, generation) 最小堆
+        self.total_users = 0
+        self.premium_users = 0
+        self.trial_users = 0
+        self.active_premium_users = 0
+        self.new_per_day = Counter()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def apply(self, uid: str, row: Optional[SubscriptionRow], now: Optional[datetime] = None) -> None:
+        """
+        應用一個文檔的變更
+
+        Args:
+            uid: 文檔 ID
+            row: 文檔的最新狀態（None 表示已刪除）
+            now: 當前時間（默認 UTC now）
+        """
+        now_ts = (now or datetime.now(timezone.utc)).timestamp()
+        with self._lock:
+            self._remove_locked(uid)
+            if row is not None:
+                self._add_locked(uid, row, now_ts)
+            if len(self._trial_expiry) + len(self._premium_expiry) > 4 * len(self._docs) + 1000:
+                self._compact_locked()
+
+    def counts(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """當前計數（先扣減已到期的活躍試用/付費）"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            self._expire_locked(now.timestamp())
+            result = {
+                'total_users': self.total_users,
+                'premium_users': self.premium_users,
+                'trial_users': self.trial_users,
+                'active_premium_users': self.active_premium_users,
+            }
+            new_per_day = dict(self.new_per_day)
+        result.update(_new_user_counts(new_per_day, now))
+        return result
+
+    def snapshot(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """checkpoint 用的快照（每日新增只保留最近 CHECKPOINT_DAYS 天）"""
+        now = now or datetime.now(timezone.utc)
+        oldest = (now - timedelta(days=CHECKPOINT_DAYS)).strftime('%Y-%m-%d')
+        with self._lock:
+            self._expire_locked(now.timestamp())
+            return {
+                'total_users': self.total_users,
+                'premium_users': self.premium_users,
+                'trial_users': self.trial_users,
+                'active_premium_users': self.active_premium_users,
+                'new_per_day': {day: n for day, n in self.new_per_day.items() if day >= oldest},
+                'checkpoint_at': now,
+            }
+
+    def _add_locked(self, uid: str, row: SubscriptionRow, now_ts: float) -> None:
+        self._generation += 1
+        created_at = row.created_at
+        state = _DocState(
+            created_at.astimezone(timezone.utc).strftime('%Y-%m-%d') if isinstance(created_at, datetime) else None,
+            bool(row.is_premium),
+            to_epoch(row.trial_end_at),
+            to_epoch(row.premium_end_at),
+            self._generation
+        )
+
+        self.total_users += 1
+        if state.created_day:
+            self.new_per_day[state.created_day] += 1
+        if state.is_premium:
+            self.premium_users += 1
+            # NaN 比較為 False：缺少到期時間的不計入活躍
+            if state.premium_end > now_ts:
+                state.in_premium = True
+                self.active_premium_users += 1
+                heapq.heappush(self._premium_expiry, (state.premium_end, uid, state.generation))
+        elif state.trial_end > now_ts:
+            state.in_trial = True
+            self.trial_users += 1
+            heapq.heappush(self._trial_expiry, (state.trial_end, uid, state.generation))
+
+        self._docs[uid] = state
+
+    def _remove_locked(self, uid: str) -> None:
+        state = self._docs.pop(uid, None)
+        if state is None:
+            return
+
+        self.total_users -= 1
+        if state.created_day:
+            self.new_per_day[state.created_day] -= 1
+            if self.new_per_day[state.created_day] <= 0:
+                del self.new_per_day[state.created_day]
+        if state.is_premium:
+            self.premium_users -= 1
+        if state.in_premium:
+            self.active_premium_users -= 1
+        if state.in_trial:
+            self.trial_users -= 1
+        # 堆中的舊條目會因 generation 不匹配而在彈出時忽略
+
+    def _expire_locked(self, now_ts: float) -> None:
+        while self._trial_expiry and self._trial_expiry[0][0] <= now_ts:
+            _, uid, generation = heapq.heappop(self._trial_expiry)
+            state = self._docs.get(uid)
+            if state is not None and state.generation == generation and state.in_trial:
+                state.in_trial = False
+                self.trial_users -= 1
+
+        while self._premium_expiry and self._premium_expiry[0][0] <= now_ts:
+            _, uid, generation = heapq.heappop(self._premium_expiry)
+            state = self._docs.get(uid)
+            if state is not None and state.generation == generation and state.in_premium:
+                state.in_premium = False
+                self.active_premium_users -= 1
+
+    def _compact_locked(self) -> None:
+        """移除堆中已失效的條目（文檔已更新或刪除）"""
+        self._trial_expiry = [
+            (s.trial_end, uid, s.generation) for uid, s in self._docs.items() if s.in_trial
+        ]
+        self._premium_expiry = [
+            (s.premium_end, uid, s.generation) for uid, s in self._docs.items() if s.in_premium
+        ]
+        heapq.heapify(self._trial_expiry)
+        heapq.heapify(self._premium_expiry)
+
+
+class SubscriptionCounterListener:
+    """subscriptions 變更監聽器（維護計數器、定期 checkpoint 與全量重掃）"""
+
+    COLLECTION_NAME = 'subscriptions'
+    CHECKPOINT_COLLECTION = 'analytics_counters'
+    CHECKPOINT_DOC = 'subscriptions'
+
+    def __init__(self):
+        self.db = None
+        self.counters = SubscriptionCounters()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._replay_buffer = None
+        self._watch = None
+
+    def is_ready(self) -> bool:
+        """初始快照已載入（計數器可用）"""
+        return self._ready.is_set()
+
+    def counts(self, now: Optional[datetime] = None) -> Optional[Dict[str, int]]:
+        """當前計數（監聽器未啟動或初始快照未載入時返回 None）"""
+        if not self.is_ready():
+            return None
+        with self._lock:
+            counters = self.counters
+        return counters.counts(now)
+
+    def start(self, db, checkpoint_interval: float = 60, reconcile_interval: float = 6 * 3600) -> None:
+        """
+        開始監聽（每個進程只需啟動一次）
+
+        Args:
+            db: Firestore client
+            checkpoint_interval: checkpoint 間隔秒數
+            reconcile_interval: 全量重掃間隔秒數
+        """
+        if self._watch is not None:
+            return
+        self.db = db
+        self._watch = db.collection(self.COLLECTION_NAME).on_snapshot(self._on_snapshot)
+
+        def maintenance():
+            last_reconcile = time.monotonic()
+            while True:
+                time.sleep(checkpoint_interval)
+                if not self.is_ready():
+                    continue
+                try:
+                    if time.monotonic() - last_reconcile >= reconcile_interval:
+                        self.reconcile()
+                        last_reconcile = time.monotonic()
+                    self.checkpoint()
+                except Exception as e:
+                    logger.error(f"Subscription counters maintenance error: {e}", exc_info=True)
+
+        threading.Thread(target=maintenance, name='subscription-counters', daemon=True).start()
+        logger.info("✅ Subscription counters listener started")
+
+    def stop(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, collection_snapshot, changes, read_time) -> None:
+        """on_snapshot 回調：第一次回調包含所有現有文檔（ADDED）"""
+        events = [
+            (
+                change.document.id,
+                None if change.type.name == 'REMOVED' else SubscriptionRow.from_snapshot(change.document)
+            )
+            for change in changes
+        ]
+        with self._lock:
+            for uid, row in events:
+                self.counters.apply(uid, row)
+            if self._replay_buffer is not None:
+                self._replay_buffer.extend(events)
+
+        if not self._ready.is_set():
+            self._ready.set()
+            logger.info(f"Subscription counters loaded {len(self.counters)} documents")
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        全量重掃（字段投影）重建計數器並替換
+
+        重掃期間收到的變更在替換前按順序重放到新計數器上（apply 為 upsert，重放安全）。
+
+        Returns:
+            dict: 各計數的漂移（舊值 - 重建值），只包含不為 0 的項
+        """
+        with self._lock:
+            self._replay_buffer = []
+
+        try:
+            rebuilt = SubscriptionCounters()
+            for row in stream_subscription_rows(self.db.collection(self.COLLECTION_NAME)):
+                rebuilt.apply(row.uid, row)
+        except BaseException:
+            with self._lock:
+                self._replay_buffer = None
+            raise
+
+        with self._lock:
+            for uid, row in self._replay_buffer:
+                rebuilt.apply(uid, row)
+            self._replay_buffer = None
+            previous = self.counters
+            self.counters = rebuilt
+
+        now = datetime.now(timezone.utc)
+        old_counts, new_counts = previous.counts(now), rebuilt.counts(now)
+        drift = {k: old_counts[k] - new_counts[k] for k in new_counts if old_counts[k] != new_counts[k]}
+        if drift:
+            logger.warning(f"Subscription counters drift corrected: {drift}")
+        return drift
+
+    def checkpoint(self) -> None:
+        """把計數器寫入 analytics_counters/subscriptions"""
+        with self._lock:
+            counters = self.counters
+        self.db.collection(self.CHECKPOINT_COLLECTION).document(self.CHECKPOINT_DOC).set(counters.snapshot())
+
+    @classmethod
+    def load_checkpoint(cls, db, max_age: float, now: Optional[datetime] = None) -> Optional[Dict[str, int]]:
+        """
+        讀取最近的 checkpoint（一次文檔讀取）
+
+        Returns:
+            dict: 與 counts() 相同的字段；不存在或超過 max_age 秒時返回 None
+        """
+        now = now or datetime.now(timezone.utc)
+        doc = db.collection(cls.CHECKPOINT_COLLECTION).document(cls.CHECKPOINT_DOC).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict() or {}
+        checkpoint_at = data.get('checkpoint_at')
+        if not isinstance(checkpoint_at, datetime) or (now - checkpoint_at).total_seconds() > max_age:
+            return None
+
+        result = {
+            key: int(data.get(key, 0))
+            for key in ('total_users', 'premium_users', 'trial_users', 'active_premium_users')
+        }
+        result.update(_new_user_counts(data.get('new_per_day') or {}, now))
+        return result
+
+
+# 全局實例（由 app.py 在 ANALYTICS_COUNTERS_LISTENER 開啟時啟動）
+subscription_counter_listener = SubscriptionCounterListener()
@@ -0,0 +1,312 @@
+"""
+訂閱時間線（列式區間引擎）
+
+把一次 subscriptions 掃描（字段投影，只讀分析需要的字段）解碼成
+NumPy 列（epoch 秒，缺失為 NaN），
+再用排序事件掃描（sweep-line）計算任意多個時間點的活躍人數：
+
+    active(t) = #{start <= t} - #{end <= t}    # 區間為 [start, end)
+
+兩次 searchsorted 即可得到所有時間點的結果，成本與查詢天數無關，
+只取決於一次區間字段的掃描。
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.firestore_scan import DEFAULT_PAGE_SIZE, scan_query
+
+SECONDS_PER_DAY = 86400.0
+
+
+def to_epoch(value) -> float:
+    """datetime 轉 epoch 秒（非 datetime 返回 NaN）"""
+    return value.timestamp() if isinstance(value, datetime) else np.nan
+
+
+class SubscriptionRow:
+    """
+    分析用的精簡訂閱行（只包含分析需要的字段）
+
+    使用 __slots__ 減少每行的內存佔用（不帶 extension_history、Stripe ID 等大字段）。
+    """
+    FIELDS = (
+        'created_at',
+        'trial_start_at',
+        'trial_end_at',
+        'premium_start_at',
+        'premium_end_at',
+        'is_premium',
+        'payment_platform',
+        'product_id',
+        'price',
+    )
+    __slots__ = ('uid',) + FIELDS
+
+    def __init__(self, uid: Optional[str], data: Dict[str, Any]):
+        self.uid = uid
+        for field in self.FIELDS:
+            setattr(self, field, data.get(field))
+
+    @classmethod
+    def from_snapshot(cls, doc) -> 'SubscriptionRow':
+        """從 Firestore DocumentSnapshot 構建"""
+        return cls(doc.id, doc.to_dict() or {})
+
+
+def stream_subscription_rows(
+    query,
+    order_by: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> Iterator[SubscriptionRow]:
+    """
+    以字段投影（select）分頁掃描訂閱，只傳輸分析需要的字段
+
+    內存中只保留一頁文檔，適用於任意大小的 subscriptions。
+
+    Args:
+        query: subscriptions 的 CollectionReference 或 Query（不帶 limit）
+        order_by: 查詢含範圍過濾時傳入該字段（見 utils.firestore_scan.scan_query）
+        page_size: 每頁文檔數
+    """
+    projected = query.select(list(SubscriptionRow.FIELDS))
+    for doc in scan_query(projected, page_size=page_size, order_by=order_by):
+        yield SubscriptionRow.from_snapshot(doc)
+
+
+def day_edges(start_date: date, end_date: date) -> np.ndarray:
+    """[start_date, end_date] 每天的 UTC 起點，外加結束邊界（長度 = 天數 + 1）"""
+    start = datetime.combine(start_date, time.min, tzinfo=timezone.utc).timestamp()
+    num_days = (end_date - start_date).days + 1
+    return start + SECONDS_PER_DAY * np.arange(num_days + 1, dtype=np.float64)
+
+
+def period_starts(granularity: str, now: datetime, periods: int) -> List[datetime]:
+    """
+    最近 periods 個週期（含當前週期）的起點，外加下一個週期的起點
+
+    週期以 UTC 計算：週從週一開始，月從 1 號開始。
+    """
+    today = now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if granularity == 'week':
+        current = today - timedelta(days=today.weekday())
+        return [current + timedelta(weeks=k) for k in range(-(periods - 1), 2)]
+
+    if granularity == 'month':
+        starts = []
+        year, month = today.year, today.month
+        for _ in range(periods - 1):
+            year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+        for _ in range(periods + 1):
+            starts.append(today.replace(year=year, month=month, day=1))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return starts
+
+    raise ValueError(f'Invalid granularity: {granularity}')
+
+
+def daily_snapshots(edges: np.ndarray, now: datetime) -> np.ndarray:
+    """每天的快照時間：當天結束，但不晚於 now"""
+    return np.minimum(edges[1:], now.timestamp())
+
+
+def count_active(starts: np.ndarray, ends: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """
+    計算每個時間點落在 [start, end) 內的區間數
+
+    無效區間（含 NaN 或 start >= end）會被忽略。
+    """
+    valid = starts < ends
+    s = np.sort(starts[valid])
+    e = np.sort(ends[valid])
+    return np.searchsorted(s, at, side='right') - np.searchsorted(e, at, side='right')
+
+
+def sum_active(starts: np.ndarray, ends: np.ndarray, weights: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """
+    計算每個時間點落在 [start, end) 內的區間權重和（例如活躍訂閱的月費總和）
+
+    與 count_active 相同的 sweep-line，只是把計數換成權重的前綴和。
+    """
+    valid = (starts < ends) & ~np.isnan(weights)
+    by_start = np.argsort(starts[valid], kind='stable')
+    by_end = np.argsort(ends[valid], kind='stable')
+    w = weights[valid]
+    start_sums = np.concatenate([[0.0], np.cumsum(w[by_start])])
+    end_sums = np.concatenate([[0.0], np.cumsum(w[by_end])])
+    return (
+        start_sums[np.searchsorted(starts[valid][by_start], at, side='right')]
+        - end_sums[np.searchsorted(ends[valid][by_end], at, side='right')]
+    )
+
+
+def count_until(times: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """計算每個時間點之前（含）發生的事件數（累計值）"""
+    t = np.sort(times[~np.isnan(times)])
+    return np.searchsorted(t, at, side='right')
+
+
+def count_events(times: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """按日期分桶計算事件數（edges 來自 day_edges）"""
+    t = times[~np.isnan(times)]
+    idx = np.searchsorted(edges, t, side='right') - 1
+    num_days = len(edges) - 1
+    idx = idx[(idx >= 0) & (idx < num_days)]
+    return np.bincount(idx, minlength=num_days)
+
+
+class SubscriptionTimeline:
+    """
+    訂閱時間線的列式表示
+
+    每個訂閱一行，時間字段為 epoch 秒（float64，缺失為 NaN）。
+    trial_start 在缺少 trial_start_at 時以 created_at 補齊（用於試用區間）；
+    trial_start_at 保留原始值，需要區分「是否真的有試用」時使用。
+    """
+
+    def __init__(
+        self,
+        created_at: np.ndarray,
+        trial_start: np.ndarray,
+        trial_end: np.ndarray,
+        premium_start: np.ndarray,
+        premium_end: np.ndarray,
+        is_premium: np.ndarray,
+        platform: np.ndarray,
+        product_id: Optional[np.ndarray] = None,
+        price: Optional[np.ndarray] = None,
+        uid: Optional[np.ndarray] = None,
+        trial_start_at: Optional[np.ndarray] = None
+    ):
+        self.created_at = created_at
+        self.trial_start = trial_start
+        self.trial_end = trial_end
+        self.premium_start = premium_start
+        self.premium_end = premium_end
+        self.is_premium = is_premium
+        self.platform = platform
+        n = len(created_at)
+        self.product_id = product_id if product_id is not None else np.full(n, '', dtype=object)
+        self.price = price if price is not None else np.full(n, np.nan)
+        self.uid = uid if uid is not None else np.full(n, None, dtype=object)
+        self.trial_start_at = trial_start_at if trial_start_at is not None else trial_start
+
+    def __len__(self) -> int:
+        return len(self.created_at)
+
+    @classmethod
+    def from_subscriptions(
+        cls,
+        subscriptions: Iterable[Union[SubscriptionRow, Dict[str, Any]]]
+    ) -> 'SubscriptionTimeline':
+        """從 SubscriptionRow（或訂閱 dict）的可迭代對象構建時間線，只遍歷一次"""
+        created_at, trial_start, trial_start_at, trial_end = [], [], [], []
+        premium_start, premium_end, is_premium, platform = [], [], [], []
+        product_id, price, uid = [], [], []
+
+        for row in subscriptions:
+            if not isinstance(row, SubscriptionRow):
+                row = SubscriptionRow(row.get('uid'), row)
+            created = to_epoch(row.created_at)
+            t_start = to_epoch(row.trial_start_at)
+            created_at.append(created)
+            # 缺少 trial_start_at 時以 created_at 作為試用開始
+            trial_start.append(created if np.isnan(t_start) else t_start)
+            trial_start_at.append(t_start)
+            trial_end.append(to_epoch(row.trial_end_at))
+            premium_start.append(to_epoch(row.premium_start_at))
+            premium_end.append(to_epoch(row.premium_end_at))
+            is_premium.append(bool(row.is_premium))
+            platform.append(row.payment_platform or '')
+            product_id.append(row.product_id or '')
+            price.append(float(row.price) if isinstance(row.price, (int, float)) else np.nan)
+            uid.append(row.uid)
+
+        return cls(
+            np.array(created_at, dtype=np.float64),
+            np.array(trial_start, dtype=np.float64),
+            np.array(trial_end, dtype=np.float64),
+            np.array(premium_start, dtype=np.float64),
+            np.array(premium_end, dtype=np.float64),
+            np.array(is_premium, dtype=bool),
+            np.array(platform, dtype=object),
+            np.array(product_id, dtype=object),
+            np.array(price, dtype=np.float64),
+            np.array(uid, dtype=object),
+            np.array(trial_start_at, dtype=np.float64)
+        )
+
+    def premium_intervals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """付費區間 [premium_start, premium_end)，與行對齊"""
+        return self.premium_start, self.premium_end
+
+    def trial_intervals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        試用中且非付費的區間（試用區間扣除付費區間）
+
+        每行最多兩段：付費前 [trial_start, min(trial_end, premium_start))
+        與付費後 [max(trial_start, premium_end), trial_end)。
+        返回的數組長度為 2 * 行數（前半段與行對齊，後半段也與行對齊）。
+        """
+        has_premium = self.premium_start < self.premium_end
+        before_end = np.where(has_premium, np.minimum(self.trial_end, self.premium_start), self.trial_end)
+        after_start = np.where(has_premium, np.maximum(self.trial_start, self.premium_end), np.nan)
+        starts = np.concatenate([self.trial_start, after_start])
+        ends = np.concatenate([before_end, self.trial_end])
+        return starts, ends
+
+    def active_intervals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """活躍區間（試用或付費，互不重疊），長度為 3 * 行數"""
+        trial_starts, trial_ends = self.trial_intervals()
+        return (
+            np.concatenate([trial_starts, self.premium_start]),
+            np.concatenate([trial_ends, self.premium_end])
+        )
+
+    def active_counts(self, at: np.ndarray) -> Dict[str, np.ndarray]:
+        """每個時間點的活躍試用/付費人數"""
+        return {
+            'trial': count_active(*self.trial_intervals(), at),
+            'premium': count_active(*self.premium_intervals(), at),
+        }
+
+    def platforms(self):
+        """出現過的付款平台（不含空值）"""
+        return sorted(p for p in set(self.platform.tolist()) if p)
+
+
+def compute_daily_activity(
+    timeline: SubscriptionTimeline,
+    start_date: date,
+    end_date: date,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    計算 [start_date, end_date] 每天的新增與活躍人數
+
+    Returns:
+        {
+            "dates": ["2025-11-01", ...],
+            "new_users": np.ndarray,
+            "new_premium_users": np.ndarray,
+            "active_trial_users": np.ndarray,
+            "active_premium_users": np.ndarray
+        }
+    """
+    now = now or datetime.now(timezone.utc)
+    edges = day_edges(start_date, end_date)
+    snapshots = daily_snapshots(edges, now)
+    active = timeline.active_counts(snapshots)
+
+    return {
+        'dates': [
+            (start_date + timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range(len(snapshots))
+        ],
+        'new_users': count_events(timeline.created_at, edges),
+        'new_premium_users': count_events(timeline.premium_start, edges),
+        'active_trial_users': active['trial'],
+        'active_premium_users': active['premium'],
+    }
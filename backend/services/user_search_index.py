@@ -0,0 +1,355 @@
+"""
+用戶搜尋索引（email / UID / display_name 的子串與前綴搜尋）
+
+取代 list_users 中「讀取 500 個用戶再逐一比對」的部分匹配：
+
+- 索引由背景執行緒維護（start），搜尋請求只讀取記憶體中的快照，不會掃描 Firestore：
+  啟動時先載入持久化快照，之後每 REFRESH_INTERVAL 秒只讀取 updated_at 或 created_at >= 上次游標的用戶
+  （增量；新建但尚未寫入 updated_at 的用戶由 created_at 查詢帶入），
+  每 FULL_REBUILD_INTERVAL 秒全量重建一次（處理刪除的用戶與兩個時間字段都缺少的文檔）
+- 同一台機器上的多個 worker 以文件鎖選出一個負責讀取 Firestore 並寫入快照，
+  其他 worker 只在快照文件更新後重新載入
+- 所有字段（小寫）串接成一個 UTF-8 字節數組，段落起點存在 NumPy 數組中；
+  搜尋時以查詢中最少見的字節為錨點向量化比對出所有出現位置，再用 searchsorted 映射回用戶與字段。
+  10 萬用戶約 6 MB 文本，一次搜尋約 10–20 毫秒，內存只與文本總長度成正比
+  （不像 n-gram 倒排表會膨脹到數百 MB）；同一查詢的排名結果緩存 SEARCH_RESULT_TTL 秒，翻頁只需切片
+- 排名：完全相等 > 字段前綴 > 詞首（@ . _ - 空格之後）> 其他子串；
+  同級時 email > display_name > UID，再按字段長度與 UID 排序
+- 索引快照持久化到 USER_SEARCH_INDEX_PATH（默認 /dev/shm）
+
+使用方式:
+    user_search_index.start(db)  # 進程啟動時
+    uids, total = user_search_index.search('gmail', offset=0, limit=50)
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.cache import TTLCache
+from utils.firestore_scan import scan_query
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台：每個 worker 各自刷新
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 60  # seconds
+FULL_REBUILD_INTERVAL = 6 * 3600  # 6 hours
+
+_SNAPSHOT_VERSION = 1
+
+# 段落分隔符（搜尋詞中不會出現）
+_SEPARATOR = '\n'
+
+# 詞首：段落起點或這些字符之後
+_WORD_BREAKS = '@._- +'
+_BREAK_BYTES = np.zeros(256, dtype=bool)
+_BREAK_BYTES[list(_WORD_BREAKS.encode())] = True
+
+# 同一查詢的排名結果緩存（翻頁只需切片；快照替換後自然失效）
+SEARCH_RESULT_TTL = 60  # seconds
+SEARCH_RESULT_MAX_ENTRIES = 64
+
+# 增量刷新的游標字段（游標取兩者的最大值）
+_CURSOR_FIELDS = ('updated_at', 'created_at')
+
+_RANK_EXACT, _RANK_PREFIX, _RANK_WORD, _RANK_SUBSTRING = 0, 1, 2, 3
+
+
+class SearchIndexNotReady(Exception):
+    """索引尚未建立（背景執行緒仍在首次載入 / 掃描）"""
+
+
+def _default_path() -> str:
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'user_search_index.json')
+
+
+class _Snapshot:
+    """不可變的搜尋結構（刷新時整體替換，搜尋不需要加鎖）"""
+
+    def __init__(self, records: Dict[str, Tuple[str, str]]):
+        self.uids = sorted(records)
+        values = []
+        seg_user, seg_field = [], []
+        # 每個用戶各字段的長度（同級時按最佳匹配字段的長度排序）
+        self.field_len = np.zeros((len(self.uids), 3), dtype=np.int64)
+        for i, uid in enumerate(self.uids):
+            email, name = records[uid]
+            # 字段編號即同級排名的優先順序：email > display_name > uid
+            for field, value in enumerate((email, name, uid)):
+                if not value:
+                    continue
+                encoded = value.lower().encode('utf-8')
+                values.append(encoded)
+                seg_user.append(i)
+                seg_field.append(field)
+                self.field_len[i, field] = len(encoded)
+
+        # 以 UTF-8 字節搜尋（UTF-8 自同步，字節子串匹配等同字符子串匹配）
+        lengths = np.array([len(v) for v in values], dtype=np.int64)
+        self.seg_start = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]]).astype(np.int64)
+        self.seg_len = lengths
+        self.seg_user = np.array(seg_user, dtype=np.int64)
+        self.seg_field = np.array(seg_field, dtype=np.int64)
+        self.corpus = np.frombuffer(_SEPARATOR.encode().join(values), dtype=np.uint8)
+        # 字節頻率：以查詢中最少見的字節作為錨點篩選候選位置
+        self.byte_counts = np.bincount(self.corpus, minlength=256)
+        self._results = TTLCache('user_search_results', max_entries=SEARCH_RESULT_MAX_ENTRIES,
+                                 default_ttl=SEARCH_RESULT_TTL)
+
+    def search(self, query: str) -> np.ndarray:
+        """所有匹配用戶的編號（self.uids 的下標），按排名排序；同一查詢的結果短時間緩存，翻頁只需切片"""
+        if not self.uids or not query:
+            return np.zeros(0, dtype=np.int64)
+        return self._results.get_or_compute(query, lambda: self._rank(query.encode('utf-8')))
+
+    def _positions(self, needle: bytes) -> np.ndarray:
+        """needle 在語料中的所有起始位置（向量化：錨點字節篩選後逐字節比對）"""
+        pattern = np.frombuffer(needle, dtype=np.uint8)
+        anchor = int(np.argmin(self.byte_counts[pattern]))
+        positions = np.flatnonzero(self.corpus == pattern[anchor]) - anchor
+        positions = positions[(positions >= 0) & (positions <= len(self.corpus) - len(pattern))]
+        for k, byte in enumerate(pattern):
+            if k != anchor and len(positions):
+                positions = positions[self.corpus[positions + k] == byte]
+        return positions
+
+    def _rank(self, needle: bytes) -> np.ndarray:
+        positions = self._positions(needle)
+        if not len(positions):
+            return np.zeros(0, dtype=np.int64)
+
+        seg = np.searchsorted(self.seg_start, positions, side='right') - 1
+        at_start = positions == self.seg_start[seg]
+        rank = np.full(len(positions), _RANK_SUBSTRING, dtype=np.uint8)
+        rank[~at_start & _BREAK_BYTES[self.corpus[np.maximum(positions - 1, 0)]]] = _RANK_WORD
+        rank[at_start] = _RANK_PREFIX
+        rank[at_start & (self.seg_len[seg] == len(needle))] = _RANK_EXACT
+
+        # 每個用戶的最佳匹配：(排名, 字段) 合成一個小整數取最小值
+        best = np.full(len(self.uids), 255, dtype=np.uint8)
+        np.minimum.at(best, self.seg_user[seg], rank * 3 + self.seg_field[seg].astype(np.uint8))
+        users = np.flatnonzero(best != 255)
+        best = best[users].astype(np.int64)
+        lengths = self.field_len[users, best % 3]
+
+        # 按 (排名, 字段, 長度, UID) 排序
+        key = (best * (int(self.field_len.max()) + 1) + lengths) * len(self.uids) + users
+        return users[np.argsort(key, kind='stable')]
+
+
+class UserSearchIndex:
+    """背景維護、可持久化的用戶搜尋索引"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('USER_SEARCH_INDEX_PATH') or _default_path()
+        self._records: Dict[str, Tuple[str, str]] = {}
+        self._cursor: Optional[datetime] = None
+        self._snapshot: Optional[_Snapshot] = None
+        self._refreshed_at: Optional[float] = None
+        self._built_at: Optional[float] = None
+        self._loaded_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._started = False
+        self._writer_lock_fd: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def apply(self, uid: str, data: Dict) -> None:
+        """加入或更新一個用戶（publish 後對搜尋可見）"""
+        self._records[uid] = (data.get('email') or '', data.get('display_name') or '')
+        for field in _CURSOR_FIELDS:
+            value = data.get(field)
+            if isinstance(value, datetime) and (self._cursor is None or value > self._cursor):
+                self._cursor = value
+
+    def publish(self) -> None:
+        """由當前記錄重建搜尋結構並整體替換（搜尋中的請求繼續使用舊快照）"""
+        with self._lock:
+            records = dict(self._records)
+        self._snapshot = _Snapshot(records)
+
+    def refresh(self, db, force_full: bool = False) -> int:
+        """
+        從 Firestore 刷新（首次 / 超過 FULL_REBUILD_INTERVAL 時全量，否則按 updated_at 與 created_at 游標增量）
+
+        在背景執行緒中調用；掃描期間不持有鎖，搜尋照常使用舊快照。
+
+        Returns:
+            int: 讀取的文檔數
+        """
+        users_ref = db.collection('users')
+        fields = ['email', 'display_name', *_CURSOR_FIELDS]
+        # 沒有游標時無法增量，只能全量
+        full = (
+            force_full
+            or self._built_at is None
+            or self._cursor is None
+            or time.time() - self._built_at > FULL_REBUILD_INTERVAL
+        )
+        if full:
+            docs = list(scan_query(users_ref.select(fields)))
+        else:
+            # 兩個字段各查一次（Firestore 不支援跨字段 OR 範圍查詢），按文檔 ID 去重
+            found = {}
+            for field in _CURSOR_FIELDS:
+                for doc in scan_query(users_ref.where(field, '>=', self._cursor).select(fields), order_by=field):
+                    found[doc.id] = doc
+            docs = list(found.values())
+
+        with self._lock:
+            if full:
+                self._records, self._cursor = {}, None
+            for doc in docs:
+                self.apply(doc.id, doc.to_dict() or {})
+            now = time.time()
+            self._refreshed_at = now
+            if full:
+                self._built_at = now
+
+        if full or docs or self._snapshot is None:
+            self.publish()
+        if full or docs:
+            self._save()
+        return len(docs)
+
+    def sync(self, db) -> None:
+        """
+        背景執行緒的一次維護
+
+        持有寫入鎖的 worker 從 Firestore 刷新並寫入快照；其他 worker 在快照文件更新後重新載入。
+        """
+        if self._acquire_writer_lock():
+            if self._built_at is None:
+                self.load()
+            self.refresh(db)
+        elif self._snapshot_changed():
+            self.load()
+
+    def start(self, db, interval: float = REFRESH_INTERVAL) -> None:
+        """啟動背景刷新執行緒（每個進程只啟動一次；首次同步也在背景執行，不阻塞啟動）"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        def loop():
+            while True:
+                try:
+                    self.sync(db)
+                except Exception as e:
+                    logger.error(f"User search index refresh error: {e}", exc_info=True)
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name='user-search-index', daemon=True).start()
+        logger.info(f"✅ User search index refresher started (every {interval}s)")
+
+    def search(self, query: str, offset: int = 0, limit: int = 50) -> Tuple[List[str], int]:
+        """
+        搜尋用戶（子串匹配，不區分大小寫；只讀取記憶體中的快照）
+
+        Returns:
+            (當前頁的 UID 列表, 匹配總數)
+
+        Raises:
+            SearchIndexNotReady: 索引尚未建立
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise SearchIndexNotReady('User search index is still loading')
+        query = query.strip().lower().replace(_SEPARATOR, ' ')
+
+        start = time.monotonic()
+        matches = snapshot.search(query)
+        logger.debug(f"User search '{query}' matched {len(matches)} users in {(time.monotonic() - start) * 1000:.1f}ms")
+        return [snapshot.uids[i] for i in matches[offset:offset + limit]], len(matches)
+
+    def _acquire_writer_lock(self) -> bool:
+        """非阻塞地取得快照寫入鎖（取得後持有到進程結束；持有者退出時由其他 worker 接手）"""
+        if fcntl is None or self._writer_lock_fd is not None:
+            return True
+        try:
+            fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logger.warning(f"Could not open user search index lock, refreshing in this worker: {e}")
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._writer_lock_fd = fd
+        return True
+
+    def _snapshot_changed(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime != self._loaded_mtime
+        except OSError:
+            return False
+
+    def _save(self) -> None:
+        """持久化快照（臨時文件 + os.replace，讀取方不會看到寫了一半的文件）"""
+        with self._lock:
+            payload = {
+                'version': _SNAPSHOT_VERSION,
+                'built_at': self._built_at,
+                'refreshed_at': self._refreshed_at,
+                'cursor': self._cursor.isoformat() if self._cursor else None,
+                'users': [[uid, email, name] for uid, (email, name) in self._records.items()],
+            }
+        try:
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.warning(f"Could not persist user search index to {self.path}: {e}")
+
+    def load(self) -> bool:
+        """載入持久化的快照（不存在、版本不符或已超過全量重建間隔時返回 False）"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if payload.get('version') != _SNAPSHOT_VERSION:
+            return False
+        built_at = payload.get('built_at')
+        if not built_at or time.time() - built_at > FULL_REBUILD_INTERVAL:
+            return False
+
+        with self._lock:
+            self._records = {uid: (email, name) for uid, email, name in payload['users']}
+            cursor = payload.get('cursor')
+            self._cursor = datetime.fromisoformat(cursor) if cursor else None
+            if self._cursor is not None and self._cursor.tzinfo is None:
+                self._cursor = self._cursor.replace(tzinfo=timezone.utc)
+            self._built_at = built_at
+            self._refreshed_at = payload.get('refreshed_at')
+            self._loaded_mtime = mtime
+        self.publish()
+        logger.info(f"Loaded user search index with {len(self._records)} users from {self.path}")
+        return True
+
+
+# 全局單例
+user_search_index = UserSearchIndex()
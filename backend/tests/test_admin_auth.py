@@ -89,3 +89,57 @@ def test_require_admin_decorator_with_super_admin(client, mock_firestore):
 
         # 應該成功 (200)
         assert response.status_code == 200
+
+
+def test_verified_token_cache():
+    """測試已驗證的 token 在 exp 前只驗證一次，未帶 exp 或已過期的不緩存"""
+    import time
+    from middleware import admin_auth
+
+    mock_auth = Mock()
+    mock_auth.verify_id_token.side_effect = lambda token: {
+        'uid': token,
+        'email': f'{token}@example.com',
+        'exp': time.time() + (3600 if token != 'expiring' else -1),
+    }
+
+    with patch.object(admin_auth, 'auth', mock_auth), \
+            patch.object(admin_auth, '_verified_tokens', admin_auth.TTLCache('test_tokens', default_ttl=0)):
+        for _ in range(6):
+            assert admin_auth.verify_id_token_cached('token_a')['uid'] == 'token_a'
+        assert mock_auth.verify_id_token.call_count == 1
+
+        admin_auth.verify_id_token_cached('token_b')
+        admin_auth.verify_id_token_cached('expiring')
+        admin_auth.verify_id_token_cached('expiring')
+        assert mock_auth.verify_id_token.call_count == 4
+
+        mock_auth.verify_id_token.side_effect = Exception('Invalid token')
+        with pytest.raises(Exception):
+            admin_auth.verify_id_token_cached('token_c')
+        with pytest.raises(Exception):
+            admin_auth.verify_id_token_cached('token_c')
+        assert mock_auth.verify_id_token.call_count == 6
+
+
+def test_prewarm_public_keys_tolerates_sdk_changes():
+    """測試 firebase_admin 內部結構改變或下載失敗時預熱只返回 False，不拋出異常"""
+    from middleware import admin_auth
+
+    with patch.object(admin_auth, 'auth', Mock(spec=[])):
+        assert admin_auth.prewarm_google_public_keys() is False
+
+    # 沒有初始化默認 app 時 _get_client 拋出 ValueError
+    no_app = Mock()
+    no_app._get_client.side_effect = ValueError('The default Firebase app does not exist')
+    with patch.object(admin_auth, 'auth', no_app):
+        assert admin_auth.prewarm_google_public_keys() is False
+
+    mock_auth = Mock()
+    mock_auth._get_client.return_value._token_verifier.request.side_effect = OSError('network down')
+    with patch.object(admin_auth, 'auth', mock_auth):
+        assert admin_auth.prewarm_google_public_keys() is False
+
+    mock_auth._get_client.return_value._token_verifier.request.side_effect = None
+    with patch.object(admin_auth, 'auth', mock_auth):
+        assert admin_auth.prewarm_google_public_keys() is True
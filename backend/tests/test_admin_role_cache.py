@@ -0,0 +1,75 @@
+"""
+Admin Role Cache Tests
+
+測試管理員角色緩存（正 / 負緩存、撤銷後本進程立即生效、版本戳跨 worker 失效）
+"""
+import time
+from types import SimpleNamespace
+
+from services.admin_role_cache import AdminRoleCache
+
+
+class FakeDB:
+    """內存中的 Firestore（只支援 collection().document().get() / set(merge=True)）"""
+
+    def __init__(self):
+        self.data = {}
+        self.reads = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda doc_id: FakeDocRef(self, name, doc_id))
+
+
+class FakeDocRef:
+    def __init__(self, db, collection, doc_id):
+        self.db, self.path = db, (collection, doc_id)
+
+    def get(self):
+        self.db.reads[self.path[0]] = self.db.reads.get(self.path[0], 0) + 1
+        data = self.db.data.get(self.path)
+        return SimpleNamespace(exists=data is not None, to_dict=lambda: dict(data or {}))
+
+    def set(self, values, merge=False):
+        current = dict(self.db.data.get(self.path, {})) if merge else {}
+        for key, value in values.items():
+            if type(value).__name__ == 'Increment':
+                current[key] = current.get(key, 0) + value.value
+            else:
+                current[key] = value
+        self.db.data[self.path] = current
+
+
+def test_positive_and_negative_results_are_cached():
+    db = FakeDB()
+    db.data[('users', 'admin')] = {'is_admin': True}
+    db.data[('users', 'user')] = {'is_admin': False}
+    cache = AdminRoleCache(negative_ttl=0.05, version_check_interval=60)
+
+    assert all(cache.is_admin(db, 'admin') for _ in range(5))
+    assert not any(cache.is_admin(db, 'user') for _ in range(5))
+    assert not cache.is_admin(db, 'missing')
+    assert db.reads['users'] == 3
+
+    # 負緩存很快過期
+    time.sleep(0.06)
+    cache.is_admin(db, 'user')
+    cache.is_admin(db, 'admin')
+    assert db.reads['users'] == 4
+
+
+def test_revoke_invalidates_across_workers():
+    db = FakeDB()
+    db.data[('users', 'u1')] = {'is_admin': True}
+    worker_a = AdminRoleCache(version_check_interval=0)
+    worker_b = AdminRoleCache(version_check_interval=0)
+
+    assert worker_a.is_admin(db, 'u1')
+    assert worker_b.is_admin(db, 'u1')
+
+    # worker_b 處理撤銷請求
+    db.data[('users', 'u1')] = {'is_admin': False}
+    worker_b.invalidate(db, 'u1')
+
+    assert db.data[('admin_meta', 'roles')]['version'] == 1
+    assert not worker_b.is_admin(db, 'u1')
+    assert not worker_a.is_admin(db, 'u1')
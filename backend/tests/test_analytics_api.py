@@ -105,6 +105,12 @@ def test_get_overview_unauthorized(client):
     assert response.status_code == 401
 
 
+def test_get_dashboard_unauthorized(client):
+    """測試未授權訪問 Dashboard 合併數據"""
+    response = client.get('/api/v1/admin/analytics/dashboard')
+    assert response.status_code == 401
+
+
 def test_get_revenue_success(client, authorized_headers, mock_admin_auth, mock_firestore, test_subscription_data):
     """測試成功獲取收入統計"""
     # Setup mock Firestore
@@ -0,0 +1,197 @@
+"""
+Analytics Rollup Tests
+
+測試每日匯總計算（一次遍歷、向量化區間掃描）與讀取（只使用完整的匯總，請求中不重算）
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from config.pricing_config import DEFAULT_MONTHLY_PRICE as MONTHLY_PRICE
+from services import analytics_rollup_service as rollup_module
+from services.analytics_rollup_service import AnalyticsRollupService, compute_daily_rollups
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def _day(offset, hour=10):
+    """相對 NOW 日期的某個時間點"""
+    return (NOW + timedelta(days=offset)).replace(hour=hour, minute=0)
+
+
+@pytest.fixture
+def subscriptions():
+    return [
+        {
+            # 試用中
+            'uid': 'trial_user',
+            'created_at': _day(-3),
+            'trial_start_at': _day(-3),
+            'trial_end_at': _day(11),
+            'is_premium': False,
+        },
+        {
+            # 試用 4 天後轉付費
+            'uid': 'premium_user',
+            'created_at': _day(-10),
+            'trial_start_at': _day(-10),
+            'trial_end_at': _day(4),
+            'is_premium': True,
+            'premium_start_at': _day(-6),
+            'premium_end_at': _day(24),
+            'payment_platform': 'stripe',
+        },
+        {
+            # 付費已於 2 天前到期
+            'uid': 'churned_user',
+            'created_at': _day(-40),
+            'trial_start_at': _day(-40),
+            'trial_end_at': _day(-33),
+            'is_premium': True,
+            'premium_start_at': _day(-33),
+            'premium_end_at': _day(-2),
+            'payment_platform': 'apple',
+        },
+    ]
+
+
+def test_rollups_cover_every_day(subscriptions):
+    """測試每天都有一筆匯總"""
+    start = (NOW - timedelta(days=6)).date()
+    rollups = compute_daily_rollups(subscriptions, start, NOW.date(), now=NOW)
+
+    assert len(rollups) == 7
+    assert rollups[0]['date'] == start.strftime('%Y-%m-%d')
+    assert rollups[-1]['date'] == NOW.strftime('%Y-%m-%d')
+    assert rollups[-1]['snapshot_at'] == NOW
+
+
+def test_rollups_counts(subscriptions):
+    """測試新增、活躍、流失與收入統計"""
+    start = (NOW - timedelta(days=10)).date()
+    rollups = {r['date']: r for r in compute_daily_rollups(subscriptions, start, NOW.date(), now=NOW)}
+
+    today = rollups[NOW.strftime('%Y-%m-%d')]
+    assert today['active_trials'] == 1
+    assert today['active_premium'] == 1
+    assert today['total_users'] == 3
+    assert today['premium_users'] == 2
+    assert today['revenue'] == MONTHLY_PRICE
+    assert today['revenue_by_platform'] == {'stripe': MONTHLY_PRICE}
+
+    assert rollups[_day(-3).strftime('%Y-%m-%d')]['new_users'] == 1
+    assert rollups[_day(-6).strftime('%Y-%m-%d')]['new_premium_users'] == 1
+    assert rollups[_day(-2).strftime('%Y-%m-%d')]['churned'] == 1
+
+    # 3 天前: churned_user 與 premium_user 都在付費期
+    three_days_ago = rollups[_day(-3).strftime('%Y-%m-%d')]
+    assert three_days_ago['active_premium'] == 2
+    assert three_days_ago['revenue_by_platform'] == {'stripe': MONTHLY_PRICE, 'apple': MONTHLY_PRICE}
+
+
+def test_rollups_retention(subscriptions):
+    """測試留存群組統計"""
+    rollups = compute_daily_rollups(subscriptions, NOW.date(), NOW.date(), now=NOW)
+    retention = rollups[0]['retention']
+
+    # 創建滿 7 天: premium_user（活躍）, churned_user（已流失）
+    assert retention['day_7'] == {'cohort_users': 2, 'retained_users': 1}
+    # 創建滿 30 天: churned_user
+    assert retention['day_30'] == {'cohort_users': 1, 'retained_users': 0}
+    assert retention['day_90'] == {'cohort_users': 0, 'retained_users': 0}
+
+
+def test_rollups_single_pass(subscriptions):
+    """測試訂閱數據只被遍歷一次（可以傳入 generator）"""
+    rollups = compute_daily_rollups(
+        (s for s in subscriptions), (NOW - timedelta(days=30)).date(), NOW.date(), now=NOW
+    )
+    assert rollups[-1]['total_users'] == 3
+
+
+def test_rollups_skip_invalid_documents():
+    """測試缺少字段的文檔不會導致失敗"""
+    rollups = compute_daily_rollups(
+        [{'uid': 'broken', 'created_at': 'not-a-date'}, {'uid': 'empty'}],
+        NOW.date(), NOW.date(), now=NOW
+    )
+    assert rollups[0]['total_users'] == 0
+    assert rollups[0]['active_trials'] == 0
+
+
+class FakeRollupDB:
+    """內存中的 analytics_daily（按 date 範圍查詢、批量寫入）"""
+
+    def __init__(self, rollups):
+        self.rollups = {r['date']: r for r in rollups}
+        self.writes = []
+
+    def collection(self, name):
+        return FakeRollupQuery(self, name)
+
+    def batch(self):
+        db = self
+        return SimpleNamespace(
+            set=lambda ref, data: db.writes.append(data) or db.rollups.__setitem__(ref.id, data),
+            commit=lambda: None
+        )
+
+
+class FakeRollupQuery:
+    def __init__(self, db, name, low=None, high=None):
+        self.db, self.name, self.low, self.high = db, name, low, high
+
+    def where(self, field, op, value):
+        if op == '>=':
+            return FakeRollupQuery(self.db, self.name, value, self.high)
+        return FakeRollupQuery(self.db, self.name, self.low, value)
+
+    def order_by(self, field):
+        return self
+
+    def document(self, doc_id):
+        return SimpleNamespace(id=doc_id)
+
+    def stream(self):
+        return [
+            SimpleNamespace(to_dict=lambda r=r: dict(r))
+            for key, r in sorted(self.db.rollups.items()) if self.low <= key <= self.high
+        ]
+
+
+def test_get_range_only_reads_complete_rollups(monkeypatch, subscriptions):
+    """測試讀取只使用完整的匯總：不掃描、不寫入；今天過期或過去某天只有部分數據時退回即時計算"""
+    start = (NOW - timedelta(days=2)).date()
+    stored = compute_daily_rollups(subscriptions, start, NOW.date(), now=NOW)
+    for rollup in stored[:-1]:
+        rollup['computed_at'] = NOW.replace(hour=0, minute=5)
+    stored[-1]['computed_at'] = NOW - timedelta(seconds=60)
+    db = FakeRollupDB(stored)
+    monkeypatch.setattr(rollup_module, 'db', db)
+
+    def no_scan(query):
+        raise AssertionError('get_range must not scan subscriptions')
+
+    monkeypatch.setattr(rollup_module, 'stream_subscription_rows', no_scan)
+    today_key = NOW.strftime('%Y-%m-%d')
+
+    assert AnalyticsRollupService.get_range(start, NOW.date(), max_age=300, now=NOW) == stored
+
+    # 今天的匯總超過 max_age：退回即時計算，不在請求中重算
+    db.rollups[today_key]['computed_at'] = NOW - timedelta(seconds=301)
+    assert AnalyticsRollupService.get_range(start, NOW.date(), max_age=300, now=NOW) is None
+    # 不包含今天的範圍不受影響
+    yesterday = (NOW - timedelta(days=1)).date()
+    assert len(AnalyticsRollupService.get_range(start, yesterday, max_age=300, now=NOW)) == 2
+
+    # 昨天的匯總在午夜前寫入（只有部分數據）：視為缺失
+    db.rollups[today_key]['computed_at'] = NOW
+    db.rollups[yesterday.strftime('%Y-%m-%d')]['computed_at'] = NOW.replace(hour=0) - timedelta(minutes=2)
+    assert AnalyticsRollupService.get_range(start, NOW.date(), max_age=300, now=NOW) is None
+
+    # 歷史缺一天：退回即時計算
+    db.rollups[yesterday.strftime('%Y-%m-%d')]['computed_at'] = NOW.replace(hour=0)
+    del db.rollups[start.strftime('%Y-%m-%d')]
+    assert AnalyticsRollupService.get_range(start, NOW.date(), max_age=300, now=NOW) is None
+    assert db.writes == []
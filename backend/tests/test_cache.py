@@ -0,0 +1,186 @@
+"""
+TTLCache Tests
+
+測試進程內緩存（TTL、LRU 淘汰、single-flight、stale-while-revalidate）
+"""
+import threading
+import time
+
+from utils.cache import TTLCache, cache_key
+
+
+def test_cache_key_includes_sorted_params():
+    """測試緩存 key 包含排序後的參數"""
+    assert cache_key('overview') == 'overview'
+    assert cache_key('trends', days=30) == 'trends:days=30'
+    assert cache_key('x', b=2, a=1) == cache_key('x', a=1, b=2)
+    assert cache_key('trends', days=7) != cache_key('trends', days=30)
+
+
+def test_cache_per_entry_ttl():
+    """測試每個條目獨立的 TTL"""
+    cache = TTLCache('test', default_ttl=60)
+    cache.set('short', 1, ttl=0.05)
+    cache.set('long', 2)
+
+    time.sleep(0.1)
+
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+
+
+def test_cache_lru_eviction():
+    """測試超過容量時淘汰最久未使用的條目"""
+    cache = TTLCache('test', max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # a 變為最近使用
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_cache_stores_none_values():
+    """測試可以緩存 None 結果"""
+    cache = TTLCache('test')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_compute('k', compute) is None
+    assert cache.get_or_compute('k', compute) is None
+    assert len(calls) == 1
+
+
+def test_cache_single_flight():
+    """測試並發請求同一 key 時只計算一次"""
+    cache = TTLCache('test')
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ['value'] * 8
+
+
+def test_cache_single_flight_shares_error_and_does_not_cache():
+    """測試計算失敗時等待者收到相同異常，且不緩存失敗結果"""
+    cache = TTLCache('test')
+
+    def failing():
+        time.sleep(0.05)
+        raise RuntimeError('boom')
+
+    errors = []
+
+    def worker():
+        try:
+            cache.get_or_compute('k', failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == ['boom'] * 4
+    assert cache.get_or_compute('k', lambda: 'ok') == 'ok'
+
+
+def test_cache_invalidate():
+    """測試刪除條目"""
+    cache = TTLCache('test')
+    cache.set('a', 1)
+    cache.invalidate('a')
+    assert cache.get('a') is None
+
+
+def test_get_or_refresh_serves_stale_value_while_refreshing():
+    """測試過期後立即返回舊值，並在背景只刷新一次"""
+    cache = TTLCache('test')
+    release = threading.Event()
+    calls = []
+
+    def slow_compute():
+        calls.append(1)
+        release.wait(1)
+        return 'new'
+
+    cache.set('k', 'old', ttl=0.01)
+    time.sleep(0.02)
+
+    start = time.monotonic()
+    first = cache.get_or_refresh('k', slow_compute)
+    second = cache.get_or_refresh('k', slow_compute)
+    assert time.monotonic() - start < 0.1
+    assert first[0] == 'old' and first[2] is True
+    assert second[0] == 'old' and second[2] is True
+
+    release.set()
+    for _ in range(100):
+        if cache.expires_in('k') > 0:
+            break
+        time.sleep(0.01)
+
+    value, computed_at, stale = cache.get_or_refresh('k', slow_compute)
+    assert (value, stale) == ('new', False)
+    assert computed_at > first[1]
+    assert len(calls) == 1
+
+
+def test_get_or_refresh_keeps_stale_value_when_refresh_fails():
+    """測試背景刷新失敗時保留舊值"""
+    cache = TTLCache('test')
+    cache.set('k', 'old', ttl=0)
+
+    def failing():
+        raise RuntimeError('boom')
+
+    assert cache.get_or_refresh('k', failing)[0] == 'old'
+    time.sleep(0.05)
+    value, _, stale = cache.get_or_refresh('k', failing)
+    assert (value, stale) == ('old', True)
+
+
+def test_get_or_refresh_computes_synchronously_without_usable_value():
+    """測試沒有舊值或舊值超過 max_stale 時同步計算"""
+    cache = TTLCache('test')
+    value, _, stale = cache.get_or_refresh('k', lambda: 1)
+    assert (value, stale) == (1, False)
+
+    cache.set('k', 1, ttl=0)
+    time.sleep(0.02)
+    value, _, stale = cache.get_or_refresh('k', lambda: 2, max_stale=0.01)
+    assert (value, stale) == (2, False)
+
+
+def test_refresh_recomputes_unexpired_entry():
+    """測試強制刷新會重新計算未過期的條目"""
+    cache = TTLCache('test')
+    cache.set('k', 1, ttl=60)
+
+    assert cache.refresh('k', lambda: 2) == 2
+    assert cache.get('k') == 2
+    assert cache.expires_in('missing') is None
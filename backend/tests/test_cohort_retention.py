@@ -0,0 +1,99 @@
+"""
+Cohort Retention Tests
+
+測試群組留存矩陣（週期邊界、廣播計算與逐用戶計算一致）
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.cohort_retention import compute_cohort_retention
+from services.subscription_timeline import SubscriptionTimeline, period_starts
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)  # 週四
+
+
+def test_period_starts_week_and_month():
+    """測試週從週一開始、月從 1 號開始，並包含下一個週期的起點"""
+    weeks = period_starts('week', NOW, 3)
+    assert [d.strftime('%Y-%m-%d') for d in weeks] == ['2025-11-03', '2025-11-10', '2025-11-17', '2025-11-24']
+
+    months = period_starts('month', NOW, 13)
+    assert months[0].strftime('%Y-%m-%d') == '2024-11-01'
+    assert months[-2].strftime('%Y-%m-%d') == '2025-11-01'
+    assert months[-1].strftime('%Y-%m-%d') == '2025-12-01'
+
+    with pytest.raises(ValueError):
+        period_starts('day', NOW, 3)
+
+
+def _subscriptions(n):
+    subscriptions = []
+    for i in range(n):
+        created = NOW - timedelta(days=(i * 7) % 180, hours=i % 24)
+        data = {
+            'created_at': created,
+            'trial_start_at': created,
+            'trial_end_at': created + timedelta(days=14),
+        }
+        if i % 3 == 0:
+            data['premium_start_at'] = created + timedelta(days=10)
+            data['premium_end_at'] = created + timedelta(days=10 + 30 * (i % 4 + 1))
+        subscriptions.append(data)
+    return subscriptions
+
+
+def test_cohort_matrix_matches_per_user_count():
+    """測試廣播計算結果與逐用戶、逐週期計算一致"""
+    subscriptions = _subscriptions(60)
+    periods = 12
+    result = compute_cohort_retention(
+        SubscriptionTimeline.from_subscriptions(subscriptions), 'week', periods, now=NOW
+    )
+
+    starts = period_starts('week', NOW, periods)
+    assert len(result['cohorts']) == periods
+
+    def active_in(s, begin, end):
+        end = min(end, NOW)
+        intervals = [(s['trial_start_at'], s['trial_end_at'])]
+        if 'premium_start_at' in s:
+            intervals.append((s['premium_start_at'], s['premium_end_at']))
+        return any(a < end and b > begin for a, b in intervals)
+
+    for c, row in enumerate(result['cohorts']):
+        members = [s for s in subscriptions if starts[c] <= s['created_at'] < starts[c + 1]]
+        assert row['size'] == len(members)
+        assert len(row['retained']) == periods - c
+        for k, retained in enumerate(row['retained']):
+            j = c + k
+            assert retained == sum(1 for s in members if active_in(s, starts[j], starts[j + 1]))
+
+
+def test_cohort_matrix_ignores_users_outside_window():
+    """測試窗口前註冊的用戶不計入任何群組"""
+    old = NOW - timedelta(days=400)
+    timeline = SubscriptionTimeline.from_subscriptions([{
+        'created_at': old,
+        'premium_start_at': old,
+        'premium_end_at': NOW + timedelta(days=30),
+    }])
+    result = compute_cohort_retention(timeline, 'month', 6, now=NOW)
+
+    assert all(row['size'] == 0 for row in result['cohorts'])
+    assert all(sum(row['retained']) == 0 for row in result['cohorts'])
+
+
+def test_cohort_matrix_52x52_is_fast():
+    """測試 52×52 週矩陣在大量用戶下仍然快速"""
+    subscriptions = _subscriptions(20000)
+    timeline = SubscriptionTimeline.from_subscriptions(subscriptions)
+
+    start = time.monotonic()
+    result = compute_cohort_retention(timeline, 'week', 52, now=NOW)
+    elapsed = time.monotonic() - start
+
+    assert len(result['cohorts']) == 52
+    assert elapsed < 2.0
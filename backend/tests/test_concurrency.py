@@ -0,0 +1,77 @@
+"""
+Fan-out Tests
+
+測試並發查詢工具（並發執行、超時、部分結果）
+"""
+import time
+from unittest.mock import Mock
+
+from utils.concurrency import aggregate_query, count_query, fan_out
+
+
+def test_fan_out_runs_queries_concurrently():
+    """測試多個查詢並發執行，總耗時約等於最慢的查詢"""
+    def slow(value):
+        def run():
+            time.sleep(0.2)
+            return value
+        return run
+
+    start = time.monotonic()
+    results, errors = fan_out({f'q{i}': slow(i) for i in range(5)})
+    elapsed = time.monotonic() - start
+
+    assert results == {f'q{i}': i for i in range(5)}
+    assert errors == {}
+    assert elapsed < 0.6
+
+
+def test_fan_out_returns_partial_results_on_failure():
+    """測試單個查詢失敗時其他結果仍返回"""
+    def failing():
+        raise RuntimeError('quota exceeded')
+
+    results, errors = fan_out({'ok': lambda: 3, 'bad': failing}, default=0)
+
+    assert results == {'ok': 3, 'bad': 0}
+    assert errors == {'bad': 'quota exceeded'}
+
+
+def test_fan_out_timeout():
+    """測試超時的查詢使用默認值"""
+    results, errors = fan_out(
+        {'fast': lambda: 1, 'slow': lambda: time.sleep(1) or 2},
+        timeout=0.1,
+        default=0
+    )
+
+    assert results == {'fast': 1, 'slow': 0}
+    assert 'slow' in errors
+
+
+def test_count_query():
+    """測試聚合 count 查詢結果解析"""
+    query = Mock()
+    query.count().get.return_value = [[Mock(value=42)]]
+
+    assert count_query(query) == 42
+
+
+def test_aggregate_query():
+    """測試 count + sum + avg 聚合在一次查詢中執行並按別名返回"""
+    query = Mock()
+    aggregation = query.count.return_value
+    aggregation.sum.return_value = aggregation
+    aggregation.avg.return_value = aggregation
+    aggregation.get.return_value = [[
+        Mock(alias='count', value=3),
+        Mock(alias='sum_price', value=450),
+        Mock(alias='avg_price', value=150.0),
+    ]]
+
+    result = aggregate_query(query, sums=['price'], avgs=['price'])
+
+    assert result == {'count': 3, 'sum_price': 450, 'avg_price': 150.0}
+    query.count.assert_called_once_with(alias='count')
+    aggregation.sum.assert_called_once_with('price', alias='sum_price')
+    aggregation.avg.assert_called_once_with('price', alias='avg_price')
@@ -0,0 +1,112 @@
+"""
+Conditional Request Tests
+
+測試 Admin GET 響應的 ETag / Last-Modified 與 304（內容哈希、來源版本、跳過序列化）
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from flask import Flask, jsonify
+
+import api.admin.users as users_api
+from middleware.conditional import init_conditional_requests, latest_modified, not_modified
+
+UPDATED = datetime(2025, 11, 20, 8, 30, tzinfo=timezone.utc)
+
+
+def _app():
+    app = Flask(__name__)
+    init_conditional_requests(app)
+    state = {'version': 'v1', 'builds': 0}
+
+    @app.route('/api/v1/admin/items')
+    def items():
+        return jsonify({'items': [1, 2, 3]}), 200
+
+    @app.route('/api/v1/admin/items/<item_id>')
+    def item(item_id):
+        cached = not_modified(item_id, state['version'], last_modified=UPDATED)
+        if cached is not None:
+            return cached
+        state['builds'] += 1
+        return jsonify({'id': item_id}), 200
+
+    @app.route('/api/v1/admin/items', methods=['POST'])
+    def create_item():
+        return jsonify({'ok': True}), 200
+
+    @app.route('/health')
+    def health():
+        return jsonify({'status': 'ok'}), 200
+
+    return app, state
+
+
+def test_content_etag_and_304_on_match():
+    app, _ = _app()
+    client = app.test_client()
+
+    first = client.get('/api/v1/admin/items')
+    assert first.status_code == 200
+    assert first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get('/api/v1/admin/items', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    stale = client.get('/api/v1/admin/items', headers={'If-None-Match': '"other"'})
+    assert stale.status_code == 200
+
+    # 非 Admin 路徑與非 GET 不處理
+    assert 'ETag' not in client.get('/health').headers
+    assert 'ETag' not in client.post('/api/v1/admin/items').headers
+
+
+def test_version_etag_skips_building_the_response():
+    app, state = _app()
+    client = app.test_client()
+
+    first = client.get('/api/v1/admin/items/a')
+    assert first.status_code == 200 and state['builds'] == 1
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified'] == 'Thu, 20 Nov 2025 08:30:00 GMT'
+
+    assert client.get('/api/v1/admin/items/a', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/v1/admin/items/a', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    assert state['builds'] == 1
+
+    # 查詢參數或來源版本改變時 ETag 不同
+    assert client.get('/api/v1/admin/items/a?days=7', headers={'If-None-Match': etag}).status_code == 200
+    state['version'] = 'v2'
+    assert client.get('/api/v1/admin/items/a', headers={'If-None-Match': etag}).status_code == 200
+    assert state['builds'] == 3
+
+
+def test_get_user_returns_304_without_serializing(monkeypatch):
+    reads = []
+
+    def to_dict():
+        reads.append(1)
+        return {'email': 'runner@example.com'}
+
+    user_doc = SimpleNamespace(exists=True, update_time=UPDATED, to_dict=to_dict)
+    users = SimpleNamespace(document=lambda uid: SimpleNamespace(get=lambda: user_doc))
+    monkeypatch.setattr(users_api, 'db', SimpleNamespace(collection=lambda name: users))
+    app = Flask(__name__)
+
+    with app.test_request_context('/api/v1/admin/users/u1'):
+        response, status = users_api.get_user.__wrapped__('u1')
+        etag = users_api.g.conditional_etag
+    assert status == 200 and len(reads) == 1
+
+    with app.test_request_context('/api/v1/admin/users/u1', headers={'If-None-Match': f'"{etag}"'}):
+        response = users_api.get_user.__wrapped__('u1')
+    assert response.status_code == 304
+    assert len(reads) == 1
+
+
+def test_latest_modified_ignores_missing_versions():
+    later = datetime(2025, 11, 21, tzinfo=timezone.utc)
+    assert latest_modified(UPDATED, None, later, 'v1') == later
+    assert latest_modified(None, 'v1') is None
@@ -0,0 +1,97 @@
+"""
+Conversion Funnel Tests
+
+測試轉換漏斗（各階段人數與逐用戶計算一致、轉換天數分佈、大量用戶下的速度）
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from services.conversion_funnel import compute_conversion_funnel, time_to_convert_distribution
+from services.subscription_timeline import SubscriptionTimeline, period_starts
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def _subscriptions(n):
+    subscriptions = []
+    for i in range(n):
+        created = NOW - timedelta(days=(i * 11) % 200, hours=i % 24)
+        data = {'created_at': created}
+        if i % 5:
+            data['trial_start_at'] = created
+            data['trial_end_at'] = created + timedelta(days=14)
+        if i % 3 == 0:
+            data['premium_start_at'] = created + timedelta(days=i % 20)
+            data['premium_end_at'] = data['premium_start_at'] + timedelta(days=30 * (i % 4 + 1))
+        subscriptions.append(data)
+    return subscriptions
+
+
+def test_funnel_matches_per_user_count():
+    """測試各群組的階段人數與逐用戶計算一致"""
+    subscriptions = _subscriptions(90)
+    result = compute_conversion_funnel(SubscriptionTimeline.from_subscriptions(subscriptions), 'month', 6, now=NOW)
+    starts = period_starts('month', NOW, 6)
+
+    def stages(s):
+        reached = {'signup': True, 'trial': 'trial_end_at' in s}
+        premium_start = s.get('premium_start_at')
+        reached['premium'] = premium_start is not None and premium_start <= NOW
+        reached['renewal'] = reached['premium'] and min(s['premium_end_at'], NOW) - premium_start > timedelta(days=31)
+        return reached
+
+    for c, row in enumerate(result['cohorts']):
+        members = [stages(s) for s in subscriptions if starts[c] <= s['created_at'] < starts[c + 1]]
+        for stage in ('signup', 'trial', 'premium', 'renewal'):
+            assert row[stage] == sum(1 for m in members if m[stage])
+
+    totals = result['totals']
+    assert totals['signup'] == sum(row['signup'] for row in result['cohorts'])
+    assert totals['conversion']['trial_to_premium'] == round(totals['premium'] / totals['trial'], 3)
+
+
+def test_time_to_convert_skips_premium_users_without_trial():
+    """測試沒有 trial_start_at 的付費用戶不計入轉換天數（不以 created_at 代替）"""
+    created = NOW - timedelta(days=40)
+    subscriptions = [
+        {'created_at': created, 'trial_start_at': created + timedelta(days=1),
+         'trial_end_at': created + timedelta(days=15), 'premium_start_at': created + timedelta(days=4),
+         'premium_end_at': created + timedelta(days=34)},
+        {'created_at': created, 'premium_start_at': created + timedelta(days=30),
+         'premium_end_at': created + timedelta(days=60)},
+    ]
+    result = compute_conversion_funnel(SubscriptionTimeline.from_subscriptions(subscriptions), 'month', 3, now=NOW)
+
+    assert result['totals']['premium'] == 2
+    assert result['time_to_convert']['converted'] == 1
+    assert result['time_to_convert']['mean'] == 3.0
+
+
+def test_time_to_convert_distribution():
+    """測試轉換天數的分桶與百分位數"""
+    result = time_to_convert_distribution(np.array([0.5, 2.0, 2.5, 10.0, 120.0]))
+
+    counts = {bucket['bucket']: bucket['count'] for bucket in result['histogram']}
+    assert counts == {'0-1': 1, '1-3': 2, '3-7': 0, '7-14': 1, '14-30': 0, '30-60': 0, '60-90': 0, '90+': 1}
+    assert result['converted'] == 5
+    assert result['percentiles']['p50'] == 2.5
+    assert result['mean'] == 27.0
+
+    empty = time_to_convert_distribution(np.array([]))
+    assert empty['converted'] == 0
+    assert empty['percentiles']['p50'] is None
+
+
+def test_funnel_is_fast_for_100k_subscriptions():
+    """測試 10 萬用戶、52 週群組的漏斗計算在一秒內完成"""
+    timeline = SubscriptionTimeline.from_subscriptions(_subscriptions(100000))
+
+    start = time.monotonic()
+    result = compute_conversion_funnel(timeline, 'week', 52, now=NOW)
+    elapsed = time.monotonic() - start
+
+    assert len(result['cohorts']) == 52
+    assert elapsed < 1.0
@@ -0,0 +1,171 @@
+"""
+Dashboard Analytics Tests
+
+測試 Dashboard 合併分析的歸約（一次掃描的時間線與各端點即時查詢語義一致），
+以及 Dashboard 優先使用每日匯總 / 計數器 checkpoint、缺失時才全量掃描
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import api.admin.analytics as analytics_api
+from services.analytics_rollup_service import compute_daily_rollups
+from services.dashboard_analytics import compute_dashboard, overview_counts, retention_counts
+from services.revenue_engine import compute_mrr_series
+from services.subscription_timeline import SubscriptionTimeline, compute_daily_activity
+
+
+# 星期四
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def _subscriptions():
+    return [
+        # 100 天前註冊，付費中
+        {
+            'uid': 'paid', 'created_at': NOW - timedelta(days=100),
+            'trial_end_at': NOW - timedelta(days=93), 'is_premium': True,
+            'premium_start_at': NOW - timedelta(days=93), 'premium_end_at': NOW + timedelta(days=10),
+            'payment_platform': 'stripe',
+        },
+        # 40 天前註冊，付費已過期
+        {
+            'uid': 'churned', 'created_at': NOW - timedelta(days=40),
+            'trial_end_at': NOW - timedelta(days=33), 'is_premium': True,
+            'premium_start_at': NOW - timedelta(days=33), 'premium_end_at': NOW - timedelta(days=3),
+            'payment_platform': 'apple_iap',
+        },
+        # 今天註冊，試用中
+        {
+            'uid': 'trial', 'created_at': NOW - timedelta(hours=2),
+            'trial_end_at': NOW + timedelta(days=7), 'is_premium': False,
+        },
+        # 本月初（本週之前）註冊，試用已過期
+        {
+            'uid': 'expired', 'created_at': datetime(2025, 11, 3, tzinfo=timezone.utc),
+            'trial_end_at': datetime(2025, 11, 10, tzinfo=timezone.utc), 'is_premium': False,
+        },
+        # 缺少 created_at
+        {'uid': 'broken', 'is_premium': False},
+    ]
+
+
+def test_overview_counts():
+    counts = overview_counts(SubscriptionTimeline.from_subscriptions(_subscriptions()), NOW)
+
+    assert counts == {
+        'total_users': 5,
+        'premium_users': 2,
+        'trial_users': 1,
+        'active_premium_users': 1,
+        'today_new_users': 1,
+        'this_week_new_users': 1,
+        'this_month_new_users': 2,
+    }
+
+
+def test_retention_counts():
+    cohorts = retention_counts(SubscriptionTimeline.from_subscriptions(_subscriptions()), NOW)
+
+    # 7 天群組：paid、churned、expired；只有 paid 仍活躍
+    assert cohorts[7] == {'total_users': 3, 'retained_users': 1}
+    assert cohorts[30] == {'total_users': 2, 'retained_users': 1}
+    assert cohorts[90] == {'total_users': 1, 'retained_users': 1}
+
+
+def test_compute_dashboard_shares_one_timeline():
+    timeline = SubscriptionTimeline.from_subscriptions(_subscriptions())
+    result = compute_dashboard(timeline, days=14, months=6, now=NOW)
+
+    assert result['overview'] == overview_counts(timeline, NOW)
+    assert result['retention'] == retention_counts(timeline, NOW)
+    assert result['mrr_series'] == compute_mrr_series(timeline, 6, now=NOW)
+
+    activity = compute_daily_activity(timeline, (NOW - timedelta(days=14)).date(), NOW.date(), now=NOW)
+    assert result['activity']['dates'] == activity['dates']
+    assert result['activity']['active_premium_users'].tolist() == activity['active_premium_users'].tolist()
+
+
+def _patch_dashboard_sources(monkeypatch, rollups, checkpoint=None):
+    scans = []
+    monkeypatch.setattr(analytics_api, 'db', SimpleNamespace(collection=lambda name: name))
+    monkeypatch.setattr(
+        analytics_api.analytics_rollup_service, 'get_range',
+        lambda start, end, **kwargs: None if rollups is None else [
+            r for r in rollups if start.isoformat() <= r['date'] <= end.isoformat()
+        ]
+    )
+    monkeypatch.setattr(
+        analytics_api.SubscriptionCounterListener, 'load_checkpoint',
+        staticmethod(lambda db, max_age=None, now=None: checkpoint)
+    )
+
+    def no_revenue_scan(months):
+        raise AssertionError('rollup branch must not scan for revenue')
+
+    monkeypatch.setattr(analytics_api, '_compute_revenue', no_revenue_scan)
+
+    def scan(query, **kwargs):
+        scans.append(query)
+        return iter(_subscriptions())
+
+    monkeypatch.setattr(analytics_api, 'stream_subscription_rows', scan)
+    monkeypatch.setattr(analytics_api, 'aggregate_extension_stats', lambda ref: {})
+    return scans
+
+
+def test_dashboard_uses_rollups_without_scanning(monkeypatch):
+    now = datetime.now(timezone.utc)
+    rollups = compute_daily_rollups(_subscriptions(), (now - timedelta(days=40)).date(), now.date(), now=now)
+    scans = _patch_dashboard_sources(monkeypatch, rollups)
+
+    result = analytics_api._compute_dashboard(14, 6)
+
+    assert scans == []
+    # 收入來自今天與上月最後一天的匯總
+    month_key = now.replace(day=1).date().isoformat()
+    last_month = [r for r in rollups if r['date'] < month_key][-1]
+    assert result['revenue']['current_month_revenue'] == rollups[-1]['revenue']
+    assert result['revenue']['last_month_revenue'] == last_month['revenue']
+    assert result['revenue']['active_subscriptions'] == rollups[-1]['active_premium']
+    assert len(result['trends']['dates']) == 15
+    assert result['trends']['dates'][-1] == now.date().isoformat()
+    assert result['overview']['total_users'] == rollups[-1]['total_users']
+    assert result['retention'] == analytics_api._retention_from_rollups(rollups[-1])
+
+
+def test_dashboard_falls_back_to_one_scan_without_rollups(monkeypatch):
+    checkpoint = {
+        'total_users': 9, 'premium_users': 3, 'trial_users': 2, 'active_premium_users': 2,
+        'today_new_users': 1, 'this_week_new_users': 2, 'this_month_new_users': 4,
+    }
+    scans = _patch_dashboard_sources(monkeypatch, None, checkpoint)
+
+    result = analytics_api._compute_dashboard(14, 6)
+
+    assert len(scans) == 1
+    # 總覽仍來自計數器 checkpoint
+    assert result['overview']['total_users'] == 9
+    assert len(result['trends']['dates']) == 15
+
+
+def test_trends_and_dashboard_clamp_days(monkeypatch):
+    from flask import Flask
+
+    calls = []
+    monkeypatch.setattr(analytics_api, 'db', SimpleNamespace())
+    monkeypatch.setattr(analytics_api, 'subscription_service', SimpleNamespace())
+    monkeypatch.setattr(
+        analytics_api, 'get_cached_analytics',
+        lambda metric, compute_fn, **params: calls.append((metric, params['days'])) or {}
+    )
+    app = Flask(__name__)
+
+    for query, expected in (('days=0', 1), ('days=-5', 1), ('days=500', 90)):
+        with app.test_request_context(f'/trends?{query}'):
+            _, status = analytics_api.get_trends.__wrapped__()
+        assert status == 200
+        assert calls[-1] == ('trends', expected)
+
+    with app.test_request_context('/dashboard?days=-3'):
+        analytics_api.get_dashboard.__wrapped__()
+    assert calls[-1] == ('dashboard', 1)
@@ -0,0 +1,92 @@
+"""
+Firestore Scan Tests
+
+測試游標分頁掃描（固定頁大小、start_after、逐筆產出）
+"""
+from unittest.mock import Mock
+
+from utils.firestore_scan import scan_query
+
+
+class FakeQuery:
+    """模擬 Firestore Query 的 order_by / limit / start_after / stream"""
+
+    def __init__(self, docs, calls, order=None, limit=None, after=None):
+        self.docs = docs
+        self.calls = calls
+        self._order = order
+        self._limit = limit
+        self._after = after
+
+    def order_by(self, field):
+        return FakeQuery(self.docs, self.calls, order=field)
+
+    def limit(self, n):
+        return FakeQuery(self.docs, self.calls, self._order, n, self._after)
+
+    def start_after(self, doc):
+        return FakeQuery(self.docs, self.calls, self._order, self._limit, doc)
+
+    def stream(self):
+        self.calls.append({'order': self._order, 'limit': self._limit, 'after': self._after})
+        docs = sorted(self.docs, key=lambda d: d.id)
+        if self._after is not None:
+            docs = [d for d in docs if d.id > self._after.id]
+        return iter(docs[:self._limit])
+
+
+def _docs(n):
+    docs = []
+    for i in range(n):
+        doc = Mock()
+        doc.id = f'doc_{i:04d}'
+        docs.append(doc)
+    return docs
+
+
+def test_scan_query_pages_through_all_documents():
+    """測試掃描超過單頁上限的所有文檔"""
+    calls = []
+    docs = _docs(25)
+
+    result = list(scan_query(FakeQuery(docs, calls), page_size=10))
+
+    assert [d.id for d in result] == [d.id for d in docs]
+    assert len(calls) == 3
+    assert all(c['limit'] == 10 for c in calls)
+    assert calls[0]['after'] is None
+    assert calls[1]['after'].id == 'doc_0009'
+    assert calls[2]['after'].id == 'doc_0019'
+
+
+def test_scan_query_exact_page_multiple():
+    """測試文檔數剛好是頁大小倍數時多讀一個空頁後結束"""
+    calls = []
+    result = list(scan_query(FakeQuery(_docs(20), calls), page_size=10))
+
+    assert len(result) == 20
+    assert len(calls) == 3
+
+
+def test_scan_query_is_lazy():
+    """測試 generator 只在需要時讀取下一頁"""
+    calls = []
+    scanner = scan_query(FakeQuery(_docs(25), calls), page_size=10)
+
+    for _ in range(10):
+        next(scanner)
+    assert len(calls) == 1
+
+    next(scanner)
+    assert len(calls) == 2
+
+
+def test_scan_query_order_by():
+    """測試範圍查詢使用指定的排序字段"""
+    calls = []
+    list(scan_query(FakeQuery(_docs(3), calls), order_by='premium_end_at'))
+    assert calls[0]['order'] == 'premium_end_at'
+
+    calls.clear()
+    list(scan_query(FakeQuery(_docs(3), calls)))
+    assert calls[0]['order'] == '__name__'
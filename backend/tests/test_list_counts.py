@@ -0,0 +1,63 @@
+"""
+List Counts Tests
+
+測試列表總數緩存（approx 緩存、exact 重新計數、none 不計數、按篩選條件區分、失效）
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from utils.list_counts import invalidate_counts, list_total, parse_count_mode
+
+
+class FakeCountQuery:
+    """只支持 count() 聚合的查詢（記錄聚合次數）"""
+
+    def __init__(self, total):
+        self.total = total
+        self.aggregations = 0
+
+    def count(self):
+        parent = self
+
+        class Aggregation:
+            def get(self):
+                parent.aggregations += 1
+                return [[SimpleNamespace(value=parent.total)]]
+
+        return Aggregation()
+
+
+def test_approx_count_is_cached_per_filter():
+    invalidate_counts('test_codes')
+    active, inactive = FakeCountQuery(7), FakeCountQuery(3)
+
+    for _ in range(5):
+        assert list_total(active, 'test_codes', 'approx', status='active') == 7
+    assert list_total(inactive, 'test_codes', 'approx', status='inactive') == 3
+    assert active.aggregations == 1
+    assert inactive.aggregations == 1
+
+    # exact 重新計數並更新緩存，之後的 approx 讀到新值
+    active.total = 8
+    assert list_total(active, 'test_codes', 'exact', status='active') == 8
+    assert list_total(active, 'test_codes', 'approx', status='active') == 8
+    assert active.aggregations == 2
+
+    # none 不執行聚合
+    assert list_total(active, 'test_codes', 'none', status='active') is None
+    assert active.aggregations == 2
+
+    # 寫入後失效，下一次重新計數
+    active.total = 9
+    invalidate_counts('test_codes')
+    assert list_total(active, 'test_codes', 'approx', status='active') == 9
+    assert active.aggregations == 3
+
+
+def test_parse_count_mode():
+    assert parse_count_mode(None) == 'approx'
+    assert parse_count_mode('EXACT') == 'exact'
+    assert parse_count_mode('none') == 'none'
+    with pytest.raises(ValueError):
+        parse_count_mode('fast')
@@ -0,0 +1,132 @@
+"""
+Pagination Tests
+
+測試鍵集游標分頁（前後翻頁、平手鍵、page 兼容路徑、游標作用域、讀取數）
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from utils.pagination import InvalidCursor, decode_cursor, encode_cursor, paginate
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeQuery:
+    """內存中的 Firestore 查詢（order_by / start_after / limit / offset）"""
+
+    def __init__(self, docs, orders=(), after=None, limit=None, offset=0, stats=None):
+        self.docs = docs
+        self.orders = list(orders)
+        self.after = after
+        self._limit = limit
+        self._offset = offset
+        self.stats = stats if stats is not None else {'reads': 0}
+
+    def _copy(self, **changes):
+        params = dict(orders=self.orders, after=self.after, limit=self._limit, offset=self._offset, stats=self.stats)
+        params.update(changes)
+        return FakeQuery(self.docs, **params)
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._copy(orders=self.orders + [(field, direction == 'DESCENDING')])
+
+    def start_after(self, values):
+        return self._copy(after=values)
+
+    def limit(self, n):
+        return self._copy(limit=n)
+
+    def offset(self, n):
+        return self._copy(offset=n)
+
+    def _key(self, doc_id, data):
+        key = []
+        for field, desc in self.orders:
+            value = doc_id if field == '__name__' else data[field]
+            value = value.timestamp() if isinstance(value, datetime) else value
+            if desc:
+                value = -value if not isinstance(value, str) else tuple(-ord(c) for c in value) + (1,)
+            elif isinstance(value, str):
+                value = tuple(ord(c) for c in value)
+            key.append(value)
+        return tuple(key)
+
+    def stream(self):
+        rows = sorted(self.docs.items(), key=lambda item: self._key(*item))
+        if self.after is not None:
+            after = self._key(self.after[-1], dict(zip([f for f, _ in self.orders], self.after)))
+            rows = [row for row in rows if self._key(*row) > after]
+        # offset 跳過的文檔同樣計費
+        rows = rows[:self._offset + self._limit]
+        self.stats['reads'] += len(rows)
+        rows = rows[self._offset:]
+        return [SimpleNamespace(id=doc_id, to_dict=lambda d=data: dict(d)) for doc_id, data in rows]
+
+
+def _codes(n):
+    # 每兩個邀請碼共用同一個 created_at，驗證文檔 ID 平手鍵
+    return {f'CODE{i:03d}': {'created_at': NOW - timedelta(minutes=i // 2)} for i in range(n)}
+
+
+def _walk(query, limit, sort):
+    pages, cursor = [], None
+    while True:
+        page = paginate(query, limit, cursor=cursor, sort=sort, scope='codes')
+        pages.append(page)
+        if page.next_cursor is None:
+            return pages
+        cursor = page.next_cursor
+
+
+def test_forward_and_backward_paging_is_stable():
+    query = FakeQuery(_codes(25))
+    sort = [('created_at', True)]
+
+    pages = _walk(query, 10, sort)
+    ids = [doc.id for page in pages for doc in page.docs]
+
+    # created_at 降序，同一時間按文檔 ID 降序，不重複不遺漏
+    assert len(ids) == 25 and len(set(ids)) == 25
+    assert ids[:4] == ['CODE001', 'CODE000', 'CODE003', 'CODE002']
+    assert pages[0].prev_cursor is None
+    assert [len(page.docs) for page in pages] == [10, 10, 5]
+
+    # 從最後一頁向前翻頁回到相同的頁面
+    back = paginate(query, 10, cursor=pages[2].prev_cursor, sort=sort, scope='codes')
+    assert [doc.id for doc in back.docs] == [doc.id for doc in pages[1].docs]
+    first = paginate(query, 10, cursor=back.prev_cursor, sort=sort, scope='codes')
+    assert [doc.id for doc in first.docs] == [doc.id for doc in pages[0].docs]
+    assert first.prev_cursor is None
+    assert first.next_cursor is not None
+
+
+def test_deep_cursor_page_reads_only_limit_plus_one():
+    stats = {'reads': 0}
+    query = FakeQuery(_codes(1000), stats=stats)
+
+    # 兼容路徑：page 參數用 offset，被跳過的文檔也要讀取
+    page = paginate(query, 50, page=10, sort=[('created_at', True)], scope='codes')
+    assert stats['reads'] == 9 * 50 + 51
+    assert page.prev_cursor is not None
+
+    stats['reads'] = 0
+    deep = paginate(query, 50, cursor=page.next_cursor, sort=[('created_at', True)], scope='codes')
+    assert stats['reads'] == 51
+    assert [doc.id for doc in deep.docs][:2] == ['CODE501', 'CODE500']
+
+
+def test_cursor_scope_and_format_are_validated():
+    token = encode_cursor([NOW, 'CODE001'], scope='invite_codes:active:')
+    values, backward = decode_cursor(token, scope='invite_codes:active:')
+    assert values == [NOW, 'CODE001'] and not backward
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, scope='invite_codes:inactive:')
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not-a-cursor', scope='')
+    with pytest.raises(InvalidCursor):
+        paginate(FakeQuery({}), 10, cursor=encode_cursor(['CODE001'], scope='codes'),
+                 sort=[('created_at', True)], scope='codes')
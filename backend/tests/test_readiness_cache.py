@@ -0,0 +1,70 @@
+"""
+Readiness Cache Tests
+
+測試準備度面板緩存（重新確認間隔、按 update_time 沿用、趨勢切片共用、LRU 淘汰）
+"""
+from types import SimpleNamespace
+
+from services.readiness_cache import ReadinessCache, inject_trend_data, trend_slices
+
+
+def _doc(data, version):
+    return SimpleNamespace(exists=data is not None, update_time=version, to_dict=lambda: dict(data or {}))
+
+
+def _trend(n):
+    return {'dates': list(range(n)), 'values': list(range(n)), 'direction': 'up'}
+
+
+def test_resolve_reuses_payload_until_a_source_changes():
+    cache = ReadinessCache(revalidate_interval=0)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {'readiness': {'n': len(builds)}}
+
+    readiness, trends = _doc({'speed': {}}, 'r1'), _doc({}, 't1')
+    first = cache.resolve('u1', '2025-11-20', readiness, trends, build)
+    assert cache.resolve('u1', '2025-11-20', readiness, trends, build) is first
+    assert len(builds) == 1
+
+    # rolling_trends 更新 → 重建
+    cache.resolve('u1', '2025-11-20', readiness, _doc({}, 't2'), build)
+    assert len(builds) == 2
+
+    # 當天沒有文檔（回退到最新文檔的結果）不沿用
+    cache.resolve('u1', '2025-11-21', None, trends, build)
+    cache.resolve('u1', '2025-11-21', None, trends, build)
+    assert len(builds) == 4
+
+
+def test_get_fresh_respects_revalidate_interval_and_lru():
+    cache = ReadinessCache(revalidate_interval=60, max_entries=2)
+    for date in ('d1', 'd2', 'd3'):
+        cache.resolve('u1', date, _doc({}, date), None, lambda date=date: {'date': date})
+
+    assert cache.get_fresh('u1', 'd3') == {'date': 'd3'}
+    assert cache.get_fresh('u1', 'd1') is None  # 最久未使用，已淘汰
+
+    stale = ReadinessCache(revalidate_interval=0)
+    stale.resolve('u1', 'd1', _doc({}, 'v'), None, lambda: {'date': 'd1'})
+    assert stale.get_fresh('u1', 'd1') is None
+
+
+def test_trend_slices_are_shared_per_version_and_not_overwritten():
+    cache = ReadinessCache()
+    trends_doc = _doc({'speed': _trend(40), 'recovery': _trend(5), 'unknown': _trend(3)}, 't1')
+
+    trends = cache.trends('u1', trends_doc)
+    assert cache.trends('u1', trends_doc) is trends
+    assert set(trends) == {'speed', 'recovery'}
+    assert trends['speed']['dates'] == list(range(12, 40))
+    assert cache.trends('u1', _doc(None, None)) == {}
+
+    readiness = {'speed': {'score': 80}, 'recovery': {'trend_data': {'kept': True}}, 'endurance': 5}
+    inject_trend_data(readiness, trends)
+    assert readiness['speed']['trend_data']['direction'] == 'up'
+    assert readiness['recovery']['trend_data'] == {'kept': True}
+    assert readiness['endurance'] == 5
+    assert trend_slices({}) == {}
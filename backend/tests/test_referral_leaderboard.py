@@ -0,0 +1,121 @@
+"""
+Referral Leaderboard Tests
+
+測試邀請排行榜（Top-K、窗口淘汰、獎勵狀態更新、游標增量刷新、病毒係數）
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from services.referral_leaderboard import ReferralLeaderboard
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeUsagesQuery:
+    """內存中的 invite_code_usages 查詢（單頁）"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+
+    def where(self, field, op, value):
+        assert op == '>='
+        parent = self
+
+        class Filtered(FakeUsagesQuery):
+            def stream(self):
+                parent.reads += len(self.docs)
+                return super().stream()
+
+        return Filtered({
+            doc_id: data for doc_id, data in self.docs.items()
+            if isinstance(data.get(field), datetime) and data[field] >= value
+        })
+
+    def select(self, fields):
+        return self
+
+    def order_by(self, field):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def start_after(self, doc):
+        return FakeUsagesQuery({})
+
+    def stream(self):
+        return [SimpleNamespace(id=doc_id, to_dict=lambda d=data: dict(d)) for doc_id, data in self.docs.items()]
+
+
+def _usage(inviter, days_ago, rewarded=False):
+    used_at = NOW - timedelta(days=days_ago)
+    data = {'inviter_uid': inviter, 'invitee_uid': f'invitee-{days_ago}', 'used_at': used_at, 'reward_granted': rewarded}
+    if rewarded:
+        data['reward_granted_at'] = used_at + timedelta(days=7)
+    return data
+
+
+def test_top_k_and_window_eviction():
+    board = ReferralLeaderboard(window_days=30)
+    usages = {
+        'u1': _usage('alice', 1, rewarded=True),
+        'u2': _usage('alice', 2),
+        'u3': _usage('bob', 3, rewarded=True),
+        'u4': _usage('carol', 20),
+        'u5': _usage('carol', 25),
+        'u6': _usage('carol', 29),
+        'u7': _usage('dave', 40),  # 窗口外
+    }
+    for doc_id, data in usages.items():
+        board.apply(doc_id, data, NOW)
+
+    assert [row['inviter_uid'] for row in board.top(2)] == ['carol', 'alice']
+    assert [row['inviter_uid'] for row in board.top(10, 'rewarded_usages')] == ['alice', 'bob']
+    assert board.top(1)[0] == {'inviter_uid': 'carol', 'usages': 3, 'rewarded_usages': 0}
+
+    # 重複讀到同一筆記錄不重複計數；後來發放的獎勵會更新狀態
+    board.apply('u2', {**usages['u2'], 'reward_granted': True}, NOW)
+    board.apply('u2', {**usages['u2'], 'reward_granted': True}, NOW)
+    assert board.top(1, 'rewarded_usages')[0] == {'inviter_uid': 'alice', 'usages': 2, 'rewarded_usages': 2}
+
+    # 10 天後 carol 的三筆中有兩筆超出窗口
+    assert board.evict(NOW + timedelta(days=10)) == 2
+    assert len(board) == 4
+    assert [row['inviter_uid'] for row in board.top(3)] == ['alice', 'bob', 'carol']
+
+
+def test_virality_summary():
+    board = ReferralLeaderboard(window_days=None)
+    for i, rewarded in enumerate([True, True, False, True]):
+        board.apply(f'u{i}', _usage('alice' if i < 3 else 'bob', i + 1, rewarded), NOW)
+
+    summary = board.summary(total_users=100)
+    assert summary['usages'] == 4
+    assert summary['rewarded_usages'] == 3
+    assert summary['inviters'] == 2
+    assert summary['invites_per_inviter'] == 2.0
+    assert summary['invites_per_user'] == 0.04
+    assert summary['conversion_rate'] == 0.75
+    assert summary['virality_coefficient'] == 0.03
+
+
+def test_refresh_reads_only_after_cursors():
+    docs = {f'u{i}': _usage('alice', 10 - i) for i in range(5)}
+    query = FakeUsagesQuery(docs)
+    board = ReferralLeaderboard(window_days=30)
+
+    assert board.refresh(query, NOW) == 5
+
+    # 新增一筆使用記錄，並為舊記錄發放獎勵
+    docs['u5'] = _usage('bob', 0)
+    docs['u0'] = {**docs['u0'], 'reward_granted': True, 'reward_granted_at': NOW}
+    read = board.refresh(query, NOW + timedelta(minutes=5))
+
+    # used_at 游標邊界上的最新一筆 + 新記錄 + 新發放獎勵的記錄
+    assert read == 3
+    result = board.result(5, total_users=50)
+    assert result['usages'] == 6
+    assert result['rewarded_usages'] == 1
+    assert result['top_by_rewarded_usages'] == [{'inviter_uid': 'alice', 'usages': 5, 'rewarded_usages': 1}]
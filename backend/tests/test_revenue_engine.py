@@ -0,0 +1,80 @@
+"""
+Revenue Engine Tests
+
+測試按方案定價的 MRR 序列（月費解析、跨月分攤、MRR 變動分類）
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config.pricing_config import DEFAULT_MONTHLY_PRICE
+from services import revenue_engine
+from services.revenue_engine import compute_mrr_series, resolve_monthly_prices
+from services.subscription_timeline import SubscriptionTimeline
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def _at(month, day=1, year=2025):
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+def test_resolve_monthly_prices(monkeypatch):
+    """測試月費解析順序：訂閱價格 > 方案價目表 > 平台默認 > 全局默認"""
+    monkeypatch.setattr(revenue_engine, 'PLAN_PRICING', {'yearly': {'price': 1200.0, 'months': 12}})
+    timeline = SubscriptionTimeline.from_subscriptions([
+        {'product_id': 'yearly', 'price': 2400, 'payment_platform': 'stripe'},
+        {'product_id': 'yearly', 'payment_platform': 'stripe'},
+        {'payment_platform': 'admin_grant'},
+        {'payment_platform': 'apple_iap'},
+    ])
+
+    assert resolve_monthly_prices(timeline).tolist() == [200.0, 100.0, 0.0, float(DEFAULT_MONTHLY_PRICE)]
+
+
+def test_mrr_series_movements():
+    """測試新增、擴張、流失與重新付費 MRR 的分類"""
+    subscriptions = [
+        # 9 月新增，11 月 10 日到期 → 11 月流失
+        {'uid': 'a', 'premium_start_at': _at(9, 10), 'premium_end_at': _at(11, 10), 'price': 100},
+        # 窗口前已付費，11 月升級（兩段，價格提高）
+        {'uid': 'b', 'premium_start_at': _at(6), 'premium_end_at': _at(11, 5), 'price': 100},
+        {'uid': 'b', 'premium_start_at': _at(11, 5), 'premium_end_at': _at(12, 5), 'price': 300},
+        # 9 月付費，10 月中斷，11 月重新付費
+        {'uid': 'c', 'premium_start_at': _at(9, 2), 'premium_end_at': _at(10, 5), 'price': 50},
+        {'uid': 'c', 'premium_start_at': _at(11, 2), 'premium_end_at': _at(12, 2), 'price': 50},
+    ]
+    series = compute_mrr_series(SubscriptionTimeline.from_subscriptions(subscriptions), months=3, now=NOW)
+
+    assert series['months'] == ['2025-09', '2025-10', '2025-11']
+    assert series['mrr'] == [250.0, 200.0, 350.0]
+    assert series['new_mrr'] == [150.0, 0.0, 0.0]
+    assert series['churned_mrr'] == [0.0, 50.0, 100.0]
+    assert series['expansion_mrr'] == [0.0, 0.0, 200.0]
+    assert series['reactivated_mrr'] == [0.0, 0.0, 50.0]
+    assert series['current_mrr'] == 350.0
+    assert series['active_subscriptions'] == 2
+
+    # 每月的 MRR 變化 = 新增 + 重新付費 + 擴張 - 收縮 - 流失
+    mrr_before = 100.0
+    mrr = [mrr_before] + series['mrr']
+    for m in range(3):
+        delta = (
+            series['new_mrr'][m] + series['reactivated_mrr'][m] + series['expansion_mrr'][m]
+            - series['contraction_mrr'][m] - series['churned_mrr'][m]
+        )
+        assert np.isclose(mrr[m + 1] - mrr[m], delta)
+
+
+def test_recognized_revenue_is_prorated_across_months():
+    """測試跨月的付費區間按天數分攤到各月，當月只計到當前時間"""
+    subscriptions = [
+        {'uid': 'a', 'premium_start_at': _at(10, 16), 'premium_end_at': _at(11, 16), 'price': 310},
+    ]
+    series = compute_mrr_series(SubscriptionTimeline.from_subscriptions(subscriptions), months=2, now=NOW)
+
+    # 10 月 16 日 ~ 31 日 = 16/31 個月；11 月 1 日 ~ 15 日 = 15/30 個月
+    assert series['recognized_revenue'] == [160.0, 155.0]
+    assert series['mrr'] == [310.0, 0.0]
+    assert series['churned_mrr'] == [0.0, 310.0]
@@ -0,0 +1,104 @@
+"""
+Shared Cache Tests
+
+測試跨進程共享緩存（版本化條目、租約、多 worker 只重算一次）
+"""
+import threading
+import time
+
+import pytest
+
+from utils.shared_cache import FileSharedBackend, InMemorySharedBackend, SharedCache
+
+
+@pytest.fixture(params=['memory', 'file'])
+def backend(request, tmp_path):
+    if request.param == 'file':
+        return FileSharedBackend(str(tmp_path))
+    return InMemorySharedBackend()
+
+
+def test_lease_is_exclusive_until_published(backend):
+    """測試租約由一個 owner 持有，發佈後釋放並遞增版本"""
+    assert backend.try_lease('k', 'worker-1', 60)
+    assert not backend.try_lease('k', 'worker-2', 60)
+
+    assert backend.publish('k', '1', 0, time.time() + 60, 'worker-1') == 1
+    assert backend.try_lease('k', 'worker-2', 60)
+    assert backend.publish('k', '2', 0, time.time() + 60, 'worker-2') == 2
+
+
+def test_expired_lease_can_be_taken_over(backend):
+    """測試持有者退出後租約過期可被接管"""
+    assert backend.try_lease('k', 'worker-1', 0.01)
+    time.sleep(0.02)
+    assert backend.try_lease('k', 'worker-2', 60)
+
+
+def test_workers_compute_each_key_once(backend):
+    """測試多個 worker 同時請求同一 key 時只有一個執行計算"""
+    workers = [SharedCache('test', backend, poll_interval=0.01) for _ in range(4)]
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'total_users': 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda w=w: results.append(w.get_or_refresh('overview', compute, ttl=60)))
+        for w in workers for _ in range(2)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert [value for value, _, _ in results] == [{'total_users': 42}] * 8
+
+
+def test_worker_adopts_value_published_by_another(backend):
+    """測試其他 worker 已重算時直接採用新版本"""
+    worker_a = SharedCache('test', backend)
+    worker_b = SharedCache('test', backend)
+
+    worker_a.get_or_refresh('k', lambda: 1, ttl=0.01)
+    time.sleep(0.02)
+    worker_a.refresh('k', lambda: 2, ttl=60)
+
+    value, _, stale = worker_b.get_or_refresh('k', lambda: pytest.fail('should not compute'), ttl=60)
+    assert (value, stale) == (2, False)
+
+
+def test_stale_value_served_and_refreshed_in_background(backend):
+    """測試過期時返回舊值並在背景重算"""
+    cache = SharedCache('test', backend)
+    cache.get_or_refresh('k', lambda: 'old', ttl=60)
+    cache.invalidate('k')
+
+    value, _, stale = cache.get_or_refresh('k', lambda: 'new', ttl=60)
+    assert (value, stale) == ('old', True)
+
+    for _ in range(100):
+        if cache.expires_in('k') > 0:
+            break
+        time.sleep(0.01)
+
+    value, _, stale = cache.get_or_refresh('k', lambda: 'newer', ttl=60)
+    assert (value, stale) == ('new', False)
+    assert backend.read('k')['version'] == 2
+
+
+def test_failed_computation_releases_lease(backend):
+    """測試計算失敗時釋放租約，其他 worker 可以立即重試"""
+    cache = SharedCache('test', backend)
+
+    def failing():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_refresh('k', failing)
+
+    assert cache.get_or_refresh('k', lambda: 'ok')[0] == 'ok'
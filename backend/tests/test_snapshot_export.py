@@ -0,0 +1,75 @@
+"""
+Snapshot Export Tests
+
+測試列式快照導出（字段投影、分塊寫出、類型轉換）
+"""
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq  # noqa: E402
+
+from services.snapshot_export import EXPORT_SPECS, export_rows, iter_export_rows  # noqa: E402
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def _subscription_rows(n):
+    for i in range(n):
+        yield f'user_{i}', [
+            NOW, NOW, 14, NOW, NOW, i % 2 == 0, None, None, 0, 'stripe', None, 150.0,
+        ]
+
+
+def test_export_rows_writes_chunks(tmp_path):
+    """測試按分塊寫出，讀回的行數與內容一致"""
+    path = str(tmp_path / 'subscriptions.parquet')
+    stats = export_rows(_subscription_rows(25), 'subscriptions', path, chunk_rows=10)
+
+    assert stats['rows'] == 25
+    assert stats['chunks'] == 3
+
+    table = pq.read_table(path)
+    assert table.num_rows == 25
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
+    assert table.column('uid')[0].as_py() == 'user_0'
+    assert table.column('is_premium').to_pylist()[:2] == [True, False]
+    assert table.schema.field('created_at').type == pa.timestamp('us', tz='UTC')
+
+
+def test_export_rows_arrow_format_and_empty_collection(tmp_path):
+    """測試 Arrow IPC 格式，空集合也寫出帶 schema 的文件"""
+    path = str(tmp_path / 'users.arrow')
+    stats = export_rows(iter([]), 'users', path, file_format='arrow')
+
+    assert stats['rows'] == 0
+    with pa.ipc.open_file(path) as reader:
+        table = reader.read_all()
+    assert table.num_rows == 0
+    assert 'email' in table.schema.names
+
+
+def test_iter_export_rows_projects_fields_and_coerces_types():
+    """測試只請求導出字段（不含憑證），類型不符的值寫為 null"""
+    doc = Mock()
+    doc.id = 'user_1'
+    doc.to_dict.return_value = {'email': 'a@b.c', 'vdot': 45, 'is_admin': 'yes', 'created_at': 'bad'}
+    query = Mock()
+    query.select.return_value.order_by.return_value.limit.return_value.stream.return_value = [doc]
+
+    rows = list(iter_export_rows(query, 'users'))
+
+    requested = query.select.call_args[0][0]
+    assert 'garmin_tokens' not in requested and 'strava_tokens' not in requested
+    assert requested == [name for name, _ in EXPORT_SPECS['users']['fields']]
+
+    uid, values = rows[0]
+    record = dict(zip(requested, values))
+    assert uid == 'user_1'
+    assert record['email'] == 'a@b.c'
+    assert record['vdot'] == 45.0
+    assert record['is_admin'] is None
+    assert record['created_at'] is None
@@ -0,0 +1,152 @@
+"""
+Subscription Aggregates Tests
+
+測試服務端聚合（count / sum / avg）計算的 MRR 與串流時間線的結果一致，
+以及延長天數統計在聚合失敗時的串流回退
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from services import subscription_aggregates
+from services.revenue_engine import compute_mrr_series
+from services.subscription_aggregates import (
+    AggregationUnavailable,
+    aggregate_extension_stats,
+    aggregate_mrr,
+)
+from services.subscription_timeline import SubscriptionTimeline
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+_OPS = {
+    '==': lambda a, b: a == b,
+    '>': lambda a, b: a is not None and a > b,
+}
+
+
+class FakeQuery:
+    """內存中的 Firestore 查詢（支援 where / select / order_by / limit / start_after 與聚合）"""
+
+    def __init__(self, docs, aggregations_fail=False):
+        self.docs = docs
+        self.aggregations_fail = aggregations_fail
+        self._aggregations = []
+
+    def where(self, field, op, value):
+        return FakeQuery(
+            [d for d in self.docs if _OPS[op](d[1].get(field), value)],
+            self.aggregations_fail
+        )
+
+    # 分頁掃描
+    def select(self, fields):
+        return self
+
+    def order_by(self, field):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def start_after(self, doc):
+        return FakeQuery([], self.aggregations_fail)
+
+    def stream(self):
+        return [SimpleNamespace(id=doc_id, to_dict=lambda d=data: d) for doc_id, data in self.docs]
+
+    # 聚合
+    def count(self, alias):
+        self._aggregations = [('count', None, alias)]
+        return self
+
+    def sum(self, field, alias):
+        self._aggregations.append(('sum', field, alias))
+        return self
+
+    def avg(self, field, alias):
+        self._aggregations.append(('avg', field, alias))
+        return self
+
+    def get(self):
+        if self.aggregations_fail:
+            raise RuntimeError('aggregation not supported')
+        results = []
+        for kind, field, alias in self._aggregations:
+            values = [d.get(field) for _, d in self.docs] if field else []
+            numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if kind == 'count':
+                value = len(self.docs)
+            elif kind == 'sum':
+                value = sum(numbers)
+            else:
+                value = sum(numbers) / len(numbers) if numbers else None
+            results.append(SimpleNamespace(alias=alias, value=value))
+        return [results]
+
+
+def _subscriptions():
+    def paid(uid, start_days, end_days, platform, price=None):
+        data = {
+            'uid': uid,
+            'created_at': NOW - timedelta(days=start_days + 7),
+            'is_premium': True,
+            'premium_start_at': NOW - timedelta(days=start_days),
+            'premium_end_at': NOW + timedelta(days=end_days),
+            'payment_platform': platform,
+        }
+        if price is not None:
+            data['price'] = price
+        return data
+
+    return [
+        paid('a', 10, 20, 'stripe', price=200),
+        paid('b', 40, 5, 'stripe'),
+        paid('c', 3, 27, 'apple_iap', price=90),
+        paid('d', 60, -10, 'google_play'),      # 已過期
+        paid('e', 15, 15, 'admin_grant'),        # 贈送，不計收入
+        paid('f', -5, 30, 'stripe', price=300),  # 尚未開始
+        paid('g', 20, 10, None),                 # 沒有平台，使用默認月費
+    ]
+
+
+def test_aggregate_mrr_matches_streaming_engine():
+    subscriptions = _subscriptions()
+    query = FakeQuery([(s['uid'], s) for s in subscriptions])
+
+    aggregated = aggregate_mrr(query, NOW, ['stripe', 'apple_iap', 'google_play'])
+    series = compute_mrr_series(SubscriptionTimeline.from_subscriptions(subscriptions), 2, now=NOW)
+
+    assert aggregated['mrr'] == series['current_mrr']
+    assert aggregated['active_subscriptions'] == series['active_subscriptions']
+    assert aggregated['by_platform'] == series['by_platform']
+
+
+def test_aggregate_mrr_requires_stored_prices(monkeypatch):
+    query = FakeQuery([(s['uid'], s) for s in _subscriptions()])
+
+    monkeypatch.setattr(subscription_aggregates, 'PLAN_PRICING', {'premium_yearly': {'price': 1490, 'months': 12}})
+    with pytest.raises(AggregationUnavailable):
+        aggregate_mrr(query, NOW, ['stripe'])
+
+    monkeypatch.setattr(subscription_aggregates, 'PLAN_PRICING', {})
+    with pytest.raises(AggregationUnavailable):
+        aggregate_mrr(FakeQuery(query.docs, aggregations_fail=True), NOW, ['stripe'])
+
+
+@pytest.mark.parametrize('aggregations_fail', [False, True])
+def test_extension_stats(aggregations_fail):
+    subscriptions = FakeQuery([
+        ('a', {'total_extension_days': 30}),
+        ('b', {'total_extension_days': 15}),
+        ('c', {'total_extension_days': 0}),
+        ('d', {}),
+    ], aggregations_fail)
+
+    assert aggregate_extension_stats(subscriptions) == {
+        'extended_subscriptions': 2,
+        'total_extension_days': 45,
+        'average_extension_days': 22.5,
+    }
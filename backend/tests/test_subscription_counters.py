@@ -0,0 +1,133 @@
+"""
+Subscription Counters Tests
+
+測試增量計數器（變更差異、到期扣減、重掃重放）
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+
+from services.subscription_counters import SubscriptionCounterListener, SubscriptionCounters
+from services.subscription_timeline import SubscriptionRow
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)  # 週四
+
+
+def _row(uid, **data):
+    return SubscriptionRow(uid, data)
+
+
+def _trial(uid, created, trial_days=14):
+    return _row(uid, created_at=created, trial_end_at=created + timedelta(days=trial_days), is_premium=False)
+
+
+def _premium(uid, created, end):
+    return _row(uid, created_at=created, trial_end_at=created + timedelta(days=14),
+                is_premium=True, premium_start_at=created, premium_end_at=end)
+
+
+def test_counters_apply_add_modify_remove():
+    """測試新增、修改（試用轉付費）與刪除的差異"""
+    counters = SubscriptionCounters()
+    counters.apply('a', _trial('a', NOW - timedelta(hours=1)), now=NOW)
+    counters.apply('b', _trial('b', NOW - timedelta(days=3)), now=NOW)
+    counters.apply('c', _premium('c', NOW - timedelta(days=40), NOW - timedelta(days=5)), now=NOW)
+
+    counts = counters.counts(NOW)
+    assert counts['total_users'] == 3
+    assert counts['premium_users'] == 1
+    assert counts['trial_users'] == 2
+    assert counts['active_premium_users'] == 0
+    assert counts['today_new_users'] == 1
+    assert counts['this_week_new_users'] == 2
+    assert counts['this_month_new_users'] == 2
+
+    # b 轉付費
+    counters.apply('b', _premium('b', NOW - timedelta(days=3), NOW + timedelta(days=30)), now=NOW)
+    counts = counters.counts(NOW)
+    assert counts['trial_users'] == 1
+    assert counts['premium_users'] == 2
+    assert counts['active_premium_users'] == 1
+    assert counts['total_users'] == 3
+
+    counters.apply('a', None, now=NOW)
+    counts = counters.counts(NOW)
+    assert counts['total_users'] == 2
+    assert counts['trial_users'] == 0
+    assert counts['today_new_users'] == 0
+
+
+def test_counters_expire_without_document_changes():
+    """測試試用/付費到期後不需文檔變更即從活躍中扣除"""
+    counters = SubscriptionCounters()
+    counters.apply('a', _trial('a', NOW - timedelta(days=13)), now=NOW)
+    counters.apply('b', _premium('b', NOW - timedelta(days=20), NOW + timedelta(days=2)), now=NOW)
+
+    later = NOW + timedelta(days=1, hours=12)
+    counts = counters.counts(later)
+    assert counts['trial_users'] == 0
+    assert counts['active_premium_users'] == 1
+
+    counts = counters.counts(NOW + timedelta(days=3))
+    assert counts['active_premium_users'] == 0
+    assert counts['premium_users'] == 1
+
+
+def test_counters_ignore_stale_expiry_after_update():
+    """測試更新後舊的到期條目不會重複扣減"""
+    counters = SubscriptionCounters()
+    counters.apply('a', _premium('a', NOW - timedelta(days=20), NOW + timedelta(days=1)), now=NOW)
+    # 續訂：到期時間延後
+    counters.apply('a', _premium('a', NOW - timedelta(days=20), NOW + timedelta(days=31)), now=NOW)
+
+    assert counters.counts(NOW + timedelta(days=2))['active_premium_users'] == 1
+
+
+def _change(kind, uid, data=None):
+    change = Mock()
+    change.type.name = kind
+    change.document.id = uid
+    change.document.to_dict.return_value = data or {}
+    return change
+
+
+def test_listener_applies_snapshot_changes():
+    """測試 on_snapshot 回調應用變更並在初始快照後就緒"""
+    listener = SubscriptionCounterListener()
+    assert listener.counts(NOW) is None
+
+    created = datetime.now(timezone.utc)
+    listener._on_snapshot(None, [
+        _change('ADDED', 'a', {'created_at': created, 'trial_end_at': created + timedelta(days=14)}),
+        _change('ADDED', 'b', {'created_at': created, 'trial_end_at': created + timedelta(days=14)}),
+    ], None)
+    assert listener.is_ready()
+    assert listener.counts()['total_users'] == 2
+
+    listener._on_snapshot(None, [_change('REMOVED', 'b')], None)
+    assert listener.counts()['total_users'] == 1
+
+
+def test_reconcile_rebuilds_and_replays_concurrent_changes(monkeypatch):
+    """測試全量重掃修正漂移，並重放重掃期間的變更"""
+    listener = SubscriptionCounterListener()
+    listener.db = Mock()
+    created = datetime.now(timezone.utc)
+    trial = {'created_at': created, 'trial_end_at': created + timedelta(days=14)}
+    # 模擬漂移：計數器漏掉了 b 的新增事件
+    listener._on_snapshot(None, [_change('ADDED', 'a', trial)], None)
+
+    def scan(query):
+        # 重掃期間收到新增 c 的變更
+        listener._on_snapshot(None, [_change('ADDED', 'c', trial)], None)
+        yield SubscriptionRow('a', trial)
+        yield SubscriptionRow('b', trial)
+
+    monkeypatch.setattr('services.subscription_counters.stream_subscription_rows', scan)
+
+    drift = listener.reconcile()
+
+    assert listener.counts()['total_users'] == 3
+    assert listener.counts()['trial_users'] == 3
+    assert drift['total_users'] == -1
+    assert drift['trial_users'] == -1
@@ -0,0 +1,138 @@
+"""
+Subscription Timeline Tests
+
+測試列式訂閱時間線與 sweep-line 活躍人數計算
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+
+import numpy as np
+
+from services.subscription_timeline import (
+    SubscriptionRow,
+    SubscriptionTimeline,
+    compute_daily_activity,
+    count_active,
+    count_events,
+    day_edges,
+    stream_subscription_rows,
+)
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def _day(offset, hour=10):
+    return (NOW + timedelta(days=offset)).replace(hour=hour, minute=0)
+
+
+def test_count_active_half_open_intervals():
+    """測試 [start, end) 區間：start 當下算活躍，end 當下不算"""
+    starts = np.array([10.0, 20.0, np.nan, 50.0])
+    ends = np.array([30.0, 40.0, 60.0, 50.0])  # 第 3 個缺 start，第 4 個長度為 0
+    at = np.array([5.0, 10.0, 25.0, 30.0, 40.0])
+
+    assert count_active(starts, ends, at).tolist() == [0, 1, 2, 1, 0]
+
+
+def test_count_events_buckets_by_day():
+    """測試事件按 UTC 日期分桶，範圍外的事件被忽略"""
+    edges = day_edges(_day(-2).date(), NOW.date())
+    times = np.array([
+        _day(-2).timestamp(),
+        _day(-2, hour=23).timestamp(),
+        NOW.timestamp(),
+        _day(-5).timestamp(),
+        np.nan,
+    ])
+    assert count_events(times, edges).tolist() == [2, 0, 1]
+
+
+def test_trial_intervals_exclude_premium():
+    """測試試用區間扣除付費區間"""
+    timeline = SubscriptionTimeline.from_subscriptions([{
+        'created_at': _day(-10),
+        'trial_start_at': _day(-10),
+        'trial_end_at': _day(4),
+        'premium_start_at': _day(-6),
+        'premium_end_at': _day(24),
+    }])
+    starts, ends = timeline.trial_intervals()
+    valid = starts < ends
+    assert starts[valid].tolist() == [_day(-10).timestamp()]
+    assert ends[valid].tolist() == [_day(-6).timestamp()]
+
+
+def test_daily_activity_is_exact_for_every_day():
+    """測試每天的活躍試用/付費人數與逐日計算結果一致"""
+    subscriptions = []
+    for i in range(50):
+        created = _day(-60 + i)
+        data = {
+            'created_at': created,
+            'trial_start_at': created,
+            'trial_end_at': created + timedelta(days=14),
+            'is_premium': i % 3 == 0,
+        }
+        if i % 3 == 0:
+            data['premium_start_at'] = created + timedelta(days=7)
+            data['premium_end_at'] = created + timedelta(days=37)
+        subscriptions.append(data)
+
+    start_date = (NOW - timedelta(days=30)).date()
+    timeline = SubscriptionTimeline.from_subscriptions(subscriptions)
+    activity = compute_daily_activity(timeline, start_date, NOW.date(), now=NOW)
+
+    assert len(activity['dates']) == 31
+    for i, date_key in enumerate(activity['dates']):
+        day_end = datetime.strptime(date_key, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
+        t = min(day_end, NOW)
+        premium = sum(
+            1 for s in subscriptions
+            if 'premium_start_at' in s and s['premium_start_at'] <= t < s['premium_end_at']
+        )
+        trial = sum(
+            1 for s in subscriptions
+            if s['trial_start_at'] <= t < s['trial_end_at']
+            and not ('premium_start_at' in s and s['premium_start_at'] <= t < s['premium_end_at'])
+        )
+        assert activity['active_premium_users'][i] == premium
+        assert activity['active_trial_users'][i] == trial
+
+
+def test_daily_activity_empty_timeline():
+    """測試沒有訂閱時返回全 0"""
+    timeline = SubscriptionTimeline.from_subscriptions([])
+    activity = compute_daily_activity(timeline, (NOW - timedelta(days=6)).date(), NOW.date(), now=NOW)
+
+    assert len(activity['dates']) == 7
+    assert activity['new_users'].tolist() == [0] * 7
+    assert activity['active_trial_users'].tolist() == [0] * 7
+
+
+def test_stream_subscription_rows_uses_field_projection():
+    """測試串流時只請求分析需要的字段，並解碼成精簡行"""
+    doc = Mock()
+    doc.id = 'user1'
+    doc.to_dict.return_value = {'created_at': NOW, 'is_premium': True, 'payment_platform': 'stripe'}
+    query = Mock()
+    query.select.return_value.order_by.return_value.limit.return_value.stream.return_value = [doc]
+
+    rows = list(stream_subscription_rows(query))
+
+    query.select.assert_called_once_with(list(SubscriptionRow.FIELDS))
+    assert len(rows) == 1
+    assert rows[0].uid == 'user1'
+    assert rows[0].created_at == NOW
+    assert rows[0].premium_end_at is None
+    assert not hasattr(rows[0], '__dict__')
+
+
+def test_timeline_accepts_rows_and_dicts():
+    """測試時間線可由 SubscriptionRow 或 dict 構建"""
+    data = {'created_at': NOW, 'trial_end_at': NOW + timedelta(days=7)}
+    from_rows = SubscriptionTimeline.from_subscriptions([SubscriptionRow('u', data)])
+    from_dicts = SubscriptionTimeline.from_subscriptions([data])
+
+    assert from_rows.created_at.tolist() == from_dicts.created_at.tolist()
+    assert from_rows.trial_start.tolist() == [NOW.timestamp()]
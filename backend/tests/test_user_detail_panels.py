@@ -0,0 +1,247 @@
+"""
+User Detail Panels Tests
+
+測試用戶詳情面板（/users/<uid>/full 的批量讀取、準備度歷史範圍查詢、週回顧 ID）
+"""
+from types import SimpleNamespace
+
+from flask import Flask
+
+import api.admin.users as users_api
+from services.readiness_cache import readiness_cache
+
+
+class FakeDoc:
+    def __init__(self, path, data):
+        self.id = path.rsplit('/', 1)[-1]
+        self.reference = SimpleNamespace(path=path)
+        self.exists = data is not None
+        self.update_time = 'v1' if data is not None else None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeRef:
+    """文檔或集合引用；集合支持按文檔 ID 的 where / order_by / start_after / limit / offset"""
+
+    def __init__(self, db, path, filters=(), descending=False, after=None, limit=None, offset=0):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+        self._filters = list(filters)
+        self._descending = descending
+        self._after = after
+        self._limit = limit
+        self._offset = offset
+
+    def _copy(self, **changes):
+        params = dict(filters=self._filters, descending=self._descending, after=self._after,
+                      limit=self._limit, offset=self._offset)
+        params.update(changes)
+        return FakeRef(self.db, self.path, **params)
+
+    def collection(self, name):
+        return FakeRef(self.db, f'{self.path}/{name}')
+
+    def document(self, doc_id):
+        return FakeRef(self.db, f'{self.path}/{doc_id}')
+
+    def get(self):
+        self.db.calls.append(('get', self.path))
+        return FakeDoc(self.path, self.db.docs.get(self.path))
+
+    def where(self, field, op, value):
+        assert field == '__name__'
+        return self._copy(filters=self._filters + [(op, value.id)])
+
+    def order_by(self, field, direction='ASCENDING'):
+        assert field == '__name__'
+        return self._copy(descending=direction == 'DESCENDING')
+
+    def start_after(self, values):
+        return self._copy(after=values[-1])
+
+    def limit(self, n):
+        return self._copy(limit=n)
+
+    def offset(self, n):
+        return self._copy(offset=n)
+
+    def stream(self):
+        prefix = self.path + '/'
+        ids = sorted(
+            (path[len(prefix):] for path in self.db.docs
+             if path.startswith(prefix) and '/' not in path[len(prefix):]),
+            reverse=self._descending
+        )
+        for op, value in self._filters:
+            ids = [i for i in ids if (i >= value if op == '>=' else i <= value)]
+        if self._after is not None:
+            ids = [i for i in ids if (i < self._after if self._descending else i > self._after)]
+        ids = ids[self._offset:]
+        if self._limit is not None:
+            ids = ids[:self._limit]
+        self.db.calls.append(('stream', self.path, len(ids)))
+        return [FakeDoc(prefix + i, self.db.docs[prefix + i]) for i in ids]
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = []
+
+    def collection(self, name):
+        return FakeRef(self, name)
+
+    def get_all(self, refs):
+        self.calls.append(('get_all', [ref.path for ref in refs]))
+        return [FakeDoc(ref.path, self.docs.get(ref.path)) for ref in refs]
+
+
+def _trend(n):
+    return {'dates': [f'd{i}' for i in range(n)], 'values': list(range(n)), 'direction': 'up'}
+
+
+DOCS = {
+    'users/u1': {'email': 'runner@example.com', 'active_training_id': 't1', 'active_weekly_plan_id': 't1_3'},
+    'plan_race_run_overview/t1': {'overview': {'goal': 'marathon'}, 'created_at': 'c1'},
+    'plan_race_run_weekly/t1_3': {'days': [1, 2, 3], 'created_at': 'c2'},
+    'weekly_summary/t1_2_summary': {'text': 'good week', 'created_at': 'c3'},
+    'users/u1/training_readiness/2025-11-20': {'speed': {'score': 80}, 'recovery': {'score': 70, 'trend_data': {'kept': True}}},
+    'users/u1/training_readiness/2025-11-19': {'speed': {'score': 78}},
+    'readiness_metrics/u1/rolling_trends/current': {'speed': _trend(40), 'recovery': _trend(5)},
+}
+
+
+def _call_full(monkeypatch, query_string):
+    db = FakeDB(DOCS)
+    monkeypatch.setattr(users_api, 'db', db)
+    readiness_cache.clear()
+    app = Flask(__name__)
+    with app.test_request_context(f'/u1/full?{query_string}'):
+        response, status = users_api.get_user_full.__wrapped__('u1')
+    return db, response.get_json(), status
+
+
+def test_full_profile_reads_user_once_and_batches_dependents(monkeypatch):
+    db, body, status = _call_full(monkeypatch, 'date=2025-11-20&days=7')
+
+    assert status == 200
+    assert body['user']['email'] == 'runner@example.com'
+    assert body['training_overview']['training_overview'] == {'goal': 'marathon'}
+    assert body['weekly_plan']['weekly_plan_id'] == 't1_3'
+    assert body['weekly_summary']['summary_id'] == 't1_2_summary'
+    assert body['weekly_summary']['week_number'] == 2
+    assert body['readiness']['found_for_date'] is True
+    assert [d['doc_id'] for d in body['readiness_history']['history']] == ['2025-11-20', '2025-11-19']
+    assert 'errors' not in body
+
+    # users/u1 只讀一次，其餘依賴文檔一次 get_all
+    assert [call for call in db.calls if call[0] == 'get'] == [('get', 'users/u1')]
+    batches = [call[1] for call in db.calls if call[0] == 'get_all']
+    assert len(batches) == 1 and len(batches[0]) == 5
+
+
+def test_full_profile_include_subset_and_validation(monkeypatch):
+    db, body, status = _call_full(monkeypatch, 'include=weekly_plan')
+    assert status == 200
+    assert set(body) == {'user', 'weekly_plan'}
+    assert [call[1] for call in db.calls if call[0] == 'get_all'] == [['plan_race_run_weekly/t1_3']]
+
+    _, body, status = _call_full(monkeypatch, 'include=weekly_plan,unknown')
+    assert status == 400
+
+
+def test_full_profile_days_bounds(monkeypatch):
+    _, body, status = _call_full(monkeypatch, 'include=readiness_history&days=0')
+    assert status == 200
+    assert body['readiness_history']['days'] == 1
+
+    _, body, status = _call_full(monkeypatch, 'include=readiness_history&days=-5')
+    assert status == 200
+
+    _, _, status = _call_full(monkeypatch, 'include=readiness_history&days=abc')
+    assert status == 400
+
+
+def test_weekly_summary_id():
+    assert users_api._weekly_summary_id('003bcz2NC4aLX0PgJARs_11') == ('003bcz2NC4aLX0PgJARs_10_summary', 10)
+    assert users_api._weekly_summary_id('plan_1') == (None, None)
+    assert users_api._weekly_summary_id('noweek') == (None, None)
+    assert users_api._weekly_summary_id(None) == (None, None)
+
+
+def test_readiness_history_is_a_bounded_range_query(monkeypatch):
+    docs = {f'users/u1/training_readiness/2025-{m:02d}-{d:02d}': {'day': d} for m in (9, 10, 11) for d in range(1, 29)}
+    db = FakeDB(docs)
+    monkeypatch.setattr(users_api, 'db', db)
+    app = Flask(__name__)
+
+    def history(query_string):
+        with app.test_request_context(f'/u1/readiness/history?{query_string}'):
+            response, status = users_api.get_user_readiness_history.__wrapped__('u1')
+        return response.get_json(), status
+
+    body, status = history('days=7')
+    assert status == 200
+    assert [d['doc_id'] for d in body['history']][:2] == ['2025-11-28', '2025-11-27']
+    assert body['count'] == 7
+    # 只讀取 days + 1 個文檔
+    assert db.calls[-1] == ('stream', 'users/u1/training_readiness', 8)
+
+    older, _ = history(f"days=7&cursor={body['next_cursor']}")
+    assert older['history'][0]['doc_id'] == '2025-11-21'
+    newer, _ = history(f"days=7&cursor={older['prev_cursor']}")
+    assert [d['doc_id'] for d in newer['history']] == [d['doc_id'] for d in body['history']]
+
+    window, _ = history('days=90&from=2025-10-05&to=2025-10-10')
+    assert [d['doc_id'] for d in window['history']] == [f'2025-10-{d:02d}' for d in range(10, 4, -1)]
+    assert window['next_cursor'] is None
+
+    _, status = history('from=2025/10/05')
+    assert status == 400
+    _, status = history(f"days=7&from=2025-10-05&cursor={body['next_cursor']}")
+    assert status == 400
+
+    clamped, status = history('days=0')
+    assert status == 200 and clamped['count'] == 1
+    _, status = history('days=-3')
+    assert status == 200
+    _, status = history('days=week')
+    assert status == 400
+
+
+def test_readiness_fallback_reads_only_latest_document(monkeypatch):
+    db = FakeDB(DOCS)
+    monkeypatch.setattr(users_api, 'db', db)
+    readiness_cache.clear()
+
+    payload = users_api._readiness_payload('u1', '2025-12-01', None, None)
+
+    assert payload['found_for_date'] is False
+    assert payload['readiness']['doc_id'] == '2025-11-20'
+    assert db.calls == [('stream', 'users/u1/training_readiness', 1)]
+
+
+def test_readiness_panel_is_served_from_cache_when_flipping_dates(monkeypatch):
+    db = FakeDB(DOCS)
+    monkeypatch.setattr(users_api, 'db', db)
+    readiness_cache.clear()
+    app = Flask(__name__)
+
+    def readiness(date):
+        with app.test_request_context(f'/u1/readiness?date={date}'):
+            response, status = users_api.get_user_readiness.__wrapped__('u1')
+        return response.get_json()
+
+    first = readiness('2025-11-20')
+    readiness('2025-11-19')
+    calls = len(db.calls)
+
+    # 切換回已看過的日期：不再讀取 Firestore
+    assert readiness('2025-11-20') == first
+    assert readiness('2025-11-19')['readiness']['doc_id'] == '2025-11-19'
+    assert len(db.calls) == calls
+    assert first['readiness']['speed']['trend_data']['dates'][0] == 'd12'
@@ -0,0 +1,168 @@
+"""
+User Search Index Tests
+
+測試用戶搜尋索引（排名、分頁、增量刷新（含缺少 updated_at 的新用戶）、持久化、多 worker 同步、搜尋不讀取 Firestore、10 萬用戶的搜尋延遲）
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from services.user_search_index import SearchIndexNotReady, UserSearchIndex
+
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeUsers:
+    """內存中的 users 集合（單頁查詢，記錄讀取數）"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+
+    def collection(self, name):
+        assert name == 'users'
+        return FakeUsersQuery(self, self.docs)
+
+
+class FakeUsersQuery:
+    def __init__(self, db, docs):
+        self.db = db
+        self.docs = docs
+
+    def where(self, field, op, value):
+        assert op == '>='
+        return FakeUsersQuery(self.db, {
+            uid: data for uid, data in self.docs.items()
+            if isinstance(data.get(field), datetime) and data[field] >= value
+        })
+
+    def select(self, fields):
+        return self
+
+    def order_by(self, field):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def start_after(self, doc):
+        return FakeUsersQuery(self.db, {})
+
+    def stream(self):
+        self.db.reads += len(self.docs)
+        return [SimpleNamespace(id=uid, to_dict=lambda d=data: dict(d)) for uid, data in self.docs.items()]
+
+
+def _user(email, name=None, minutes_ago=60):
+    return {'email': email, 'display_name': name, 'updated_at': NOW - timedelta(minutes=minutes_ago)}
+
+
+def test_ranking_and_pagination(tmp_path):
+    db = FakeUsers({
+        'uid-sub': _user('mary.anna@example.com'),
+        'uid-word': _user('bob.ann@example.com'),
+        'uid-prefix': _user('annabel@example.com'),
+        'uid-exact': _user('zzz@example.com', name='Ann'),
+        'uid-none': _user('carl@example.com', name='Carl'),
+    })
+    index = UserSearchIndex(path=str(tmp_path / 'index.json'))
+
+    # 背景執行緒完成首次同步前不會在請求中掃描
+    with pytest.raises(SearchIndexNotReady):
+        index.search('ann')
+    assert db.reads == 0
+
+    index.sync(db)
+    db.reads = 0
+    uids, total = index.search('ANN', offset=0, limit=10)
+
+    # 完全相等（顯示名稱）> 前綴 > 詞首 > 子串
+    assert uids == ['uid-exact', 'uid-prefix', 'uid-word', 'uid-sub']
+    assert total == 4
+
+    page, total = index.search('ann', offset=1, limit=2)
+    assert page == ['uid-prefix', 'uid-word']
+    assert total == 4
+
+    # UID 也可搜尋
+    assert index.search('uid-no', limit=10) == (['uid-none'], 1)
+    assert index.search('nobody', limit=10) == ([], 0)
+    assert db.reads == 0
+
+
+def test_incremental_refresh_and_persistence(tmp_path):
+    docs = {f'uid-{i}': _user(f'runner{i}@example.com', minutes_ago=60 + i) for i in range(5)}
+    db = FakeUsers(docs)
+    path = str(tmp_path / 'index.json')
+    index = UserSearchIndex(path=path)
+
+    assert index.refresh(db) == 5
+
+    # 增量刷新只讀取 updated_at >= 游標的用戶
+    docs['uid-new'] = _user('coach@example.com', name='Head Coach', minutes_ago=0)
+    docs['uid-0'] = _user('renamed@example.com', minutes_ago=0)
+    db.reads = 0
+    assert index.refresh(db) == 2
+    assert db.reads == 2
+
+    assert index.search('coach', limit=10) == (['uid-new'], 1)
+    assert index.search('runner0', limit=10) == ([], 0)
+
+    # 另一個 worker：寫入鎖被佔用時只載入持久化快照，不讀取 Firestore
+    index.sync(db)  # 取得寫入鎖
+    other = UserSearchIndex(path=path)
+    db.reads = 0
+    other.sync(db)
+    assert len(other) == 6
+    assert other.search('renamed', limit=10) == (['uid-0'], 1)
+    assert db.reads == 0
+
+    # 持有鎖的 worker 寫入新快照後，其他 worker 在下一次同步時重新載入
+    docs['uid-late'] = _user('late@example.com', minutes_ago=-1)
+    index.sync(db)
+    other.sync(db)
+    assert other.search('late@', limit=10) == (['uid-late'], 1)
+    # 只有持有鎖的 worker 讀取（游標上的 2 個用戶 + 新用戶）
+    assert db.reads == 3
+
+
+def test_incremental_refresh_picks_up_new_users_without_updated_at(tmp_path):
+    docs = {'uid-old': _user('old@example.com')}
+    db = FakeUsers(docs)
+    index = UserSearchIndex(path=str(tmp_path / 'index.json'))
+    index.refresh(db)
+
+    # 剛建立、尚未寫入 updated_at 的用戶由 created_at 查詢帶入
+    docs['uid-fresh'] = {'email': 'fresh@example.com', 'created_at': NOW}
+    db.reads = 0
+    assert index.refresh(db) == 2
+    assert index.search('fresh', limit=10) == (['uid-fresh'], 1)
+
+    # 游標已推進到 created_at，之後的增量不再重讀舊用戶
+    db.reads = 0
+    assert index.refresh(db) == 1
+    assert db.reads == 1
+
+
+def test_search_latency_at_100k_users(tmp_path):
+    index = UserSearchIndex(path=str(tmp_path / 'index.json'))
+    domains = ['gmail.com', 'yahoo.com.tw', 'outlook.com', 'example.org']
+    for i in range(100_000):
+        index.apply(f'{i:028x}', {
+            'email': f'user{i}@{domains[i % 4]}',
+            'display_name': f'Runner {i}',
+            'updated_at': NOW,
+        })
+    index.publish()
+
+    for query in ('gmail', 'user4242', 'runner 9', 'nobody'):
+        start = time.perf_counter()
+        uids, total = index.search(query, limit=50)
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.05, f'{query}: {elapsed * 1000:.1f}ms'
+
+    assert index.search('user4242@', limit=50)[0] == [f'{4242:028x}']
+    assert index.search('gmail', limit=50)[1] == 25_000
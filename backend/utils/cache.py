@@ -0,0 +1,269 @@
+"""
+進程內緩存工具
+
+提供執行緒安全的 TTL + LRU 緩存，並支援 single-flight 重算：
+同一個 key 過期後，只有一個執行緒會執行計算函數，其他執行緒等待並共用結果。
+適用於 gunicorn gthread worker（同一進程內多執行緒）。
+
+stale-while-revalidate（get_or_refresh）：條目過期後仍直接返回上一次的結果，
+同時在背景執行緒重新計算，請求延遲不受計算時間影響。
+
+使用方式:
+    _cache = TTLCache('analytics', max_entries=64, default_ttl=300)
+
+    result = _cache.get_or_compute(
+        cache_key('trends', days=30),
+        lambda: compute_trends(30),
+        ttl=600
+    )
+
+    # 過期時返回舊值並在背景刷新
+    result, computed_at, stale = _cache.get_or_refresh(key, compute_fn, ttl=600)
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 緩存未命中的哨兵值（允許緩存 None）
+MISSING = object()
+
+
+def cache_key(name: str, **params) -> str:
+    """
+    生成包含參數的緩存 key
+
+    參數按名稱排序，確保相同參數組合得到相同 key。
+    例如: cache_key('trends', days=30) -> 'trends:days=30'
+    """
+    if not params:
+        return name
+    parts = ','.join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{name}:{parts}"
+
+
+class _CacheEntry:
+    """單個緩存條目"""
+    __slots__ = ('value', 'expires_at', 'computed_at')
+
+    def __init__(self, value: Any, ttl: float):
+        self.value = value
+        self.expires_at = time.monotonic() + ttl
+        self.computed_at = datetime.now(timezone.utc)
+
+    def is_expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+class _Flight:
+    """一次進行中的計算（single-flight）"""
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    執行緒安全的 TTL + LRU 緩存
+
+    - 每個條目有獨立的 TTL
+    - 超過 max_entries 時淘汰最久未使用的條目
+    - get_or_compute 保證同一 key 同時只有一個執行緒在計算
+    """
+
+    def __init__(self, name: str, max_entries: int = 128, default_ttl: float = 300):
+        self.name = name
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: 'OrderedDict[Hashable, _CacheEntry]' = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """獲取未過期的緩存值，未命中時返回 default"""
+        with self._lock:
+            value = self._get_locked(key)
+        return default if value is MISSING else value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """設置緩存值（ttl 為 None 時使用 default_ttl）"""
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def invalidate(self, key: Hashable) -> None:
+        """刪除單個緩存條目"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """清空所有緩存條目"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute_fn: Callable[[], Any],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        獲取緩存值，未命中時執行 compute_fn 並緩存結果
+
+        同一 key 的並發請求只會執行一次 compute_fn，
+        其他執行緒等待該次計算完成後共用結果（或共用異常）。
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not MISSING:
+                return value
+
+            flight = self._inflight.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not is_leader:
+            return self._wait(key, flight)
+        return self._run_flight(key, flight, compute_fn, ttl)
+
+    def get_or_refresh(
+        self,
+        key: Hashable,
+        compute_fn: Callable[[], Any],
+        ttl: Optional[float] = None,
+        max_stale: Optional[float] = None
+    ) -> Tuple[Any, datetime, bool]:
+        """
+        stale-while-revalidate：獲取緩存值，過期時返回舊值並在背景重新計算
+
+        Args:
+            key: 緩存 key
+            compute_fn: 計算函數
+            ttl: 新結果的 TTL
+            max_stale: 過期後最多還能返回舊值多少秒（None 為不限）
+
+        Returns:
+            (value, computed_at, stale)：stale 為 True 表示返回的是過期結果，
+            背景刷新已經開始。沒有可用的舊值時同步計算（同 get_or_compute）。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.expires_at
+                if age < 0:
+                    self._entries.move_to_end(key)
+                    return entry.value, entry.computed_at, False
+                if max_stale is None or age < max_stale:
+                    self._entries.move_to_end(key)
+                    self._start_background_locked(key, compute_fn, ttl)
+                    return entry.value, entry.computed_at, True
+
+        value = self.get_or_compute(key, compute_fn, ttl)
+        with self._lock:
+            entry = self._entries.get(key)
+        computed_at = entry.computed_at if entry is not None else datetime.now(timezone.utc)
+        return value, computed_at, False
+
+    def refresh(self, key: Hashable, compute_fn: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        強制重新計算並更新緩存（不論是否過期）
+
+        已有同 key 的計算在進行時，等待並共用該次結果。
+        """
+        with self._lock:
+            flight = self._inflight.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not is_leader:
+            return self._wait(key, flight)
+        return self._run_flight(key, flight, compute_fn, ttl)
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """條目剩餘的有效秒數（已過期為負數，不存在為 None）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry.expires_at - time.monotonic()
+
+    def _wait(self, key: Hashable, flight: _Flight) -> Any:
+        logger.debug(f"[{self.name}] Waiting for in-flight computation of {key}")
+        flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _run_flight(
+        self,
+        key: Hashable,
+        flight: _Flight,
+        compute_fn: Callable[[], Any],
+        ttl: Optional[float]
+    ) -> Any:
+        try:
+            start = time.monotonic()
+            flight.value = compute_fn()
+            logger.info(
+                f"[{self.name}] Computed {key} in {time.monotonic() - start:.2f}s"
+            )
+            with self._lock:
+                self._set_locked(key, flight.value, ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _start_background_locked(
+        self,
+        key: Hashable,
+        compute_fn: Callable[[], Any],
+        ttl: Optional[float]
+    ) -> None:
+        """在背景執行緒重新計算（同 key 已有計算進行時不重複啟動）"""
+        if key in self._inflight:
+            return
+        flight = _Flight()
+        self._inflight[key] = flight
+
+        def run():
+            try:
+                self._run_flight(key, flight, compute_fn, ttl)
+            except Exception as e:
+                # 刷新失敗時保留舊值，下次請求再嘗試
+                logger.warning(f"[{self.name}] Background refresh of {key} failed: {e}")
+
+        threading.Thread(target=run, name=f'{self.name}-refresh', daemon=True).start()
+
+    def _get_locked(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        if entry.is_expired():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def _set_locked(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        self._entries[key] = _CacheEntry(value, self.default_ttl if ttl is None else ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            logger.debug(f"[{self.name}] Evicted {evicted_key}")
@@ -0,0 +1,101 @@
+"""
+並發查詢工具
+
+把多個互相獨立的 Firestore 查詢（聚合 count、stream 等）放到共用的有界執行緒池中並發執行，
+冷啟動延遲約等於最慢的單個查詢，而不是所有查詢延遲的總和。
+
+- 每個查詢都有超時（從提交時開始計算）
+- 單個查詢失敗或超時不影響其他查詢，返回部分結果與錯誤信息
+- 執行緒池全進程共用且有上限，避免 gthread 請求過多時無限制開線程
+
+注意：不要在 fan_out 的任務中再次調用 fan_out（共用池可能被佔滿而互相等待直到超時）。
+
+使用方式:
+    results, errors = fan_out({
+        'total': lambda: count_query(subscriptions_ref),
+        'premium': lambda: count_query(subscriptions_ref.where('is_premium', '==', True)),
+    }, timeout=10, default=0)
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 全進程共用的執行緒池上限（gunicorn: 每個 worker 一個池）
+FANOUT_MAX_WORKERS = 16
+
+# 默認單個查詢超時（秒）
+DEFAULT_QUERY_TIMEOUT = 15
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix='firestore-fanout')
+
+
+def count_query(query) -> int:
+    """執行 Firestore 聚合 count 查詢（不讀取文檔內容）"""
+    return query.count().get()[0][0].value
+
+
+def aggregate_query(query, sums: Iterable[str] = (), avgs: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    在一次聚合查詢中執行 count 與多個字段的 sum / avg（不讀取文檔內容）
+
+    Firestore 的 sum / avg 只計入該字段為數值的文檔；沒有數值時 avg 為 None。
+    一次聚合查詢最多 5 個聚合（含 count）。
+
+    Returns:
+        {"count": 100, "sum_price": 15000, "avg_price": 150.0}
+    """
+    aggregation = query.count(alias='count')
+    for field in sums:
+        aggregation = aggregation.sum(field, alias=f'sum_{field}')
+    for field in avgs:
+        aggregation = aggregation.avg(field, alias=f'avg_{field}')
+    return {result.alias: result.value for result in aggregation.get()[0]}
+
+
+def fan_out(
+    tasks: Dict[str, Callable[[], Any]],
+    timeout: float = DEFAULT_QUERY_TIMEOUT,
+    default: Any = None
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    並發執行多個獨立查詢
+
+    Args:
+        tasks: {名稱: 無參數的查詢函數}
+        timeout: 每個查詢的超時秒數
+        default: 查詢失敗或超時時使用的默認值
+
+    Returns:
+        (results, errors):
+            results: {名稱: 結果或默認值}，包含所有任務名稱
+            errors: {名稱: 錯誤描述}，只包含失敗或超時的任務
+    """
+    start = time.monotonic()
+
+    futures = {name: _executor.submit(fn) for name, fn in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+
+    results, errors = {}, {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            errors[name] = f'Timed out after {timeout}s'
+            results[name] = default
+            logger.warning(f"Query '{name}' timed out after {timeout}s")
+            continue
+
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = str(e)
+            results[name] = default
+            logger.warning(f"Query '{name}' failed: {e}")
+
+    logger.info(
+        f"Fan-out of {len(tasks)} queries finished in {time.monotonic() - start:.2f}s "
+        f"({len(errors)} failed)"
+    )
+    return results, errors
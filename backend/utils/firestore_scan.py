@@ -0,0 +1,64 @@
+"""
+Firestore 分頁掃描工具
+
+以固定大小的頁面（limit + start_after 游標）遍歷查詢結果，並以 generator 逐筆產出。
+任一時刻內存中只有一頁文檔，適合 10 萬筆以上的集合掃描；
+每頁是一個獨立的短 RPC，不會因為單個長串流超時而中斷。
+
+使用方式:
+    for doc in scan_query(db.collection('subscriptions'), page_size=1000):
+        ...
+
+    # 有範圍過濾時，排序字段必須是該過濾字段
+    query = subscriptions_ref.where('premium_end_at', '>=', month_start)
+    for doc in scan_query(query, order_by='premium_end_at'):
+        ...
+"""
+import logging
+import time
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 默認每頁文檔數
+DEFAULT_PAGE_SIZE = 1000
+
+
+def scan_query(query, page_size: int = DEFAULT_PAGE_SIZE, order_by: Optional[str] = None) -> Iterator:
+    """
+    分頁遍歷查詢結果
+
+    Args:
+        query: Firestore CollectionReference 或 Query（不要自帶 limit / order_by）
+        page_size: 每頁文檔數
+        order_by: 排序字段；查詢含範圍過濾（<, <=, >, >=, !=）時必須傳入該字段。
+            默認按文檔 ID 排序。排序字段必須包含在 select 投影中。
+
+    Yields:
+        DocumentSnapshot
+    """
+    ordered = query.order_by(order_by or '__name__')
+    last_doc = None
+    pages = 0
+    total = 0
+    start = time.monotonic()
+
+    while True:
+        page_query = ordered.limit(page_size)
+        if last_doc is not None:
+            page_query = page_query.start_after(last_doc)
+
+        docs = list(page_query.stream())
+        pages += 1
+        total += len(docs)
+
+        yield from docs
+
+        if len(docs) < page_size:
+            break
+        last_doc = docs[-1]
+
+    logger.info(
+        f"Scanned {total} documents in {pages} page(s) "
+        f"({time.monotonic() - start:.2f}s, page_size={page_size})"
+    )
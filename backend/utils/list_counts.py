@@ -0,0 +1,84 @@
+"""
+列表總數緩存
+
+分頁列表每次換頁都要重新執行 count() 聚合查詢，而總數在翻頁之間幾乎不變。
+這裡按「集合 + 篩選條件」緩存總數，同一進程內的所有請求共用：
+
+- approx（默認）：緩存 LIST_COUNT_TTL 秒；過期後先返回舊值並在背景重新計數
+  （最多沿用 LIST_COUNT_MAX_STALE 秒），翻頁不再等待聚合查詢
+- exact：總是執行聚合查詢，並用結果更新緩存
+- none：不計數（total / total_pages 返回 null），只靠游標翻頁
+
+寫入會改變總數的端點（停用邀請碼、延長 / 取消訂閱等）調用 invalidate_counts，
+下一次請求重新計數。
+
+使用方式:
+    mode = parse_count_mode(request.args.get('count'))
+    total = list_total(query, 'invite_codes', mode, status='active')
+"""
+import threading
+from typing import Dict, Optional
+
+from utils.cache import TTLCache, cache_key
+from utils.concurrency import count_query
+
+LIST_COUNT_TTL = 60  # 1 minute
+LIST_COUNT_MAX_STALE = 600  # 10 minutes
+
+COUNT_MODES = ('approx', 'exact', 'none')
+
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _cache(collection: str) -> TTLCache:
+    with _caches_lock:
+        cache = _caches.get(collection)
+        if cache is None:
+            cache = _caches[collection] = TTLCache(
+                f'list_counts:{collection}', max_entries=64, default_ttl=LIST_COUNT_TTL
+            )
+        return cache
+
+
+def parse_count_mode(value: Optional[str]) -> str:
+    """
+    解析 count 查詢參數（默認 approx）
+
+    Raises:
+        ValueError: 不支持的模式
+    """
+    mode = (value or 'approx').lower()
+    if mode not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+    return mode
+
+
+def list_total(query, collection: str, mode: str = 'approx', **filters) -> Optional[int]:
+    """
+    列表總數
+
+    Args:
+        query: 帶篩選條件的 Firestore 查詢（不含排序與分頁）
+        collection: 集合名（同時是失效的單位）
+        mode: approx / exact / none
+        **filters: 篩選條件（組成緩存 key，必須唯一決定 query）
+
+    Returns:
+        總數；mode 為 none 時返回 None
+    """
+    if mode == 'none':
+        return None
+
+    cache = _cache(collection)
+    key = cache_key(collection, **filters)
+    if mode == 'exact':
+        return cache.refresh(key, lambda: count_query(query))
+
+    total, _, _ = cache.get_or_refresh(key, lambda: count_query(query), max_stale=LIST_COUNT_MAX_STALE)
+    return total
+
+
+def invalidate_counts(collection: str) -> None:
+    """集合內容變化後清除其所有篩選條件的總數緩存"""
+    _cache(collection).clear()
@@ -0,0 +1,146 @@
+"""
+Firestore 鍵集（游標）分頁
+
+offset() 分頁時 Firestore 會逐一掃描並計費所有被跳過的文檔（第 200 頁、每頁 50 筆 = 10,000 次讀取）。
+這裡改用穩定排序鍵（排序字段 + 文檔 ID）與 start_after 游標：任何深度的一頁都只讀取 limit + 1 筆。
+
+- 游標是不透明的 URL-safe base64 字串，內含排序鍵的值、方向與作用域
+  （作用域包含端點與篩選條件，篩選條件改變後舊游標會被拒絕）
+- next_cursor 向後翻頁；prev_cursor 以反向排序 + start_after 向前翻頁，結果再反轉回原順序
+- 沒有游標時沿用 page 參數（offset，兼容舊客戶端），並同樣返回游標供之後翻頁
+
+使用方式:
+    query = db.collection('invite_codes').where('is_active', '==', True)
+    page = paginate(query, limit=50, cursor=request.args.get('cursor'),
+                    sort=[('created_at', True)], scope='invite_codes:active')
+    page.docs, page.next_cursor, page.prev_cursor
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+
+class InvalidCursor(ValueError):
+    """游標無法解碼或不屬於當前端點 / 篩選條件"""
+
+
+class Page(NamedTuple):
+    docs: List[Any]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$t': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '$t' in value:
+        return datetime.fromisoformat(value['$t'])
+    return value
+
+
+def encode_cursor(values: Sequence[Any], backward: bool = False, scope: str = '') -> str:
+    """把排序鍵的值編碼成游標（最後一個值為文檔 ID）"""
+    payload = {'s': scope, 'v': [_encode_value(v) for v in values]}
+    if backward:
+        payload['b'] = 1
+    raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str, scope: str = '') -> Tuple[List[Any], bool]:
+    """
+    解碼游標
+
+    Returns:
+        (排序鍵的值, 是否向前翻頁)
+
+    Raises:
+        InvalidCursor: 格式錯誤或作用域不符
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = [_decode_value(v) for v in payload['v']]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f'Malformed cursor: {e}') from e
+    if payload.get('s') != scope:
+        raise InvalidCursor('Cursor does not match this list or its filters')
+    return values, bool(payload.get('b'))
+
+
+def _cursor_values(doc, fields: Sequence[str]) -> List[Any]:
+    data = doc.to_dict() or {}
+    return [data.get(field) for field in fields] + [doc.id]
+
+
+def paginate(
+    query,
+    limit: int,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    sort: Sequence[Tuple[str, bool]] = (),
+    scope: str = ''
+) -> Page:
+    """
+    讀取一頁文檔
+
+    Args:
+        query: Firestore 查詢（不要自帶 order_by / limit / offset）
+        limit: 每頁文檔數
+        cursor: next_cursor / prev_cursor（優先於 page）
+        page: 沒有游標時的頁碼（offset 分頁，兼容路徑）
+        sort: 排序字段 [(field, descending)]；最後自動加上文檔 ID 作為唯一的平手鍵
+            （方向與最後一個排序字段相同，也可以用 ('__name__', descending) 結尾指定）。
+            有範圍 / 不等過濾時第一個排序字段必須是該過濾字段。
+        scope: 游標作用域（端點 + 篩選條件）
+
+    Raises:
+        InvalidCursor: 游標無效
+    """
+    fields = [field for field, _ in sort]
+    descending = [desc for _, desc in sort]
+    if fields and fields[-1] == '__name__':
+        fields.pop()
+    else:
+        descending.append(descending[-1] if descending else False)
+
+    backward = False
+    values = None
+    if cursor:
+        values, backward = decode_cursor(cursor, scope)
+        if len(values) != len(fields) + 1:
+            raise InvalidCursor('Cursor does not match this list or its filters')
+
+    ordered = query
+    for field, desc in zip(fields + ['__name__'], descending):
+        # 向前翻頁時反向排序，從游標往回讀取
+        ordered = ordered.order_by(field, direction=DESCENDING if desc != backward else ASCENDING)
+
+    if values is not None:
+        docs = list(ordered.start_after(values).limit(limit + 1).stream())
+    else:
+        docs = list(ordered.limit(limit + 1).offset((page - 1) * limit).stream())
+
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if backward:
+        docs.reverse()
+
+    if not docs:
+        return Page(docs, None, None)
+
+    at_start = (not has_more) if backward else (values is None and page <= 1)
+    at_end = (not has_more) if not backward else False
+    return Page(
+        docs,
+        None if at_end else encode_cursor(_cursor_values(docs[-1], fields), scope=scope),
+        None if at_start else encode_cursor(_cursor_values(docs[0], fields), backward=True, scope=scope),
+    )
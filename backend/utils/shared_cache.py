@@ -0,0 +1,547 @@
+"""
+跨進程共享緩存
+
+gunicorn 多 worker 與 Cloud Run 多實例各自持有進程內緩存時，每個進程都會
+重複執行相同的 Firestore 掃描。共享緩存把計算結果放在所有進程都能讀到的地方，
+並用租約（lease，compare-and-set）保證同一個 key 同一時間只有一個 worker 在重算。
+
+後端（可插拔）:
+- InMemorySharedBackend: 進程內實現（本地開發與測試用的替身）
+- FileSharedBackend: /dev/shm 下的文件（同一容器內的多個 gunicorn worker 共享）
+- FirestoreSharedBackend: Firestore analytics_cache 集合（跨 Cloud Run 實例共享）
+
+條目結構（所有後端相同）:
+    {
+        "payload": str (JSON 序列化的值),
+        "version": int (每次寫入遞增),
+        "computed_at": float (epoch 秒),
+        "expires_at": float (epoch 秒),
+        "lease_owner": str | None,
+        "lease_until": float (epoch 秒)
+    }
+
+SharedCache 在共享後端之上加一層進程內副本：本地副本未過期時不訪問後端，
+後端的版本號比本地新時才重新解碼。接口與 TTLCache 的 stale-while-revalidate
+部分相同（get_or_refresh / refresh / expires_in / invalidate / clear）。
+
+使用方式:
+    cache = SharedCache('analytics', FileSharedBackend('/dev/shm/analytics_cache'))
+    value, computed_at, stale = cache.get_or_refresh(key, compute_fn, ttl=600)
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows 本地開發
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _lease_available(record: Optional[Dict[str, Any]], owner: str, now: float) -> bool:
+    if not record:
+        return True
+    holder = record.get('lease_owner')
+    return holder in (None, owner) or record.get('lease_until', 0) <= now
+
+
+class SharedCacheBackend:
+    """共享緩存後端接口"""
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        """讀取條目（不存在返回 None）"""
+        raise NotImplementedError
+
+    def try_lease(self, key: str, owner: str, lease_seconds: float) -> bool:
+        """嘗試獲取重算租約（compare-and-set），已被其他 owner 持有且未過期時返回 False"""
+        raise NotImplementedError
+
+    def publish(self, key: str, payload: str, computed_at: float, expires_at: float, owner: str) -> int:
+        """寫入新值並釋放租約，返回新版本號"""
+        raise NotImplementedError
+
+    def release(self, key: str, owner: str) -> None:
+        """釋放租約（計算失敗時調用）"""
+        raise NotImplementedError
+
+    def expire(self, key: str) -> None:
+        """把條目標記為過期（保留版本號，版本號永遠單調遞增）"""
+        raise NotImplementedError
+
+    def expire_all(self) -> None:
+        """把所有條目標記為過期"""
+        raise NotImplementedError
+
+
+class InMemorySharedBackend(SharedCacheBackend):
+    """進程內後端（本地開發與測試用的替身，語義與其他後端相同）"""
+
+    def __init__(self):
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def read(self, key):
+        with self._lock:
+            record = self._records.get(key)
+            return dict(record) if record else None
+
+    def try_lease(self, key, owner, lease_seconds):
+        now = _now()
+        with self._lock:
+            record = self._records.setdefault(key, {'version': 0})
+            if not _lease_available(record, owner, now):
+                return False
+            record['lease_owner'] = owner
+            record['lease_until'] = now + lease_seconds
+            return True
+
+    def publish(self, key, payload, computed_at, expires_at, owner):
+        with self._lock:
+            record = self._records.setdefault(key, {'version': 0})
+            record.update({
+                'payload': payload,
+                'version': record.get('version', 0) + 1,
+                'computed_at': computed_at,
+                'expires_at': expires_at,
+                'lease_owner': None,
+                'lease_until': 0,
+            })
+            return record['version']
+
+    def release(self, key, owner):
+        with self._lock:
+            record = self._records.get(key)
+            if record and record.get('lease_owner') == owner:
+                record['lease_owner'] = None
+                record['lease_until'] = 0
+
+    def expire(self, key):
+        with self._lock:
+            if key in self._records:
+                self._records[key]['expires_at'] = 0
+
+    def expire_all(self):
+        with self._lock:
+            for record in self._records.values():
+                record['expires_at'] = 0
+
+
+class FileSharedBackend(SharedCacheBackend):
+    """
+    文件後端：每個 key 一個 JSON 文件（默認放在 /dev/shm，內存文件系統）
+
+    寫入使用臨時文件 + os.replace（讀取不需要鎖）；
+    租約與寫入在同一個 key 的 flock 內做 compare-and-set。
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        if directory is None:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            directory = os.path.join(base, 'analytics_cache')
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _locked(self, path: str):
+        class _FileLock:
+            def __enter__(self):
+                self.handle = open(path + '.lock', 'a')
+                if fcntl is not None:
+                    fcntl.flock(self.handle, fcntl.LOCK_EX)
+                return self
+
+            def __exit__(self, *exc):
+                if fcntl is not None:
+                    fcntl.flock(self.handle, fcntl.LOCK_UN)
+                self.handle.close()
+
+        return _FileLock()
+
+    def _write(self, path: str, record: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_path(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read(self, key):
+        return self._read_path(self._path(key))
+
+    def try_lease(self, key, owner, lease_seconds):
+        path = self._path(key)
+        with self._locked(path):
+            now = _now()
+            record = self._read_path(path) or {'version': 0}
+            if not _lease_available(record, owner, now):
+                return False
+            record['lease_owner'] = owner
+            record['lease_until'] = now + lease_seconds
+            self._write(path, record)
+            return True
+
+    def publish(self, key, payload, computed_at, expires_at, owner):
+        path = self._path(key)
+        with self._locked(path):
+            record = self._read_path(path) or {'version': 0}
+            record.update({
+                'payload': payload,
+                'version': record.get('version', 0) + 1,
+                'computed_at': computed_at,
+                'expires_at': expires_at,
+                'lease_owner': None,
+                'lease_until': 0,
+            })
+            self._write(path, record)
+            return record['version']
+
+    def release(self, key, owner):
+        path = self._path(key)
+        with self._locked(path):
+            record = self._read_path(path)
+            if record and record.get('lease_owner') == owner:
+                record['lease_owner'] = None
+                record['lease_until'] = 0
+                self._write(path, record)
+
+    def _expire_path(self, path: str) -> None:
+        with self._locked(path):
+            record = self._read_path(path)
+            if record:
+                record['expires_at'] = 0
+                self._write(path, record)
+
+    def expire(self, key):
+        self._expire_path(self._path(key))
+
+    def expire_all(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                self._expire_path(os.path.join(self.directory, name))
+
+
+class FirestoreSharedBackend(SharedCacheBackend):
+    """
+    Firestore 後端：analytics_cache/{key} 文檔
+
+    租約與寫入都在 Firestore transaction 內完成（讀取 lease_owner / version 後條件寫入），
+    跨 Cloud Run 實例保證同一 key 只有一個 worker 在重算。
+    """
+
+    COLLECTION_NAME = 'analytics_cache'
+
+    def __init__(self, db, collection: str = COLLECTION_NAME):
+        from firebase_admin import firestore
+
+        self._firestore = firestore
+        self.db = db
+        self.collection = collection
+
+    def _ref(self, key: str):
+        # 文檔 ID 不能包含 '/'
+        return self.db.collection(self.collection).document(key.replace('/', '_'))
+
+    def read(self, key):
+        snapshot = self._ref(key).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def try_lease(self, key, owner, lease_seconds):
+        ref = self._ref(key)
+
+        @self._firestore.transactional
+        def lease(transaction):
+            snapshot = ref.get(transaction=transaction)
+            now = _now()
+            if not _lease_available(snapshot.to_dict() if snapshot.exists else None, owner, now):
+                return False
+            transaction.set(ref, {'lease_owner': owner, 'lease_until': now + lease_seconds}, merge=True)
+            return True
+
+        return lease(self.db.transaction())
+
+    def publish(self, key, payload, computed_at, expires_at, owner):
+        ref = self._ref(key)
+
+        @self._firestore.transactional
+        def write(transaction):
+            snapshot = ref.get(transaction=transaction)
+            version = (snapshot.to_dict() or {}).get('version', 0) + 1 if snapshot.exists else 1
+            transaction.set(ref, {
+                'payload': payload,
+                'version': version,
+                'computed_at': computed_at,
+                'expires_at': expires_at,
+                'lease_owner': None,
+                'lease_until': 0,
+            })
+            return version
+
+        return write(self.db.transaction())
+
+    def release(self, key, owner):
+        ref = self._ref(key)
+
+        @self._firestore.transactional
+        def release(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if snapshot.exists and (snapshot.to_dict() or {}).get('lease_owner') == owner:
+                transaction.update(ref, {'lease_owner': None, 'lease_until': 0})
+
+        release(self.db.transaction())
+
+    def expire(self, key):
+        ref = self._ref(key)
+        if ref.get().exists:
+            ref.update({'expires_at': 0})
+
+    def expire_all(self):
+        for doc in self.db.collection(self.collection).select([]).stream():
+            doc.reference.update({'expires_at': 0})
+
+
+class _LocalEntry:
+    """共享條目在本進程的已解碼副本"""
+    __slots__ = ('value', 'version', 'computed_at', 'expires_at')
+
+    def __init__(self, value: Any, version: int, computed_at: float, expires_at: float):
+        self.value = value
+        self.version = version
+        self.computed_at = computed_at
+        self.expires_at = expires_at
+
+    def result(self, stale: bool) -> Tuple[Any, datetime, bool]:
+        return self.value, datetime.fromtimestamp(self.computed_at, tz=timezone.utc), stale
+
+
+class SharedCache:
+    """
+    共享緩存（stale-while-revalidate + 跨進程租約）
+
+    - 本地副本未過期：直接返回，不訪問後端
+    - 本地副本過期：讀取後端，後端版本更新則採用（其他 worker 已重算）
+    - 後端也過期：返回舊值（stale=True），背景執行緒獲取租約後重算；
+      拿不到租約表示其他 worker 正在重算，本進程不重複計算
+    - 沒有可用的值：獲取租約後同步計算；拿不到租約時等待持有者發佈新版本，
+      租約過期仍未發佈則自行計算
+
+    值必須可以 JSON 序列化。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: SharedCacheBackend,
+        max_entries: int = 128,
+        default_ttl: float = 300,
+        lease_seconds: float = 300,
+        poll_interval: float = 0.2
+    ):
+        self.name = name
+        self.backend = backend
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local: 'OrderedDict[str, _LocalEntry]' = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get_or_refresh(
+        self,
+        key: str,
+        compute_fn: Callable[[], Any],
+        ttl: Optional[float] = None,
+        max_stale: Optional[float] = None
+    ) -> Tuple[Any, datetime, bool]:
+        """獲取緩存值，過期時返回舊值並在背景重算（返回值同 TTLCache.get_or_refresh）"""
+        now = _now()
+        entry = self._get_local(key)
+        if entry is None or entry.expires_at <= now:
+            entry = self._sync_from_backend(key) or entry
+
+        if entry is not None:
+            age = now - entry.expires_at
+            if age < 0:
+                return entry.result(stale=False)
+            if max_stale is None or age < max_stale:
+                self._start_background(key, compute_fn, ttl)
+                return entry.result(stale=True)
+
+        return self._compute_or_wait(key, compute_fn, ttl).result(stale=False)
+
+    def refresh(self, key: str, compute_fn: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """強制重算（其他 worker 持有租約時等待其結果）"""
+        return self._compute_or_wait(key, compute_fn, ttl).value
+
+    def expires_in(self, key: str) -> Optional[float]:
+        """條目剩餘的有效秒數（已過期為負數，不存在為 None）"""
+        entry = self._get_local(key)
+        if entry is None or entry.expires_at <= _now():
+            entry = self._sync_from_backend(key) or entry
+        return None if entry is None else entry.expires_at - _now()
+
+    def invalidate(self, key: str) -> None:
+        """把條目標記為過期（其他進程在本地副本到期後讀到；重算期間仍可返回舊值）"""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                entry.expires_at = 0
+        self.backend.expire(key)
+
+    def clear(self) -> None:
+        """把所有條目標記為過期"""
+        with self._lock:
+            for entry in self._local.values():
+                entry.expires_at = 0
+        self.backend.expire_all()
+
+    def _get_local(self, key: str) -> Optional[_LocalEntry]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                self._local.move_to_end(key)
+            return entry
+
+    def _set_local(self, key: str, entry: _LocalEntry, force: bool = False) -> None:
+        with self._lock:
+            current = self._local.get(key)
+            if not force and current is not None and current.version > entry.version:
+                return
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _sync_from_backend(self, key: str) -> Optional[_LocalEntry]:
+        """讀取後端條目；版本比本地新時解碼並更新本地副本"""
+        try:
+            record = self.backend.read(key)
+        except Exception as e:
+            logger.warning(f"[{self.name}] Failed to read shared entry {key}: {e}")
+            return None
+        if not record or 'payload' not in record:
+            return None
+
+        local = self._get_local(key)
+        if local is not None and local.version >= record['version']:
+            return local
+
+        entry = _LocalEntry(
+            json.loads(record['payload']),
+            record['version'],
+            record['computed_at'],
+            record['expires_at']
+        )
+        self._set_local(key, entry)
+        return entry
+
+    def _lease_owner(self) -> str:
+        # 每次計算使用獨立的 owner，同一進程內的其他執行緒也會等待租約
+        return f"{self.owner}:{uuid.uuid4().hex[:8]}"
+
+    def _compute_and_publish(
+        self,
+        key: str,
+        compute_fn: Callable[[], Any],
+        ttl: Optional[float],
+        owner: Optional[str]
+    ) -> _LocalEntry:
+        """執行計算並發佈到後端（owner 為 None 表示後端不可用，只更新本地副本）"""
+        try:
+            start = time.monotonic()
+            value = compute_fn()
+            payload = json.dumps(value)
+        except BaseException:
+            if owner is not None:
+                self.backend.release(key, owner)
+            raise
+
+        computed_at = _now()
+        expires_at = computed_at + (self.default_ttl if ttl is None else ttl)
+        version = 0
+        if owner is not None:
+            try:
+                version = self.backend.publish(key, payload, computed_at, expires_at, owner)
+            except Exception as e:
+                logger.warning(f"[{self.name}] Failed to publish shared entry {key}: {e}")
+        logger.info(
+            f"[{self.name}] Computed {key} (v{version}) in {time.monotonic() - start:.2f}s"
+        )
+        entry = _LocalEntry(value, version, computed_at, expires_at)
+        self._set_local(key, entry, force=True)
+        return entry
+
+    def _compute_or_wait(self, key: str, compute_fn: Callable[[], Any], ttl: Optional[float]) -> _LocalEntry:
+        """
+        獲取租約後計算；租約被其他 worker 持有時輪詢等待其發佈新版本
+
+        持有者異常退出時，租約在 lease_seconds 後過期，下一輪即可獲取。
+        後端不可用時直接在本進程計算。
+        """
+        known = self._get_local(key)
+        known_version = known.version if known is not None else 0
+        owner = self._lease_owner()
+
+        while True:
+            try:
+                leased = self.backend.try_lease(key, owner, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"[{self.name}] Shared backend unavailable for {key}: {e}")
+                return self._compute_and_publish(key, compute_fn, ttl, owner=None)
+
+            if leased:
+                # 拿到租約前，其他 worker 可能剛發佈了新版本
+                entry = self._sync_from_backend(key)
+                if entry is not None and entry.version > known_version and entry.expires_at > _now():
+                    self.backend.release(key, owner)
+                    return entry
+                return self._compute_and_publish(key, compute_fn, ttl, owner)
+
+            entry = self._sync_from_backend(key)
+            if entry is not None and entry.version > known_version:
+                return entry
+            time.sleep(self.poll_interval)
+
+    def _start_background(self, key: str, compute_fn: Callable[[], Any], ttl: Optional[float]) -> None:
+        """背景重算（本進程同 key 只啟動一個；拿不到租約表示其他 worker 正在重算）"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            owner = self._lease_owner()
+            try:
+                if self.backend.try_lease(key, owner, self.lease_seconds):
+                    self._compute_and_publish(key, compute_fn, ttl, owner)
+            except Exception as e:
+                logger.warning(f"[{self.name}] Background refresh of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f'{self.name}-refresh', daemon=True).start()
@@ -81,17 +81,12 @@ export default function DashboardPage() {
       setLoading(true);
       setError(null);
 
-      const [overviewData, revenueData, retentionData, trendsData] = await Promise.all([
-        analyticsApi.getOverview(),
-        analyticsApi.getRevenue(),
-        analyticsApi.getRetention(),
-        analyticsApi.getTrends(trendDays),
-      ]);
+      const data = await analyticsApi.getDashboard(trendDays);
 
-      setOverview(overviewData);
-      setRevenue(revenueData);
-      setRetention(retentionData);
-      setTrends(trendsData);
+      setOverview(data.overview);
+      setRevenue(data.revenue);
+      setRetention(data.retention);
+      setTrends(data.trends);
     } catch (err: any) {
       console.error('Error fetching analytics data:', err);
       setError(err.response?.data?.error || '載入數據失敗');
@@ -22,8 +22,10 @@ export default function InviteCodesPage() {
 
   // Pagination
   const [currentPage, setCurrentPage] = useState(1);
-  const [totalPages, setTotalPages] = useState(1);
-  const [total, setTotal] = useState(0);
+  // count=none 時總數為 null，以 next_cursor 判斷是否有下一頁
+  const [totalPages, setTotalPages] = useState<number | null>(1);
+  const [total, setTotal] = useState<number | null>(0);
+  const [hasNextPage, setHasNextPage] = useState(false);
   const pageSize = 20;
 
   // Filters
@@ -49,6 +51,11 @@ export default function InviteCodesPage() {
       setInviteCodes(response.data);
       setTotal(response.pagination.total);
       setTotalPages(response.pagination.total_pages);
+      setHasNextPage(
+        response.pagination.total_pages === null
+          ? response.pagination.next_cursor !== null
+          : currentPage < response.pagination.total_pages
+      );
     } catch (err: any) {
       console.error('Error fetching invite codes:', err);
       setError(err.response?.data?.error || 'Failed to load invite codes');
@@ -358,7 +365,7 @@ export default function InviteCodesPage() {
           </div>
 
           {/* Pagination */}
-          {totalPages > 1 && (
+          {(currentPage > 1 || hasNextPage) && (
             <div className="bg-white px-4 py-3 flex items-center justify-between border-t border-gray-200 sm:px-6">
               <div className="flex-1 flex justify-between sm:hidden">
                 <button
@@ -369,8 +376,8 @@ export default function InviteCodesPage() {
                   上一頁
                 </button>
                 <button
-                  onClick={() => setCurrentPage(p => Math.min(totalPages, p + 1))}
-                  disabled={currentPage === totalPages}
+                  onClick={() => setCurrentPage(p => p + 1)}
+                  disabled={!hasNextPage}
                   className="ml-3 relative inline-flex items-center px-4 py-2 border border-gray-300 text-sm font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50"
                 >
                   下一頁
@@ -381,9 +388,11 @@ export default function InviteCodesPage() {
                   <p className="text-sm text-gray-700">
                     顯示第 <span className="font-medium">{(currentPage - 1) * pageSize + 1}</span> 到{' '}
                     <span className="font-medium">
-                      {Math.min(currentPage * pageSize, total)}
+                      {(currentPage - 1) * pageSize + inviteCodes.length}
                     </span>{' '}
-                    筆，共 <span className="font-medium">{total}</span> 筆
+                    筆{total !== null && (
+                      <>，共 <span className="font-medium">{total}</span> 筆</>
+                    )}
                   </p>
                 </div>
                 <div>
@@ -395,7 +404,7 @@ export default function InviteCodesPage() {
                     >
                       上一頁
                     </button>
-                    {Array.from({ length: totalPages }, (_, i) => i + 1)
+                    {totalPages !== null && Array.from({ length: totalPages }, (_, i) => i + 1)
                       .filter(page => {
                         if (totalPages <= 7) return true;
                         if (page === 1 || page === totalPages) return true;
@@ -437,8 +446,8 @@ export default function InviteCodesPage() {
                         );
                       })}
                     <button
-                      onClick={() => setCurrentPage(p => Math.min(totalPages, p + 1))}
-                      disabled={currentPage === totalPages}
+                      onClick={() => setCurrentPage(p => p + 1)}
+                      disabled={!hasNextPage}
                       className="relative inline-flex items-center px-2 py-2 rounded-r-md border border-gray-300 bg-white text-sm font-medium text-gray-500 hover:bg-gray-50 disabled:opacity-50"
                     >
                       下一頁
@@ -100,6 +100,13 @@ export default function SubscriptionsPage() {
     };
   }, [data, searchTerm, statusFilter]);
 
+  // 沒有總頁數時（count=none）以 next_cursor 判斷是否有下一頁
+  const hasNextPage = data
+    ? data.pagination.total_pages === null
+      ? data.pagination.next_cursor !== null
+      : page < data.pagination.total_pages
+    : false;
+
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -129,11 +136,14 @@ export default function SubscriptionsPage() {
         <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-6">
           <div className="bg-white rounded-lg shadow p-6">
             <div className="text-sm text-gray-600 mb-1">總訂閱數</div>
-            <div className="text-3xl font-bold text-gray-900">{data.pagination.total}</div>
+            <div className="text-3xl font-bold text-gray-900">{data.pagination.total ?? '—'}</div>
           </div>
           <div className="bg-white rounded-lg shadow p-6">
             <div className="text-sm text-gray-600 mb-1">當前頁面</div>
-            <div className="text-3xl font-bold text-gray-900">{data.pagination.page} / {data.pagination.total_pages}</div>
+            <div className="text-3xl font-bold text-gray-900">
+              {data.pagination.page ?? page}
+              {data.pagination.total_pages !== null && ` / ${data.pagination.total_pages}`}
+            </div>
           </div>
           <div className="bg-white rounded-lg shadow p-6">
             <div className="text-sm text-gray-600 mb-1">每頁數量</div>
@@ -233,7 +243,7 @@ export default function SubscriptionsPage() {
         </table>
 
         {/* Pagination */}
-        {data && data.pagination.total_pages > 1 && (
+        {data && (page > 1 || hasNextPage) && (
           <div className="bg-gray-50 px-6 py-4 flex items-center justify-between border-t border-gray-200">
             <button
               onClick={() => setPage(Math.max(1, page - 1))}
@@ -243,11 +253,11 @@ export default function SubscriptionsPage() {
               上一頁
             </button>
             <span className="text-sm text-gray-700">
-              第 {page} 頁，共 {data.pagination.total_pages} 頁
+              第 {page} 頁{data.pagination.total_pages !== null && `，共 ${data.pagination.total_pages} 頁`}
             </span>
             <button
-              onClick={() => setPage(Math.min(data.pagination.total_pages, page + 1))}
-              disabled={page === data.pagination.total_pages}
+              onClick={() => setPage(page + 1)}
+              disabled={!hasNextPage}
               className="px-4 py-2 border border-gray-300 rounded-md text-sm font-medium text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
             >
               下一頁
@@ -49,20 +49,14 @@ export default function UserDetailPage() {
     setLoading(true);
     setError('');
     try {
-      const [userResponse, trainingResponse, weeklyResponse, summaryResponse, readinessResponse, readinessHistoryResponse] = await Promise.all([
-        usersApi.get(uid),
-        usersApi.getTrainingOverview(uid).catch(() => ({ training_overview: null })),
-        usersApi.getWeeklyPlan(uid).catch(() => ({ weekly_plan: null })),
-        usersApi.getWeeklySummary(uid).catch(() => ({ weekly_summary: null })),
-        usersApi.getReadiness(uid).catch(() => ({ readiness: null })),
-        usersApi.getReadinessHistory(uid, 28).catch(() => ({ history: [] })),
-      ]);
-      setUser(userResponse);
-      setTrainingOverview(trainingResponse.training_overview);
-      setWeeklyPlan(weeklyResponse.weekly_plan);
-      setWeeklySummary(summaryResponse.weekly_summary);
-      setReadiness(readinessResponse.readiness);
-      setReadinessHistory(readinessHistoryResponse.history);
+      // 一次請求取得所有面板（失敗的面板為 null）
+      const response = await usersApi.getFull(uid, { days: 28 });
+      setUser(response.user);
+      setTrainingOverview(response.training_overview?.training_overview ?? null);
+      setWeeklyPlan(response.weekly_plan?.weekly_plan ?? null);
+      setWeeklySummary(response.weekly_summary?.weekly_summary ?? null);
+      setReadiness(response.readiness?.readiness ?? null);
+      setReadinessHistory(response.readiness_history?.history ?? []);
     } catch (err: any) {
       setError(err.message || '獲取用戶詳情失敗');
     } finally {
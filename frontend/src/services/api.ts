@@ -66,7 +66,7 @@ export function setAuthToken(token: string | null) {
 // 訂閱相關 API
 export const subscriptionApi = {
   // 獲取訂閱列表
-  list: async (params?: { page?: number; limit?: number; status?: string }) => {
+  list: async (params?: { page?: number; cursor?: string; count?: 'approx' | 'exact' | 'none'; limit?: number; status?: string }) => {
     const response = await apiClient.get('/api/v1/admin/subscriptions', { params });
     return response.data;
   },
@@ -98,7 +98,7 @@ export const subscriptionApi = {
 // 邀請碼相關 API
 export const inviteCodeApi = {
   // 獲取邀請碼列表
-  list: async (params?: { page?: number; limit?: number; status?: string; search?: string }) => {
+  list: async (params?: { page?: number; cursor?: string; count?: 'approx' | 'exact' | 'none'; limit?: number; status?: string; search?: string }) => {
     const response = await apiClient.get('/api/v1/admin/invite-codes', { params });
     return response.data;
   },
@@ -126,10 +126,24 @@ export const inviteCodeApi = {
     const response = await apiClient.get('/api/v1/admin/invite-codes/stats');
     return response.data;
   },
+
+  // 獲取邀請排行榜與病毒係數
+  getLeaderboard: async (params?: { k?: number; window?: string }) => {
+    const response = await apiClient.get('/api/v1/admin/invite-codes/leaderboard', { params });
+    return response.data;
+  },
 };
 
 // 數據分析相關 API
 export const analyticsApi = {
+  // 獲取 Dashboard 合併數據（總覽 + 收入 + 留存 + 趨勢，一次請求）
+  getDashboard: async (days: number = 30) => {
+    const response = await apiClient.get('/api/v1/admin/analytics/dashboard', {
+      params: { days },
+    });
+    return response.data;
+  },
+
   // 獲取總覽統計
   getOverview: async () => {
     const response = await apiClient.get('/api/v1/admin/analytics/overview');
@@ -187,7 +201,7 @@ export const adminsApi = {
 // 用戶管理相關 API
 export const usersApi = {
   // 獲取用戶列表
-  list: async (params?: { page?: number; limit?: number; search?: string }) => {
+  list: async (params?: { page?: number; cursor?: string; count?: 'approx' | 'exact' | 'none'; limit?: number; search?: string }) => {
     const response = await apiClient.get('/api/v1/admin/users', { params });
     return response.data;
   },
@@ -198,6 +212,12 @@ export const usersApi = {
     return response.data;
   },
 
+  // 獲取用戶詳情頁的所有面板（一次請求）
+  getFull: async (uid: string, params?: { include?: string; date?: string; days?: number }) => {
+    const response = await apiClient.get(`/api/v1/admin/users/${uid}/full`, { params });
+    return response.data;
+  },
+
   // 獲取用戶訓練總覽
   getTrainingOverview: async (uid: string) => {
     const response = await apiClient.get(`/api/v1/admin/users/${uid}/training-overview`);
@@ -225,9 +245,13 @@ export const usersApi = {
   },
 
   // 獲取用戶訓練準備度歷史
-  getReadinessHistory: async (uid: string, days: number = 28) => {
+  getReadinessHistory: async (
+    uid: string,
+    days: number = 28,
+    options?: { from?: string; to?: string; cursor?: string }
+  ) => {
     const response = await apiClient.get(`/api/v1/admin/users/${uid}/readiness/history`, {
-      params: { days }
+      params: { days, ...options }
     });
     return response.data;
   },
@@ -57,9 +57,12 @@ export interface SubscriptionDetail {
 export interface SubscriptionListResponse {
   data: Subscription[];
   pagination: {
-    page: number;
+    page: number | null;
     limit: number;
-    total: number;
-    total_pages: number;
+    // count=none 時為 null（不計算總數，以 next_cursor 判斷是否有下一頁）
+    total: number | null;
+    total_pages: number | null;
+    next_cursor: string | null;
+    prev_cursor: string | null;
   };
 }